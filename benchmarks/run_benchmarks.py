@@ -0,0 +1,292 @@
+"""
+End-to-end benchmark of databuilder pipelines with synthetic sources and in-process stand-ins for Neo4j and
+Elasticsearch. Each scenario runs a full DefaultJob in a fresh process, so that peak memory of one run does not carry
+over to the next, and reports throughput and peak memory per number of tables.
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000
+
+Scenarios:
+    table_metadata, table_column_usage, user, table_last_updated:
+        synthetic extractor -> FsNeo4jCSVLoader -> Neo4jCsvPublisher (stand-in Neo4j driver)
+    search:
+        Neo4jSearchDataExtractor (stand-in Neo4j driver) -> ElasticsearchDocumentTransformer ->
+        FSElasticsearchJSONLoader -> ElasticsearchPublisher (stand-in Elasticsearch client)
+
+Latency of the stand-ins can be tuned through command line options to model the deployment being sized.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Callable, Dict, Iterator, List  # noqa: F401
+
+from benchmarks.stand_ins import FakeElasticsearch, FakeGraphDatabase, FakeNeo4jDriver, LatencyModel
+from benchmarks.synthetic_extractors import SyntheticExtractor, SyntheticTableColumnUsageExtractor, \
+    SyntheticTableLastUpdatedExtractor, SyntheticTableMetadataExtractor, SyntheticUserExtractor, CLUSTER, DATABASE, \
+    get_schema_name, get_table_name
+from databuilder.extractor.neo4j_extractor import Neo4jExtractor
+from databuilder.extractor.neo4j_search_data_extractor import Neo4jSearchDataExtractor
+from databuilder.job.job import DefaultJob
+from databuilder.loader.file_system_elasticsearch_json_loader import FSElasticsearchJSONLoader
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.publisher import neo4j_csv_publisher
+from databuilder.publisher.elasticsearch_publisher import ElasticsearchPublisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from databuilder.task.task import DefaultTask
+from databuilder.transformer.elasticsearch_document_transformer import ElasticsearchDocumentTransformer
+from databuilder.utils import neo4j_driver_registry
+from databuilder.utils.memory_guard import _MB
+
+LOGGER = logging.getLogger(__name__)
+
+NEO4J_SCENARIOS = {
+    'table_metadata': SyntheticTableMetadataExtractor,
+    'table_column_usage': SyntheticTableColumnUsageExtractor,
+    'user': SyntheticUserExtractor,
+    'table_last_updated': SyntheticTableLastUpdatedExtractor,
+}
+SEARCH_SCENARIO = 'search'
+SCENARIOS = sorted(NEO4J_SCENARIOS.keys()) + [SEARCH_SCENARIO]
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def _get_synthetic_conf(scope, table_count, args):
+    # type: (str, int, argparse.Namespace) -> Dict[str, Any]
+    return {
+        '{}.{}'.format(scope, SyntheticExtractor.TABLE_COUNT): table_count,
+        '{}.{}'.format(scope, SyntheticExtractor.RECORD_LATENCY_MS): args.source_record_ms,
+        # A user per 10 tables, as in a typical organization
+        '{}.{}'.format(scope, SyntheticExtractor.USER_COUNT): max(table_count // 10, 10),
+    }
+
+
+def _build_neo4j_job(scenario, table_count, work_dir, args):
+    # type: (str, int, str, argparse.Namespace) -> DefaultJob
+    extractor = NEO4J_SCENARIOS[scenario]()
+    node_dir = '{}/nodes'.format(work_dir)
+    relation_dir = '{}/relationships'.format(work_dir)
+
+    conf_dict = _get_synthetic_conf(extractor.get_scope(), table_count, args)
+    conf_dict.update({
+        'job.{}'.format(DefaultJob.IS_MEMORY_GUARD_ENABLED): True,
+        'task.{}'.format(DefaultTask.BATCH_SIZE): args.batch_size,
+        'loader.filesystem_csv_neo4j.{}'.format(FsNeo4jCSVLoader.NODE_DIR_PATH): node_dir,
+        'loader.filesystem_csv_neo4j.{}'.format(FsNeo4jCSVLoader.RELATION_DIR_PATH): relation_dir,
+        'loader.filesystem_csv_neo4j.{}'.format(FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR): True,
+        # Streaming publish when segments are rotated
+        'job.{}'.format(DefaultJob.IS_STREAMING_PUBLISH): args.rotate_segment_rows > 0,
+        'loader.filesystem_csv_neo4j.{}'.format(FsNeo4jCSVLoader.ROTATE_SEGMENT_ROWS): args.rotate_segment_rows,
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.NODE_FILES_DIR): node_dir,
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.RELATION_FILES_DIR): relation_dir,
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_END_POINT_KEY): 'bolt://localhost:7687',
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_USER): 'neo4j',
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_PASSWORD): 'neo4j',
+        'publisher.neo4j.{}'.format(neo4j_csv_publisher.JOB_PUBLISH_TAG): 'benchmark',
+    })
+    task = DefaultTask(extractor=extractor, loader=FsNeo4jCSVLoader())
+    return DefaultJob(conf=ConfigFactory.from_dict(conf_dict), task=task, publisher=Neo4jCsvPublisher())
+
+
+def _build_search_job(table_count, work_dir, es_client, args):
+    # type: (int, str, FakeElasticsearch, argparse.Namespace) -> DefaultJob
+    json_path = '{}/search_data.json'.format(work_dir)
+    conf = ConfigFactory.from_dict({
+        'job.{}'.format(DefaultJob.IS_MEMORY_GUARD_ENABLED): True,
+        'task.{}'.format(DefaultTask.BATCH_SIZE): args.batch_size,
+        'extractor.search_data.extractor.neo4j.{}'.format(Neo4jExtractor.GRAPH_URL_CONFIG_KEY):
+            'bolt://localhost:7687',
+        'extractor.search_data.extractor.neo4j.{}'.format(Neo4jExtractor.MODEL_CLASS_CONFIG_KEY):
+            'databuilder.models.neo4j_data.Neo4jDataResult',
+        'extractor.search_data.extractor.neo4j.{}'.format(Neo4jExtractor.NEO4J_AUTH_USER): 'neo4j',
+        'extractor.search_data.extractor.neo4j.{}'.format(Neo4jExtractor.NEO4J_AUTH_PW): 'neo4j',
+        'loader.filesystem.elasticsearch.{}'.format(FSElasticsearchJSONLoader.FILE_PATH_CONFIG_KEY): json_path,
+        'loader.filesystem.elasticsearch.{}'.format(FSElasticsearchJSONLoader.FILE_MODE_CONFIG_KEY): 'w',
+        'transformer.elasticsearch.{}'.format(ElasticsearchDocumentTransformer.ELASTICSEARCH_INDEX_CONFIG_KEY):
+            'tables_benchmark',
+        'transformer.elasticsearch.{}'.format(ElasticsearchDocumentTransformer.ELASTICSEARCH_DOC_CONFIG_KEY):
+            'table',
+        'publisher.elasticsearch.{}'.format(ElasticsearchPublisher.FILE_PATH_CONFIG_KEY): json_path,
+        'publisher.elasticsearch.{}'.format(ElasticsearchPublisher.FILE_MODE_CONFIG_KEY): 'r',
+        'publisher.elasticsearch.{}'.format(ElasticsearchPublisher.ELASTICSEARCH_CLIENT_CONFIG_KEY): es_client,
+        'publisher.elasticsearch.{}'.format(ElasticsearchPublisher.ELASTICSEARCH_NEW_INDEX_CONFIG_KEY):
+            'tables_benchmark',
+        'publisher.elasticsearch.{}'.format(ElasticsearchPublisher.ELASTICSEARCH_ALIAS_CONFIG_KEY):
+            'table_search_index',
+    })
+    task = DefaultTask(extractor=Neo4jSearchDataExtractor(),
+                       loader=FSElasticsearchJSONLoader(),
+                       transformer=ElasticsearchDocumentTransformer())
+    return DefaultJob(conf=conf, task=task, publisher=ElasticsearchPublisher())
+
+
+def _get_search_rows(table_count, columns_per_table=10, schema_count=100):
+    # type: (int, int, int) -> Callable[[], Iterator[Dict[str, Any]]]
+    """
+    :return: Function that generates rows of the search data query, as Neo4j would return for graph loaded by the
+    Neo4j scenarios.
+    """
+    def get_rows():
+        # type: () -> Iterator[Dict[str, Any]]
+        for table_index in range(table_count):
+            schema_name = get_schema_name(table_index, schema_count)
+            table_name = get_table_name(table_index)
+            yield {'database': DATABASE,
+                   'cluster': CLUSTER,
+                   'schema_name': schema_name,
+                   'table_name': table_name,
+                   'table_key': '{}://{}.{}/{}'.format(DATABASE, CLUSTER, schema_name, table_name),
+                   'table_description': 'Description of table {}'.format(table_index),
+                   'table_last_updated_epoch': 1560000000 + table_index,
+                   'column_names': ['column_{}'.format(i) for i in range(columns_per_table)],
+                   'column_descriptions': ['Description of column {}'.format(i) for i in range(columns_per_table)],
+                   'total_usage': 6,
+                   'unique_usage': 3,
+                   'tag_names': []}
+    return get_rows
+
+
+def run_scenario(scenario, table_count, args):
+    # type: (str, int, argparse.Namespace) -> Dict[str, Any]
+    """
+    Runs a scenario in current process, with stand-ins patched in place of Neo4j and Elasticsearch clients.
+    :return: Result of the run
+    """
+    neo4j_driver = FakeNeo4jDriver(
+        statement_latency=LatencyModel(request_latency_ms=args.neo4j_statement_ms, unit_latency_ms=args.neo4j_row_ms),
+        commit_latency=LatencyModel(request_latency_ms=args.neo4j_commit_ms),
+        read_rows=_get_search_rows(table_count))
+    es_client = FakeElasticsearch(
+        latency=LatencyModel(request_latency_ms=args.es_request_ms, unit_latency_ms=args.es_document_ms))
+    # Drivers live as long as the process, thus the driver of the previous scenario is closed
+    neo4j_driver_registry.close_all()
+    neo4j_driver_registry.GraphDatabase = FakeGraphDatabase(neo4j_driver)
+
+    work_dir = tempfile.mkdtemp(dir=args.work_dir)
+    try:
+        if scenario == SEARCH_SCENARIO:
+            job = _build_search_job(table_count, work_dir, es_client, args)
+        else:
+            job = _build_neo4j_job(scenario, table_count, work_dir, args)
+
+        start = time.time()
+        job.launch()
+        elapsed_sec = time.time() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = {stats.name: stats for stats in job._get_stats()}
+    calls = neo4j_driver.recorder.calls + es_client.recorder.calls
+    return {
+        'scenario': scenario,
+        'table_count': table_count,
+        'record_count': stats['extract'].record_count,
+        'elapsed_sec': elapsed_sec,
+        'tables_per_sec': table_count / elapsed_sec if elapsed_sec else 0.0,
+        'stage_elapsed_sec': {name: s.elapsed_sec for name, s in stats.items()},
+        'peak_rss_mb': {label: float(rss_bytes) / _MB
+                        for label, rss_bytes in job.memory_guard.peak_rss_bytes.items()},
+        'neo4j_statements': neo4j_driver.recorder.calls['run'],
+        'neo4j_commits': neo4j_driver.recorder.calls['commit'],
+        'neo4j_bytes_sent': neo4j_driver.recorder.bytes_sent,
+        'es_documents': es_client.document_count,
+        'calls': dict(calls),
+    }
+
+
+def _run_scenario_in_process(scenario, table_count, args, queue):
+    # type: (str, int, argparse.Namespace, Any) -> None
+    try:
+        queue.put(run_scenario(scenario, table_count, args))
+    except Exception as e:
+        LOGGER.exception('Benchmark {} failed with {} tables'.format(scenario, table_count))
+        queue.put({'scenario': scenario, 'table_count': table_count, 'error': repr(e)})
+
+
+def run_isolated(scenario, table_count, args):
+    # type: (str, int, argparse.Namespace) -> Dict[str, Any]
+    """
+    Runs a scenario in a fresh process so that peak memory reflects the run alone.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_scenario_in_process, args=(scenario, table_count, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def format_result(result):
+    # type: (Dict[str, Any]) -> str
+    if 'error' in result:
+        return '{scenario:<20} {table_count:>9} FAILED: {error}'.format(**result)
+
+    stage_elapsed = result['stage_elapsed_sec']
+    return '{scenario:<20} {table_count:>9} {record_count:>9} {elapsed:>9.1f} {throughput:>10.1f} ' \
+           '{extract:>8.1f} {load:>8.1f} {publish:>8.1f} {peak_rss:>9.1f} {statements:>10} {commits:>8}'\
+        .format(scenario=result['scenario'],
+                table_count=result['table_count'],
+                record_count=result['record_count'],
+                elapsed=result['elapsed_sec'],
+                throughput=result['tables_per_sec'],
+                extract=stage_elapsed.get('extract', 0.0),
+                load=stage_elapsed.get('load', 0.0),
+                publish=stage_elapsed.get('publish', 0.0),
+                peak_rss=max(result['peak_rss_mb'].values() or [0.0]),
+                statements=result['neo4j_statements'],
+                commits=result['neo4j_commits'])
+
+
+HEADER = '{:<20} {:>9} {:>9} {:>9} {:>10} {:>8} {:>8} {:>8} {:>9} {:>10} {:>8}'\
+    .format('scenario', 'tables', 'records', 'total(s)', 'tables/s', 'extract', 'load', 'publish', 'peak(MB)',
+            'statements', 'commits')
+
+
+def parse_args(argv=None):
+    # type: (List[str]) -> argparse.Namespace
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of databuilder pipelines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of tables')
+    parser.add_argument('--scenarios', nargs='+', default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument('--batch-size', type=int, default=1, help='Batch size of DefaultTask')
+    parser.add_argument('--rotate-segment-rows', type=int, default=0,
+                        help='Publishes segments of this many rows while loading (streaming publish). 0 disables it')
+    parser.add_argument('--source-record-ms', type=float, default=0.0,
+                        help='Latency per record of synthetic source')
+    parser.add_argument('--neo4j-statement-ms', type=float, default=0.5,
+                        help='Latency of a Cypher statement round trip')
+    parser.add_argument('--neo4j-row-ms', type=float, default=0.01, help='Latency per row read from Neo4j')
+    parser.add_argument('--neo4j-commit-ms', type=float, default=5.0, help='Latency of a transaction commit')
+    parser.add_argument('--es-request-ms', type=float, default=20.0, help='Latency of an Elasticsearch request')
+    parser.add_argument('--es-document-ms', type=float, default=0.05, help='Latency per document in bulk request')
+    parser.add_argument('--work-dir', default=None, help='Directory for intermediate files. Defaults to temp dir')
+    parser.add_argument('--output', default=None, help='Path to write results as JSON')
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # type: (List[str]) -> List[Dict[str, Any]]
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    print(HEADER)
+    results = []
+    for table_count in args.sizes:
+        for scenario in args.scenarios:
+            result = run_isolated(scenario, table_count, args)
+            print(format_result(result))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+import threading
+import time
+from collections import Counter
+
+from elasticsearch.exceptions import NotFoundError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional  # noqa: F401
+
+# Sleeping is coarse grained, thus latency is accumulated and slept off once it reaches this
+_MIN_SLEEP_MS = 1.0
+
+
+class LatencyModel(object):
+    """
+    Models latency of a remote service: a round trip per request, plus a cost per unit of work (e.g: row, document).
+    Latency smaller than what time.sleep can honor is accumulated, so that the total is accurate even when each
+    request is cheap.
+    """
+    def __init__(self,
+                 request_latency_ms=0.0,  # type: float
+                 unit_latency_ms=0.0,  # type: float
+                 ):
+        # type: (...) -> None
+        self.request_latency_ms = request_latency_ms
+        self.unit_latency_ms = unit_latency_ms
+        self._debt_ms = 0.0
+        self._lock = threading.Lock()
+
+    def request(self, unit_count=0):
+        # type: (int) -> None
+        self.wait(self.request_latency_ms + self.unit_latency_ms * unit_count)
+
+    def wait(self, latency_ms):
+        # type: (float) -> None
+        with self._lock:
+            self._debt_ms += latency_ms
+            if self._debt_ms < _MIN_SLEEP_MS:
+                return
+            sleep_ms, self._debt_ms = self._debt_ms, 0.0
+        time.sleep(sleep_ms / 1000)
+
+
+class CallRecorder(object):
+    """
+    Counts calls made to a stand-in, and bytes of the statements sent through them. Calls themselves are not kept, so
+    that memory usage of the stand-in does not grow with the volume of the benchmark.
+    """
+    def __init__(self):
+        # type: () -> None
+        self.calls = Counter()  # type: Counter
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def record(self, name, payload=None):
+        # type: (str, Any) -> None
+        with self._lock:
+            self.calls[name] += 1
+            if payload is not None:
+                self.bytes_sent += len(payload)
+
+
+class FakeResult(object):
+    """
+    Result of a statement. Rows are consumed lazily as the real driver does, paying the row latency on the way.
+    """
+    def __init__(self, rows, latency):
+        # type: (Iterable[Dict[str, Any]], LatencyModel) -> None
+        self._rows = iter(rows)
+        self._latency = latency
+
+    def __iter__(self):
+        # type: () -> Iterator[Dict[str, Any]]
+        for row in self._rows:
+            self._latency.wait(self._latency.unit_latency_ms)
+            yield row
+
+    def single(self):
+        # type: () -> Optional[Dict[str, Any]]
+        return next(iter(self), None)
+
+    def summary(self):
+        # type: () -> FakeSummary
+        return FakeSummary()
+
+
+class FakeSummary(object):
+    """
+    Result summary, where the stand-in does not count what the statement wrote.
+    """
+    class Counters(object):
+        nodes_created = 0
+        properties_set = 0
+        relationships_created = 0
+
+    counters = Counters()
+    result_available_after = 0
+    result_consumed_after = 0
+
+
+class FakeTransaction(object):
+    def __init__(self, driver):
+        # type: (FakeNeo4jDriver) -> None
+        self._driver = driver
+        self._closed = False
+
+    def run(self, statement, parameters=None, **kwparameters):
+        # type: (Any, Optional[Dict[str, Any]], Any) -> FakeResult
+        return self._driver.run(statement)
+
+    def commit(self):
+        # type: () -> None
+        self._driver.recorder.record('commit')
+        self._driver.commit_latency.request()
+        self._closed = True
+
+    def rollback(self):
+        # type: () -> None
+        self._driver.recorder.record('rollback')
+        self._closed = True
+
+    def close(self):
+        # type: () -> None
+        self._closed = True
+
+    def closed(self):
+        # type: () -> bool
+        return self._closed
+
+
+class FakeSession(object):
+    def __init__(self, driver):
+        # type: (FakeNeo4jDriver) -> None
+        self._driver = driver
+
+    def __enter__(self):
+        # type: () -> FakeSession
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # type: (Any, Any, Any) -> None
+        self.close()
+
+    def begin_transaction(self):
+        # type: () -> FakeTransaction
+        self._driver.recorder.record('begin_transaction')
+        return FakeTransaction(self._driver)
+
+    def run(self, statement, parameters=None, **kwparameters):
+        # type: (Any, Optional[Dict[str, Any]], Any) -> FakeResult
+        return self._driver.run(statement)
+
+    def read_transaction(self, unit_of_work, *args, **kwargs):
+        # type: (Callable[..., Any], Any, Any) -> Any
+        return unit_of_work(self.begin_transaction(), *args, **kwargs)
+
+    def write_transaction(self, unit_of_work, *args, **kwargs):
+        # type: (Callable[..., Any], Any, Any) -> Any
+        tx = self.begin_transaction()
+        result = unit_of_work(tx, *args, **kwargs)
+        tx.commit()
+        return result
+
+    def close(self):
+        # type: () -> None
+        self._driver.recorder.record('session_close')
+
+
+class FakeNeo4jDriver(object):
+    """
+    In-process stand-in of neo4j.v1 driver. Statements are counted, not executed. A statement returns rows produced by
+    read_rows when it is a read query (MATCH ... RETURN without any write clause), and a single row otherwise, so that
+    publishers confirming writes (e.g: relationship creation) see success.
+    """
+    _WRITE_CLAUSES = ('MERGE', 'CREATE', 'SET', 'DELETE')
+    _WRITE_RESULT = {'count': 1}
+
+    def __init__(self,
+                 statement_latency=None,  # type: Optional[LatencyModel]
+                 commit_latency=None,  # type: Optional[LatencyModel]
+                 read_rows=None,  # type: Optional[Callable[[], Iterable[Dict[str, Any]]]]
+                 ):
+        # type: (...) -> None
+        self.statement_latency = statement_latency or LatencyModel()
+        self.commit_latency = commit_latency or LatencyModel()
+        self._read_rows = read_rows or (lambda: [])
+        self.recorder = CallRecorder()
+
+    def session(self, *args, **kwargs):
+        # type: (Any, Any) -> FakeSession
+        self.recorder.record('session')
+        return FakeSession(self)
+
+    def run(self, statement):
+        # type: (Any) -> FakeResult
+        if isinstance(statement, bytes):
+            statement = statement.decode('utf-8')
+        self.recorder.record('run', statement)
+        self.statement_latency.request()
+
+        if self._is_read(statement):
+            return FakeResult(self._read_rows(), self.statement_latency)
+        return FakeResult([FakeNeo4jDriver._WRITE_RESULT], self.statement_latency)
+
+    def _is_read(self, statement):
+        # type: (str) -> bool
+        upper = statement.upper()
+        return 'RETURN' in upper and not any(clause in upper for clause in FakeNeo4jDriver._WRITE_CLAUSES)
+
+    def close(self):
+        # type: () -> None
+        self.recorder.record('close')
+
+
+class FakeGraphDatabase(object):
+    """
+    Stand-in of neo4j.v1.GraphDatabase that hands out the given driver regardless of the endpoint.
+    """
+    def __init__(self, driver):
+        # type: (FakeNeo4jDriver) -> None
+        self._driver = driver
+
+    def driver(self, uri, **config):
+        # type: (str, Any) -> FakeNeo4jDriver
+        return self._driver
+
+
+class FakeIndicesClient(object):
+    def __init__(self, client):
+        # type: (FakeElasticsearch) -> None
+        self._client = client
+        self.aliases = {}  # type: Dict[str, List[str]]
+
+    def create(self, index, body=None, **kwargs):
+        # type: (str, Any, Any) -> Dict[str, Any]
+        self._client.recorder.record('indices.create')
+        self._client.latency.request()
+        return {'acknowledged': True, 'index': index}
+
+    def get_alias(self, name=None, **kwargs):
+        # type: (Optional[str], Any) -> Dict[str, Any]
+        self._client.recorder.record('indices.get_alias')
+        self._client.latency.request()
+        if name not in self.aliases:
+            raise NotFoundError(404, 'alias [{}] missing'.format(name))
+        return {index: {'aliases': {name: {}}} for index in self.aliases[name]}
+
+    def update_aliases(self, body, **kwargs):
+        # type: (Dict[str, Any], Any) -> Dict[str, Any]
+        self._client.recorder.record('indices.update_aliases')
+        self._client.latency.request()
+        for action in body['actions']:
+            if 'add' in action:
+                self.aliases.setdefault(action['add']['alias'], []).append(action['add']['index'])
+            elif 'remove_index' in action:
+                for indices in self.aliases.values():
+                    if action['remove_index']['index'] in indices:
+                        indices.remove(action['remove_index']['index'])
+        return {'acknowledged': True}
+
+
+class FakeElasticsearch(object):
+    """
+    In-process stand-in of Elasticsearch client. Documents are counted, not indexed. Bulk request pays the request
+    latency plus the unit latency per document.
+    """
+    def __init__(self, latency=None):
+        # type: (Optional[LatencyModel]) -> None
+        self.latency = latency or LatencyModel()
+        self.recorder = CallRecorder()
+        self.indices = FakeIndicesClient(self)
+        self.document_count = 0
+
+    def bulk(self, body, **kwargs):
+        # type: (List[Any], Any) -> Dict[str, Any]
+        # Bulk body is pairs of action and document
+        document_count = len(body) // 2
+        self.recorder.record('bulk')
+        self.document_count += document_count
+        self.latency.request(document_count)
+        return {'errors': False, 'items': []}
@@ -0,0 +1,160 @@
+import abc
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Iterator  # noqa: F401
+
+from benchmarks.stand_ins import LatencyModel
+from databuilder.extractor.base_extractor import Extractor
+from databuilder.models.table_column_usage import ColumnReader, TableColumnUsage
+from databuilder.models.table_last_updated import TableLastUpdated
+from databuilder.models.table_metadata import ColumnMetadata, TableMetadata
+from databuilder.models.user import User
+
+DATABASE = 'hive'
+CLUSTER = 'gold'
+
+
+def get_schema_name(table_index, schema_count):
+    # type: (int, int) -> str
+    return 'schema_{}'.format(table_index % schema_count)
+
+
+def get_table_name(table_index):
+    # type: (int) -> str
+    return 'table_{}'.format(table_index)
+
+
+def get_user_email(user_index):
+    # type: (int) -> str
+    return 'user_{}@example.com'.format(user_index)
+
+
+class SyntheticExtractor(Extractor):
+    """
+    Base class of extractors that generate deterministic records for a configurable number of tables, without any
+    source system. Records are generated lazily, so memory usage of the extractor does not grow with table_count.
+    Latency of the source system per record can be modeled with record_latency_ms.
+    """
+    # Config keys
+    TABLE_COUNT = 'table_count'
+    SCHEMA_COUNT = 'schema_count'
+    COLUMNS_PER_TABLE = 'columns_per_table'
+    USER_COUNT = 'user_count'
+    READERS_PER_TABLE = 'readers_per_table'
+    RECORD_LATENCY_MS = 'record_latency_ms'
+
+    DEFAULT_CONFIG = ConfigFactory.from_dict({TABLE_COUNT: 10000,
+                                              SCHEMA_COUNT: 100,
+                                              COLUMNS_PER_TABLE: 10,
+                                              USER_COUNT: 1000,
+                                              READERS_PER_TABLE: 3,
+                                              RECORD_LATENCY_MS: 0.0})
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        conf = conf.with_fallback(SyntheticExtractor.DEFAULT_CONFIG)
+        self.table_count = conf.get_int(SyntheticExtractor.TABLE_COUNT)
+        self.schema_count = conf.get_int(SyntheticExtractor.SCHEMA_COUNT)
+        self.columns_per_table = conf.get_int(SyntheticExtractor.COLUMNS_PER_TABLE)
+        self.user_count = conf.get_int(SyntheticExtractor.USER_COUNT)
+        self.readers_per_table = conf.get_int(SyntheticExtractor.READERS_PER_TABLE)
+        self._latency = LatencyModel(request_latency_ms=conf.get_float(SyntheticExtractor.RECORD_LATENCY_MS))
+        self._iter = self._get_extract_iter()
+
+    def extract(self):
+        # type: () -> Any
+        self._latency.request()
+        return next(self._iter, None)
+
+    @abc.abstractmethod
+    def _get_extract_iter(self):
+        # type: () -> Iterator[Any]
+        pass
+
+
+class SyntheticTableMetadataExtractor(SyntheticExtractor):
+    """
+    Generates a TableMetadata with columns_per_table columns per table.
+    """
+    def _get_extract_iter(self):
+        # type: () -> Iterator[TableMetadata]
+        for table_index in range(self.table_count):
+            columns = [ColumnMetadata(name='column_{}'.format(i),
+                                      description='Description of column {}'.format(i),
+                                      col_type='string' if i % 2 else 'bigint',
+                                      sort_order=i)
+                       for i in range(self.columns_per_table)]
+            yield TableMetadata(database=DATABASE,
+                                cluster=CLUSTER,
+                                schema_name=get_schema_name(table_index, self.schema_count),
+                                name=get_table_name(table_index),
+                                description='Description of table {}'.format(table_index),
+                                columns=columns)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.synthetic_table_metadata'
+
+
+class SyntheticTableColumnUsageExtractor(SyntheticExtractor):
+    """
+    Generates a TableColumnUsage with readers_per_table readers per table.
+    """
+    def _get_extract_iter(self):
+        # type: () -> Iterator[TableColumnUsage]
+        for table_index in range(self.table_count):
+            col_readers = [ColumnReader(database=DATABASE,
+                                        cluster=CLUSTER,
+                                        schema=get_schema_name(table_index, self.schema_count),
+                                        table=get_table_name(table_index),
+                                        column='*',
+                                        user_email=get_user_email((table_index + i) % self.user_count),
+                                        read_count=i + 1)
+                           for i in range(self.readers_per_table)]
+            yield TableColumnUsage(col_readers=col_readers)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.synthetic_table_column_usage'
+
+
+class SyntheticUserExtractor(SyntheticExtractor):
+    """
+    Generates user_count Users, where every tenth user manages the following nine.
+    """
+    def _get_extract_iter(self):
+        # type: () -> Iterator[User]
+        for user_index in range(self.user_count):
+            manager_index = user_index - user_index % 10
+            yield User(email=get_user_email(user_index),
+                       first_name='first_{}'.format(user_index),
+                       last_name='last_{}'.format(user_index),
+                       name='first_{0} last_{0}'.format(user_index),
+                       github_username='github_{}'.format(user_index),
+                       team_name='team_{}'.format(user_index // 10),
+                       employee_type='FTE',
+                       manager_email=get_user_email(manager_index) if manager_index != user_index else '',
+                       slack_id='slack_{}'.format(user_index),
+                       updated_at=1560000000)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.synthetic_user'
+
+
+class SyntheticTableLastUpdatedExtractor(SyntheticExtractor):
+    """
+    Generates a TableLastUpdated per table.
+    """
+    def _get_extract_iter(self):
+        # type: () -> Iterator[TableLastUpdated]
+        for table_index in range(self.table_count):
+            yield TableLastUpdated(table_name=get_table_name(table_index),
+                                   last_updated_time_epoch=1560000000 + table_index,
+                                   schema_name=get_schema_name(table_index, self.schema_count),
+                                   db=DATABASE,
+                                   cluster=CLUSTER)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.synthetic_table_last_updated'
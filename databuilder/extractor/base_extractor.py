@@ -1,7 +1,7 @@
 import abc
 
 from pyhocon import ConfigTree  # noqa: F401
-from typing import Any  # noqa: F401
+from typing import Any, List  # noqa: F401
 
 from databuilder import Scoped
 
@@ -24,6 +24,42 @@ class Extractor(Scoped):
         """
         return None
 
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[Any]
+        """
+        Extracts up to batch_size records at once. Extractor that can amortize the cost across records (e.g. fetching
+        multiple rows from the source at once) is expected to override this. By default, it falls back to extract().
+        :param batch_size: Maximum number of records to extract
+        :return: List of records. Empty list if no more to extract
+        """
+        records = []  # type: List[Any]
+        while len(records) < batch_size:
+            record = self.extract()
+            if not record:
+                break
+            records.append(record)
+        return records
+
+    def get_checkpoint(self):
+        # type: () -> Any
+        """
+        Provides resumable position of the extractor that covers all the records extracted so far. Extractor that can
+        resume (e.g. by last key extracted, or by page token) is expected to override this along with
+        restore_checkpoint. The checkpoint needs to be JSON serializable.
+        :return: Checkpoint or None if checkpoint is not supported
+        """
+        return None
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Any) -> None
+        """
+        Makes extractor resume right after the position of checkpoint provided by get_checkpoint. It is called before
+        init.
+        :param checkpoint:
+        :return:
+        """
+        pass
+
     def get_scope(self):
         # type: () -> str
         return 'extractor'
@@ -6,7 +6,7 @@ import google_auth_httplib2
 from googleapiclient.discovery import build
 import httplib2
 from pyhocon import ConfigTree  # noqa: F401
-from typing import List, Any  # noqa: F401
+from typing import List, Any, Dict, Optional  # noqa: F401
 
 from databuilder.extractor.base_extractor import Extractor
 from databuilder.models.table_metadata import TableMetadata, ColumnMetadata
@@ -28,6 +28,9 @@ class BigQueryMetadataExtractor(Extractor):
 
     This extractor supports nested columns, which are delimited by a dot (.) in the
     column name.
+
+    It supports checkpoint with the dataset, the page token of the table list page,
+    and the offset within the page of the last table extracted.
     """
 
     PROJECT_ID_KEY = 'project_id'
@@ -38,8 +41,14 @@ class BigQueryMetadataExtractor(Extractor):
     DEFAULT_PAGE_SIZE = 300
     NUM_RETRIES = 3
 
+    def __init__(self):
+        # type: () -> None
+        self._checkpoint = None  # type: Optional[Dict[str, Any]]
+        self._restored_checkpoint = None  # type: Optional[Dict[str, Any]]
+
     def init(self, conf):
         # type: (ConfigTree) -> None
+        self._checkpoint = self._restored_checkpoint
         self.key_path = conf.get_string(BigQueryMetadataExtractor.KEY_PATH_KEY, None)
         self.project_id = conf.get_string(BigQueryMetadataExtractor.PROJECT_ID_KEY)
         self.pagesize = conf.get_int(
@@ -67,11 +76,37 @@ class BigQueryMetadataExtractor(Extractor):
         except StopIteration:
             return None
 
+    def get_checkpoint(self):
+        # type: () -> Dict[str, Any]
+        """
+        :return: A dict with dataset_id, page_token and offset of the last table extracted. Empty dict if nothing is
+        extracted.
+        """
+        return self._checkpoint or {}
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Dict[str, Any]) -> None
+        self._restored_checkpoint = checkpoint or None
+
     def _iterate_over_tables(self):
         # type: () -> Any
-        for dataset in self.datasets:
-            for entry in self._retrieve_tables(dataset):
+        datasets = self.datasets
+        page_token, offset = None, 0
+        checkpoint = self._restored_checkpoint
+        if checkpoint:
+            dataset_ids = [dataset.datasetId for dataset in datasets]
+            if checkpoint['dataset_id'] in dataset_ids:
+                LOGGER.info('Resuming from checkpoint {}'.format(checkpoint))
+                datasets = datasets[dataset_ids.index(checkpoint['dataset_id']):]
+                page_token, offset = checkpoint['page_token'], checkpoint['offset']
+            else:
+                LOGGER.warning('Dataset {} of checkpoint does not exist anymore. Extracting from the beginning'
+                               .format(checkpoint['dataset_id']))
+
+        for dataset in datasets:
+            for entry in self._retrieve_tables(dataset, page_token, offset):
                 yield(entry)
+            page_token, offset = None, 0
 
     def _retrieve_datasets(self):
         # type: () -> List[DatasetRef]
@@ -109,14 +144,14 @@ class BigQueryMetadataExtractor(Extractor):
             else:
                 response = None
 
-    def _retrieve_tables(self, dataset):
-        # type: () -> Any
-        for page in self._page_table_list_results(dataset):
+    def _retrieve_tables(self, dataset, page_token=None, offset=0):
+        # type: (DatasetRef, Optional[str], int) -> Any
+        for page_token, page in self._page_table_list_results(dataset, page_token):
             if 'tables' not in page:
                 continue
 
-            for table in page['tables']:
-                tableRef = table['tableReference']
+            for index in range(offset, len(page['tables'])):
+                tableRef = page['tables'][index]['tableReference']
                 table = self.bigquery_service.tables().get(
                     projectId=tableRef['projectId'],
                     datasetId=tableRef['datasetId'],
@@ -140,7 +175,9 @@ class BigQueryMetadataExtractor(Extractor):
                     columns=cols,
                     is_view=table['type'] == 'VIEW')
 
+                self._checkpoint = {'dataset_id': dataset.datasetId, 'page_token': page_token, 'offset': index + 1}
                 yield(table_meta)
+            offset = 0
 
     def _iterate_over_cols(self, parent, column, cols, total_cols):
         # type: (str, str, List[ColumnMetadata()], int) -> int
@@ -169,26 +206,25 @@ class BigQueryMetadataExtractor(Extractor):
             cols.append(col)
             return total_cols + 1
 
-    def _page_table_list_results(self, dataset):
-        # type: (DatasetRef) -> Any
-        response = self.bigquery_service.tables().list(
-            projectId=dataset.projectId,
-            datasetId=dataset.datasetId,
-            maxResults=self.pagesize).execute(
+    def _page_table_list_results(self, dataset, page_token=None):
+        # type: (DatasetRef, Optional[str]) -> Any
+        """
+        :param dataset:
+        :param page_token: Page to start with. None for the first page
+        :return: Iterator of tuple of page token and the page
+        """
+        while True:
+            params = dict(projectId=dataset.projectId, datasetId=dataset.datasetId, maxResults=self.pagesize)
+            if page_token:
+                params['pageToken'] = page_token
+            response = self.bigquery_service.tables().list(**params).execute(
                 num_retries=BigQueryMetadataExtractor.NUM_RETRIES)
 
-        while response:
-            yield response
+            yield page_token, response
 
-            if 'nextPageToken' in response:
-                response = self.bigquery_service.tables().list(
-                    projectId=dataset.projectId,
-                    datasetId=dataset.datasetId,
-                    maxResults=self.pagesize,
-                    pageToken=response['nextPageToken']).execute(
-                        num_retries=BigQueryMetadataExtractor.NUM_RETRIES)
-            else:
-                response = None
+            if 'nextPageToken' not in response:
+                return
+            page_token = response['nextPageToken']
 
     def get_scope(self):
         # type: () -> str
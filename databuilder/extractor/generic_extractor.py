@@ -1,5 +1,6 @@
 import importlib
-from typing import Iterable, Any  # noqa: F401
+from itertools import islice
+from typing import Iterable, Any, List  # noqa: F401
 
 from pyhocon import ConfigTree  # noqa: F401
 
@@ -47,6 +48,10 @@ class GenericExtractor(Extractor):
         except StopIteration:
             return None
 
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[Any]
+        return list(islice(self._iter, batch_size))
+
     def get_scope(self):
         # type: () -> str
         return 'extractor.generic'
@@ -6,7 +6,7 @@ from multiprocessing.pool import ThreadPool
 
 from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
 from pytz import UTC
-from typing import Iterator, Union, Any, List  # noqa: F401
+from typing import Callable, Iterator, Union, Any, Dict, List, Optional, Tuple  # noqa: F401
 
 from databuilder import Scoped
 from databuilder.extractor.base_extractor import Extractor
@@ -44,6 +44,34 @@ def fs_error_handler(f):
     return wrapper
 
 
+def _iter_rows_after(extractor, resume_key, restart):
+    # type: (Extractor, Optional[Tuple[str, str]], Callable[[], Extractor]) -> Iterator[Dict[str, Any]]
+    """
+    Iterates rows of the extractor. If resumed, rows are skipped by position up to and including the row of
+    resume_key, instead of comparing keys, as the collation of the metastore may not order as Python does. If the row
+    of resume_key is not found (e.g: the table is dropped meanwhile), rows are extracted again from the beginning
+    instead of skipping all of them.
+    :param extractor: Extractor of rows from Hive metastore that have schema_name and table_name
+    :param resume_key: (schema, table) of last table extracted before resuming
+    :param restart: Creates the extractor again, to extract from the beginning
+    :return:
+    """
+    row = extractor.extract()
+    if resume_key is not None:
+        while row and (row['schema_name'], row['table_name']) != resume_key:
+            row = extractor.extract()
+        if row:
+            row = extractor.extract()
+        else:
+            LOGGER.warning('{} of checkpoint is not found. Extracting from the beginning'.format(resume_key))
+            extractor = restart()
+            row = extractor.extract()
+
+    while row:
+        yield row
+        row = extractor.extract()
+
+
 class HiveTableLastUpdatedExtractor(Extractor):
     """
     Uses Hive metastore and underlying storage to figure out last updated timestamp of table.
@@ -54,7 +82,15 @@ class HiveTableLastUpdatedExtractor(Extractor):
     table. For partitioned table, it will fetch partition created timestamp, and it's close enough for last updated
     timestamp.
 
+    It supports checkpoint with the phase (partitioned or non-partitioned table) and the (schema, table) of the last
+    table extracted, as both SQL statements are ordered by schema and table. When resumed, tables that are up to the
+    checkpoint are skipped by position without poking the storage. If the table of the checkpoint is not found, the
+    phase is extracted again from the beginning.
     """
+    # Phase of the extraction in checkpoint
+    PARTITIONED_TABLE_PHASE = 'partitioned'
+    NON_PARTITIONED_TABLE_PHASE = 'non_partitioned'
+
     PARTITION_TABLE_SQL_STATEMENT = """
     SELECT
     DBS.NAME as schema_name,
@@ -102,9 +138,15 @@ class HiveTableLastUpdatedExtractor(Extractor):
                                               FS_WORKER_TIMEOUT_SEC: 60,
                                               FILE_CHECK_THRESHOLD: -1})
 
+    def __init__(self):
+        # type: () -> None
+        self._checkpoint = None  # type: Optional[Dict[str, Any]]
+        self._restored_checkpoint = None  # type: Optional[Dict[str, Any]]
+
     def init(self, conf):
         # type: (ConfigTree) -> None
         self._conf = conf.with_fallback(HiveTableLastUpdatedExtractor.DEFAULT_CONFIG)
+        self._checkpoint = self._restored_checkpoint
 
         pool_size = self._conf.get_int(HiveTableLastUpdatedExtractor.FS_WORKER_POOL_SIZE)
         LOGGER.info('Using thread pool size: {}'.format(pool_size))
@@ -185,6 +227,17 @@ class HiveTableLastUpdatedExtractor(Extractor):
         except StopIteration:
             return None
 
+    def get_checkpoint(self):
+        # type: () -> Optional[Dict[str, Any]]
+        """
+        :return: A dict with phase and last_key of the last table extracted. Empty dict if nothing is extracted.
+        """
+        return self._checkpoint or {}
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Dict[str, Any]) -> None
+        self._restored_checkpoint = checkpoint or None
+
     def get_scope(self):
         # type: () -> str
         return 'extractor.hive_table_last_updated'
@@ -197,29 +250,48 @@ class HiveTableLastUpdatedExtractor(Extractor):
 
         Once partitioned table is done, it uses non_partitioned_table_extractor to get storage location of table,
         and probing files under storage location to get max timestamp per table.
+
+        If it's resumed from checkpoint, it skips tables up to the checkpoint.
         :return:
         """
+        resume_key = None  # type: Optional[Tuple[str, str]]
+        phase = HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE
+        if self._restored_checkpoint:
+            LOGGER.info('Resuming from checkpoint {}'.format(self._restored_checkpoint))
+            resume_key = tuple(self._restored_checkpoint['last_key'])  # type: ignore
+            phase = self._restored_checkpoint['phase']
+
+        if phase == HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE:
+            for table_last_updated in self._get_partitioned_table_iter(resume_key):
+                yield table_last_updated
+            resume_key = None
+
+        for table_last_updated in self._get_non_partitioned_table_iter(resume_key):
+            yield table_last_updated
 
-        partitioned_tbl_row = self._partitioned_table_extractor.extract()
-        while partitioned_tbl_row:
+    def _get_partitioned_table_iter(self, resume_key):
+        # type: (Optional[Tuple[str, str]]) -> Iterator[TableLastUpdated]
+        for partitioned_tbl_row in _iter_rows_after(self._partitioned_table_extractor, resume_key,
+                                                    self._get_partitioned_table_sql_alchemy_extractor):
+            self._update_checkpoint(HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE, partitioned_tbl_row)
             yield TableLastUpdated(table_name=partitioned_tbl_row['table_name'],
                                    last_updated_time_epoch=partitioned_tbl_row['last_updated_time'],
                                    schema_name=partitioned_tbl_row['schema_name'],
                                    db=HiveTableLastUpdatedExtractor.DATABASE,
                                    cluster=self._cluster)
-            partitioned_tbl_row = self._partitioned_table_extractor.extract()
 
+    def _get_non_partitioned_table_iter(self, resume_key):
+        # type: (Optional[Tuple[str, str]]) -> Iterator[TableLastUpdated]
         LOGGER.info('Extracting non-partitioned table')
         count = 0
-        non_partitioned_tbl_row = self._non_partitioned_table_extractor.extract()
-        while non_partitioned_tbl_row:
+        for non_partitioned_tbl_row in _iter_rows_after(self._non_partitioned_table_extractor, resume_key,
+                                                        self._get_non_partitioned_table_sql_alchemy_extractor):
             count += 1
             if count % 10 == 0:
                 LOGGER.info('Processed {} non-partitioned tables'.format(count))
 
             if not non_partitioned_tbl_row['location']:
                 LOGGER.warning('Skipping as no storage location available. {}'.format(non_partitioned_tbl_row))
-                non_partitioned_tbl_row = self._non_partitioned_table_extractor.extract()
                 continue
 
             start = time.time()
@@ -230,9 +302,13 @@ class HiveTableLastUpdatedExtractor(Extractor):
             LOGGER.info('Elapsed: {} seconds'.format(time.time() - start))
 
             if table_last_updated:
+                self._update_checkpoint(HiveTableLastUpdatedExtractor.NON_PARTITIONED_TABLE_PHASE,
+                                        non_partitioned_tbl_row)
                 yield table_last_updated
 
-            non_partitioned_tbl_row = self._non_partitioned_table_extractor.extract()
+    def _update_checkpoint(self, phase, row):
+        # type: (str, Dict[str, Any]) -> None
+        self._checkpoint = {'phase': phase, 'last_key': [row['schema_name'], row['table_name']]}
 
     def _get_last_updated_datetime_from_filesystem(self,
                                                    table,  # type: str
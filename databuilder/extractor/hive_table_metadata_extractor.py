@@ -2,13 +2,13 @@ import logging
 from collections import namedtuple
 
 from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
-from typing import Iterator, Union, Dict, Any  # noqa: F401
+from typing import Iterator, Union, Dict, Any, List  # noqa: F401
 
 from databuilder import Scoped
 from databuilder.extractor.base_extractor import Extractor
 from databuilder.extractor.sql_alchemy_extractor import SQLAlchemyExtractor
 from databuilder.models.table_metadata import TableMetadata, ColumnMetadata
-from itertools import groupby
+from itertools import groupby, islice
 
 
 TableKey = namedtuple('TableKey', ['schema_name', 'table_name'])
@@ -82,6 +82,12 @@ class HiveTableMetadataExtractor(Extractor):
         except StopIteration:
             return None
 
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[TableMetadata]
+        if not self._extract_iter:
+            self._extract_iter = self._get_extract_iter()
+        return list(islice(self._extract_iter, batch_size))
+
     def get_scope(self):
         # type: () -> str
         return 'extractor.hive_table_metadata'
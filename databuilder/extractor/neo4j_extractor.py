@@ -3,9 +3,9 @@ import logging
 from typing import Any, Iterator, Union  # noqa: F401
 
 from pyhocon import ConfigTree  # noqa: F401
-from neo4j.v1 import GraphDatabase
 
 from databuilder.extractor.base_extractor import Extractor
+from databuilder.utils import neo4j_driver_registry
 
 LOGGER = logging.getLogger(__name__)
 
@@ -42,21 +42,21 @@ class Neo4jExtractor(Extractor):
     def close(self):
         # type: () -> None
         """
-        close connection to neo4j cluster
+        Closes the session of the extraction, if not fully extracted yet, so that its connection goes back to the pool.
+        The driver is shared within the process, and closed at exit. (see neo4j_driver_registry)
         """
-        try:
-            self.driver.close()
-        except Exception as e:
-            LOGGER.error("Exception encountered while closing the graph driver", e)
+        if self._extract_iter:
+            self._extract_iter.close()
 
     def _get_driver(self):
         # type: () -> Any
         """
-        Create a Neo4j connection to Database
+        Get a Neo4j connection to Database, shared within the process
         """
-        return GraphDatabase.driver(self.graph_url,
-                                    auth=(self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_USER),
-                                          self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_PW)))
+        return neo4j_driver_registry.get_driver(self.graph_url,
+                                                self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_USER),
+                                                self.conf.get_string(Neo4jExtractor.NEO4J_AUTH_PW),
+                                                self.conf)
 
     def _execute_query(self, tx):
         # type: (Any) -> Any
@@ -0,0 +1,173 @@
+import logging
+import multiprocessing
+import traceback
+from itertools import islice
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from six.moves.queue import Empty
+from typing import Any, Iterator, List, Optional, Set  # noqa: F401
+
+from databuilder import Scoped
+from databuilder.extractor.base_extractor import Extractor
+
+LOGGER = logging.getLogger(__name__)
+
+# How often it checks whether shard processes are alive while waiting for records
+_POLL_INTERVAL_SEC = 1
+
+
+def _run_shard(index,  # type: int
+               extractor,  # type: Extractor
+               conf,  # type: ConfigTree
+               batch_size,  # type: int
+               queue,  # type: Any
+               ):
+    # type: (...) -> None
+    """
+    Extracts the shard and puts records into the queue in batches as tuple of (shard index, records, error).
+    End of the shard is marked by None records, and failure is sent as the traceback in error.
+    """
+    try:
+        extractor.init(conf)
+        try:
+            records = extractor.extract_batch(batch_size)
+            while records:
+                queue.put((index, records, None))
+                records = extractor.extract_batch(batch_size)
+        finally:
+            extractor.close()
+        queue.put((index, None, None))
+    except Exception:
+        LOGGER.exception('Failed to extract shard {}'.format(index))
+        queue.put((index, None, traceback.format_exc()))
+
+
+class ShardedExtractor(Extractor):
+    """
+    An extractor that splits extraction of the wrapped extractor into shards, and runs each shard in its own process
+    with its own connection to the source. Records from the shards are merged into one stream as they arrive, so the
+    order across shards is not preserved.
+
+    Each shard is the wrapped extractor initialized with the config under the scope of this extractor
+    (e.g: extractor.sharded.extractor.hive_table_metadata.cluster), where the value of shard_conf_key is overridden
+    per shard. The value is either shard_template formatted with shard_index and shard_count, or each entry of
+    shard_values. For example, to shard HiveTableMetadataExtractor by TBL_ID modulo:
+
+        extractor.sharded.shard_count: 8
+        extractor.sharded.shard_conf_key: 'where_clause_suffix'
+        extractor.sharded.shard_template: 'WHERE MOD(t.TBL_ID, {shard_count}) = {shard_index}'
+
+    or by ranges with shard_values: ['WHERE t.TBL_ID < 100000', 'WHERE t.TBL_ID >= 100000']. Shard by the key the
+    wrapped extractor groups records by (e.g: TBL_ID), so that a record does not span multiple shards.
+
+    Records need to be picklable, and so does the wrapped extractor on platforms that do not fork. Failure of any
+    shard fails the extraction.
+    """
+    # Config keys
+    SHARD_COUNT = 'shard_count'
+    SHARD_CONF_KEY = 'shard_conf_key'
+    SHARD_TEMPLATE = 'shard_template'
+    SHARD_VALUES = 'shard_values'
+    BATCH_SIZE = 'batch_size'
+    QUEUE_SIZE = 'queue_size'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({SHARD_CONF_KEY: 'where_clause_suffix',
+                                               BATCH_SIZE: 100,
+                                               QUEUE_SIZE: 10})
+
+    def __init__(self, extractor):
+        # type: (Extractor) -> None
+        self._extractor = extractor
+        self._processes = []  # type: List[multiprocessing.Process]
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        conf = conf.with_fallback(ShardedExtractor._DEFAULT_CONFIG)
+        shard_conf_key = conf.get_string(ShardedExtractor.SHARD_CONF_KEY)
+        batch_size = conf.get_int(ShardedExtractor.BATCH_SIZE)
+        extractor_conf = Scoped.get_scoped_conf(conf, self._extractor.get_scope())
+        shard_values = self._get_shard_values(conf)
+
+        LOGGER.info('Extracting {} shards with {}'.format(len(shard_values), shard_conf_key))
+        self._queue = multiprocessing.Queue(maxsize=conf.get_int(ShardedExtractor.QUEUE_SIZE))
+        self._remaining_shards = set(range(len(shard_values)))  # type: Set[int]
+        self._records = iter([])  # type: Iterator[Any]
+        for index, value in enumerate(shard_values):
+            shard_conf = ConfigFactory.from_dict({shard_conf_key: value}).with_fallback(extractor_conf)
+            process = multiprocessing.Process(target=_run_shard,
+                                              name='shard-{}'.format(index),
+                                              args=(index, self._extractor, shard_conf, batch_size, self._queue))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+
+    def _get_shard_values(self, conf):
+        # type: (ConfigTree) -> List[Any]
+        if ShardedExtractor.SHARD_VALUES in conf:
+            return conf.get_list(ShardedExtractor.SHARD_VALUES)
+
+        shard_count = conf.get_int(ShardedExtractor.SHARD_COUNT)
+        template = conf.get_string(ShardedExtractor.SHARD_TEMPLATE)
+        return [template.format(shard_index=index, shard_count=shard_count) for index in range(shard_count)]
+
+    def extract(self):
+        # type: () -> Any
+        records = self.extract_batch(1)
+        return records[0] if records else None
+
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[Any]
+        records = list(islice(self._records, batch_size))
+        while len(records) < batch_size and self._remaining_shards:
+            self._records = iter(self._get_shard_batch())
+            records.extend(islice(self._records, batch_size - len(records)))
+        return records
+
+    def _get_shard_batch(self):
+        # type: () -> List[Any]
+        """
+        Blocks until it gets a batch of records from any shard.
+        :return: Batch of records. Empty list if all shards are finished
+        """
+        while self._remaining_shards:
+            try:
+                index, records, error = self._queue.get(timeout=_POLL_INTERVAL_SEC)
+            except Empty:
+                self._check_processes()
+                continue
+
+            if error:
+                raise RuntimeError('Failed to extract shard {}: {}'.format(index, error))
+
+            if records is None:
+                LOGGER.info('Finished extracting shard {}'.format(index))
+                self._remaining_shards.discard(index)
+                continue
+
+            return records
+        return []
+
+    def _check_processes(self):
+        # type: () -> None
+        """
+        Raises if a shard process exited without reporting back. (e.g: killed by OOM killer)
+        """
+        for index in self._remaining_shards:
+            process = self._processes[index]
+            if not process.is_alive() and process.exitcode:
+                raise RuntimeError('Shard {} exited abnormally with exit code {}'.format(index, process.exitcode))
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.sharded'
+
+    def close(self):
+        # type: () -> None
+        """
+        Terminates shard processes that are still running (e.g: when extraction is aborted).
+        """
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self._processes = []
@@ -1,8 +1,9 @@
 import importlib
+from itertools import islice
 from sqlalchemy import create_engine
 
 from pyhocon import ConfigTree  # noqa: F401
-from typing import Any, Iterator  # noqa: F401
+from typing import Any, Iterator, List  # noqa: F401
 
 from databuilder.extractor.base_extractor import Extractor
 
@@ -70,6 +71,13 @@ class SQLAlchemyExtractor(Extractor):
         except Exception as e:
             raise e
 
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[Any]
+        """
+        Provides up to batch_size sql results at once.
+        """
+        return list(islice(self.iter, batch_size))
+
     def get_scope(self):
         # type: () -> str
         return 'extractor.sqlalchemy'
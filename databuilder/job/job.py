@@ -1,13 +1,18 @@
 import logging
+import threading
+import time
 
 from pyhocon import ConfigTree  # noqa: F401
 from statsd import StatsClient
+from typing import List  # noqa: F401
 
 from databuilder import Scoped
 from databuilder.job.base_job import Job
 from databuilder.publisher.base_publisher import NoopPublisher
 from databuilder.publisher.base_publisher import Publisher  # noqa: F401
 from databuilder.task.base_task import Task  # noqa: F401
+from databuilder.utils.memory_guard import MemoryGuard
+from databuilder.utils.stage_stats import StageStats
 
 LOGGER = logging.getLogger(__name__)
 
@@ -16,12 +21,29 @@ class DefaultJob(Job):
     # Config keys
     IS_STATSD_ENABLED = 'is_statsd_enabled'
     JOB_IDENTIFIER = 'identifier'
+    IS_MEMORY_GUARD_ENABLED = 'is_memory_guard_enabled'
+    # Scope of MemoryGuard config under job scope. e.g: job.memory_guard.budget_mb
+    MEMORY_GUARD = 'memory_guard'
+    IS_STREAMING_PUBLISH = 'is_streaming_publish'
 
     """
     Default job that expects a task, and optional publisher
     If configured job will emit success/fail metric counter through statsd where prefix will be
     amundsen.databuilder.job.[identifier] .
     Note that job.identifier is part of metrics prefix and choose unique & readable identifier for the job.
+    Along with success/fail counter, it emits elapsed time, number of records, records/sec, and p50/p99 latency per
+    record of each stage (extract, transform, load, publish) under the same prefix, e.g: [prefix].extract.elapsed .
+    Regardless of statsd, the statistics of each stage is logged when job ends.
+
+    If job.is_memory_guard_enabled, it tracks memory usage through MemoryGuard configured under job.memory_guard, which
+    takes snapshots at stage boundaries (task_init, task, publish), checks the memory budget while task runs, and
+    reports peak memory per stage (also emitted through statsd as [prefix].memory.[stage].peak_rss_mb) when job ends.
+
+    If job.is_streaming_publish, publisher publishes in a background thread while the task runs, instead of after the
+    task is finished, so that loading and publishing overlap. (e.g: Neo4jCsvPublisher publishes segments that
+    FsNeo4jCSVLoader rotates with rotate_segment_rows) Publisher needs to support streaming. Unlike the default mode,
+    what's published before the task fails stays published. In this mode, publish stage statistics covers the
+    whole task.
 
     To configure statsd itself, use environment variable: https://statsd.readthedocs.io/en/v3.2.1/configure.html
     """
@@ -42,6 +64,13 @@ class DefaultJob(Job):
             self.statsd = StatsClient(prefix=prefix)
         else:
             self.statsd = None
+        self._publish_stats = StageStats('publish')
+
+        if self.scoped_conf.get_bool(DefaultJob.IS_MEMORY_GUARD_ENABLED, False):
+            self.memory_guard = MemoryGuard(Scoped.get_scoped_conf(self.scoped_conf, DefaultJob.MEMORY_GUARD))
+        else:
+            self.memory_guard = None
+        self._is_streaming_publish = self.scoped_conf.get_bool(DefaultJob.IS_STREAMING_PUBLISH, False)
 
     def init(self, conf):
         # type: (ConfigTree) -> None
@@ -49,8 +78,21 @@ class DefaultJob(Job):
 
     def _init(self):
         # type: () -> None
+        if self.memory_guard:
+            self.task.set_memory_guard(self.memory_guard)
         self.task.init(self.conf)
 
+    def _run_task(self):
+        # type: () -> None
+        try:
+            self.task.run()
+        finally:
+            self.task.close()
+
+    def _get_stats(self):
+        # type: () -> List[StageStats]
+        return self.task.get_stats() + [self._publish_stats]
+
     def launch(self):
         # type: () -> None
         """
@@ -63,15 +105,23 @@ class DefaultJob(Job):
         #  closeable get closed.
         try:
             is_success = True
+            if self.memory_guard:
+                self.memory_guard.start()
             self._init()
-            try:
-                self.task.run()
-            finally:
-                self.task.close()
-
-            self.publisher.init(Scoped.get_scoped_conf(self.conf, self.publisher.get_scope()))
-            Job.closer.register(self.publisher.close)
-            self.publisher.publish()
+            self._snapshot_memory('task_init')
+            if self._is_streaming_publish:
+                self._run_task_with_streaming_publish()
+            else:
+                self._run_task()
+                self._snapshot_memory('task')
+
+                self._init_publisher()
+                start = time.time()
+                try:
+                    self.publisher.publish()
+                finally:
+                    self._add_publish_stats(time.time() - start)
+            self._snapshot_memory('publish')
 
         except Exception as e:
             is_success = False
@@ -86,6 +136,93 @@ class DefaultJob(Job):
                     LOGGER.info('Publishing job metrics for failure')
                     self.statsd.incr('fail')
 
+            self._report_stats(self._get_stats())
+            self._report_memory()
             Job.closer.close()
 
         logging.info('Job completed')
+
+    def _init_publisher(self):
+        # type: () -> None
+        self.publisher.init(Scoped.get_scoped_conf(self.conf, self.publisher.get_scope()))
+        Job.closer.register(self.publisher.close)
+
+    def _run_task_with_streaming_publish(self):
+        # type: () -> None
+        """
+        Runs the task while publisher publishes its output in a background thread. Failure of the task takes
+        precedence over failure of the publisher.
+        """
+        if not self.publisher.supports_streaming():
+            raise Exception('{} does not support streaming publish'.format(self.publisher.__class__.__name__))
+
+        self._init_publisher()
+        self.publisher.begin_stream()
+        errors = []  # type: List[Exception]
+
+        def publish():
+            # type: () -> None
+            try:
+                self.publisher.publish()
+            except Exception as e:
+                LOGGER.exception('Failed to publish')
+                errors.append(e)
+
+        publish_thread = threading.Thread(target=publish, name='publisher')
+        publish_thread.daemon = True
+        start = time.time()
+        publish_thread.start()
+        is_success = False
+        try:
+            self._run_task()
+            is_success = True
+        finally:
+            self.publisher.end_stream(is_success=is_success)
+            publish_thread.join()
+            self._add_publish_stats(time.time() - start)
+        self._snapshot_memory('task')
+
+        if errors:
+            raise errors[0]
+
+    def _add_publish_stats(self, elapsed_sec):
+        # type: (float) -> None
+        """
+        Adds elapsed time of publish with number of records the publisher published, even if it failed.
+        :param elapsed_sec:
+        :return:
+        """
+        self._publish_stats.add(elapsed_sec, self.publisher.get_published_count())
+
+    def _snapshot_memory(self, label):
+        # type: (str) -> None
+        if self.memory_guard:
+            self.memory_guard.snapshot(label)
+
+    def _report_memory(self):
+        # type: () -> None
+        if not self.memory_guard:
+            return
+
+        self.memory_guard.report()
+        if self.statsd:
+            for label, rss_bytes in self.memory_guard.peak_rss_bytes.items():
+                self.statsd.gauge('memory.{}.peak_rss_mb'.format(label), float(rss_bytes) / (1024 * 1024))
+
+    def _report_stats(self, stats_list):
+        # type: (List[StageStats]) -> None
+        """
+        Logs statistics of each stage, and emits them through statsd if it's enabled.
+        :param stats_list:
+        :return:
+        """
+        for stats in stats_list:
+            LOGGER.info('Stage {}'.format(stats))
+            if not self.statsd:
+                continue
+
+            self.statsd.timing('{}.elapsed'.format(stats.name), stats.elapsed_sec * 1000)
+            self.statsd.gauge('{}.record_count'.format(stats.name), stats.record_count)
+            self.statsd.gauge('{}.records_per_sec'.format(stats.name), stats.records_per_sec())
+            self.statsd.timing('{}.latency_p50'.format(stats.name), stats.latency_percentile(50) * 1000)
+            self.statsd.timing('{}.latency_p99'.format(stats.name), stats.latency_percentile(99) * 1000)
@@ -0,0 +1,131 @@
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, List, Optional, Tuple  # noqa: F401
+
+from databuilder.job.job import DefaultJob
+from databuilder.publisher.base_publisher import NoopPublisher
+from databuilder.publisher.base_publisher import Publisher  # noqa: F401
+from databuilder.task.base_task import Task  # noqa: F401
+from databuilder.utils.stage_stats import StageStats  # noqa: F401
+
+LOGGER = logging.getLogger(__name__)
+
+# Tasks and their config that live in the worker
+_worker_tasks = []  # type: List[Tuple[Task, ConfigTree]]
+
+
+def _init_worker(tasks):
+    # type: (List[Tuple[Task, ConfigTree]]) -> None
+    global _worker_tasks
+    _worker_tasks = tasks
+
+
+def _run_task(index):
+    # type: (int) -> List[StageStats]
+    """
+    Initializes, runs and closes the task at the index.
+    :param index:
+    :return: Statistics of the task
+    """
+    task, conf = _worker_tasks[index]
+    task.init(conf)
+    try:
+        task.run()
+    finally:
+        task.close()
+    return task.get_stats()
+
+
+class ParallelJob(DefaultJob):
+    """
+    A job that runs multiple tasks concurrently and publishes once all of them are succeeded.
+    Typical use case is to extract from multiple sources (e.g: multiple Hive clusters, or partitions of large source)
+    where each task's FsNeo4jCSVLoader writes into its own sub-directory, and a single Neo4jCsvPublisher publishes all
+    the sub-directories under the configured node and relation directories.
+
+    Each task is initialized with its own config from task_confs, falling back to the job config. Use it to give
+    disjoint output directories to each task's loader.
+
+    Tasks run in a thread pool by default, which suits I/O bound tasks. With job.use_processes, tasks run in a process
+    pool to use multiple cores, in which case tasks and their config need to be picklable on platforms that do not fork.
+    Note that anything that a task registers on Job.closer in a worker process (e.g: FsNeo4jCSVLoader deleting its
+    directories) stays within the worker process and is not run by this job.
+
+    If any task fails, the job fails after the remaining tasks are finished, and nothing is published.
+    """
+    # Config keys
+    PARALLELISM = 'parallelism'
+    USE_PROCESSES = 'use_processes'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({USE_PROCESSES: False})
+
+    def __init__(self,
+                 conf,  # type: ConfigTree
+                 tasks,  # type: List[Task]
+                 publisher=NoopPublisher(),  # type: Publisher
+                 task_confs=None,  # type: Optional[List[ConfigTree]]
+                 ):
+        # type: (...) -> None
+        super(ParallelJob, self).__init__(conf=conf, task=None, publisher=publisher)
+        if task_confs and len(task_confs) != len(tasks):
+            raise Exception('Number of task configs {} does not match with number of tasks {}'
+                            .format(len(task_confs), len(tasks)))
+
+        self.tasks = tasks
+        self._task_confs = [task_conf.with_fallback(conf) for task_conf in task_confs] \
+            if task_confs else [conf] * len(tasks)
+        job_conf = self.scoped_conf.with_fallback(ParallelJob._DEFAULT_CONFIG)
+        self._parallelism = job_conf.get_int(ParallelJob.PARALLELISM, len(tasks))
+        self._use_processes = job_conf.get_bool(ParallelJob.USE_PROCESSES)
+        self._task_stats = []  # type: List[StageStats]
+
+    def _init(self):
+        # type: () -> None
+        """
+        Tasks are initialized in the worker that runs it.
+        """
+        pass
+
+    def _run_task(self):
+        # type: () -> None
+        LOGGER.info('Running {} tasks in {} {}'.format(len(self.tasks), self._parallelism,
+                                                       'processes' if self._use_processes else 'threads'))
+        pool = self._create_pool()
+        try:
+            results = [pool.apply_async(_run_task, (index,)) for index in range(len(self.tasks))]
+            pool.close()
+            self._task_stats = []
+            errors = []
+            for index, result in enumerate(results):
+                try:
+                    self._task_stats.extend(_with_task_prefix(index, result.get()))
+                except Exception as e:
+                    LOGGER.exception('Task {} failed'.format(index))
+                    errors.append(e)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if errors:
+            raise errors[0]
+
+    def _create_pool(self):
+        # type: () -> Any
+        pool_class = multiprocessing.Pool if self._use_processes else ThreadPool
+        return pool_class(processes=self._parallelism,
+                          initializer=_init_worker,
+                          initargs=(list(zip(self.tasks, self._task_confs)),))
+
+    def _get_stats(self):
+        # type: () -> List[StageStats]
+        return self._task_stats + [self._publish_stats]
+
+
+def _with_task_prefix(index, stats_list):
+    # type: (int, List[StageStats]) -> List[StageStats]
+    for stats in stats_list:
+        stats.name = 'task_{}.{}'.format(index, stats.name)
+    return stats_list
@@ -3,7 +3,7 @@ import abc
 from pyhocon import ConfigTree  # noqa: F401
 
 from databuilder import Scoped
-from typing import Any  # noqa: F401
+from typing import Any, Iterable  # noqa: F401
 
 
 class Loader(Scoped):
@@ -20,6 +20,37 @@ class Loader(Scoped):
         # type: (Any) -> None
         pass
 
+    def load_batch(self, records):
+        # type: (Iterable[Any]) -> None
+        """
+        Loads multiple records at once. Loader that can amortize the cost across records (e.g. writing multiple
+        rows at once) is expected to override this. By default, it falls back to load().
+        :param records:
+        :return:
+        """
+        for record in records:
+            self.load(record)
+
+    def get_checkpoint(self):
+        # type: () -> Any
+        """
+        Flushes what's loaded so far and provides its position (e.g. file offsets) so that loader can resume from it.
+        Loader that can resume is expected to override this along with restore_checkpoint. The checkpoint needs to be
+        JSON serializable.
+        :return: Checkpoint or None if checkpoint is not supported
+        """
+        return None
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Any) -> None
+        """
+        Makes loader resume from the position of checkpoint provided by get_checkpoint, discarding anything loaded
+        after it. It is called before init.
+        :param checkpoint:
+        :return:
+        """
+        pass
+
     def get_scope(self):
         # type: () -> str
         return 'loader'
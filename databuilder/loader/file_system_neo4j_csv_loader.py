@@ -4,14 +4,16 @@ import os
 import shutil
 from csv import DictWriter  # noqa: F401
 
+import six
 from pyhocon import ConfigTree, ConfigFactory  # noqa: F401
-from typing import Dict, Any  # noqa: F401
+from typing import Dict, Any, Iterable, List, Optional, Set  # noqa: F401
 
 from databuilder.job.base_job import Job
 from databuilder.loader.base_loader import Loader
 from databuilder.models.neo4j_csv_serde import NODE_LABEL, \
     RELATION_START_LABEL, RELATION_END_LABEL, RELATION_TYPE
 from databuilder.models.neo4j_csv_serde import Neo4jCsvSerializable  # noqa: F401
+from databuilder.utils import csv_manifest
 from databuilder.utils.closer import Closer
 
 LOGGER = logging.getLogger(__name__)
@@ -22,22 +24,46 @@ class FsNeo4jCSVLoader(Loader):
     Write node and relationship CSV file(s) that can be consumed by
     Neo4jCsvPublisher.
     It assumes that the record it consumes is instance of Neo4jCsvSerializable
+
+    It supports checkpoint by file offsets. When resumed, it truncates the files in existing directories to the
+    offsets of checkpoint and appends to them. As the directories need to survive the failed job, set
+    delete_created_directories to False when it's used with checkpoint.
+
+    With rotate_segment_rows, it writes files as segments for streaming publish: a file being written is hidden
+    (prefixed with '.'), and once it reaches rotate_segment_rows rows or the loader is closed, it's closed and renamed
+    to {sequence}_{file name} where the sequence is shared by nodes and relationships. Before a relationship segment
+    is rotated, all node files are rotated, so that publishing segments in sequence order publishes nodes before the
+    relationships that are loaded after them. Checkpoint is not supported with rotation.
+
+    When it's closed, it writes a manifest into each directory with labels, header, row count and byte size of each
+    file, so that Neo4jCsvPublisher does not need to scan the files for them. (see databuilder.utils.csv_manifest)
+    Files resumed from checkpoint are not in the manifest, as their rows written before the checkpoint are not counted.
     """
     # Config keys
     NODE_DIR_PATH = 'node_dir_path'
     RELATION_DIR_PATH = 'relationship_dir_path'
     FORCE_CREATE_DIR = 'force_create_directory'
     SHOULD_DELETE_CREATED_DIR = 'delete_created_directories'
+    # Number of rows of a file to rotate it as a segment. 0 disables rotation.
+    ROTATE_SEGMENT_ROWS = 'rotate_segment_rows'
 
     _DEFAULT_CONFIG = ConfigFactory.from_dict({
         SHOULD_DELETE_CREATED_DIR: True,
-        FORCE_CREATE_DIR: False
+        FORCE_CREATE_DIR: False,
+        ROTATE_SEGMENT_ROWS: 0
     })
 
     def __init__(self):
         # type: () -> None
         self._node_file_mapping = {}  # type: Dict[Any, DictWriter]
         self._relation_file_mapping = {}  # type: Dict[Any, DictWriter]
+        self._file_outs = {}  # type: Dict[DictWriter, Any]
+        self._row_counts = {}  # type: Dict[DictWriter, int]
+        # Labels and row count of each file for manifest
+        self._file_stats = {}  # type: Dict[DictWriter, Dict[str, Any]]
+        self._manifests = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
+        self._segment_seq = 0
+        self._checkpoint = None  # type: Any
         self._closer = Closer()
 
     def init(self, conf):
@@ -58,6 +84,13 @@ class FsNeo4jCSVLoader(Loader):
         self._delete_created_dir = \
             conf.get_bool(FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR)
         self._force_create_dir = conf.get_bool(FsNeo4jCSVLoader.FORCE_CREATE_DIR)
+        self._rotate_segment_rows = conf.get_int(FsNeo4jCSVLoader.ROTATE_SEGMENT_ROWS)
+        if self._checkpoint:
+            if self._rotate_segment_rows:
+                raise Exception('Checkpoint is not supported with {}'.format(FsNeo4jCSVLoader.ROTATE_SEGMENT_ROWS))
+            self._resume_from_checkpoint()
+            return
+
         self._create_directory(self._node_dir)
         self._create_directory(self._relation_dir)
 
@@ -77,7 +110,10 @@ class FsNeo4jCSVLoader(Loader):
                 raise RuntimeError('Directory should not exist: {}'.format(path))
 
         os.makedirs(path)
+        self._register_delete_dir(path)
 
+    def _register_delete_dir(self, path):
+        # type: (str) -> None
         def _delete_dir():
             # type: () -> None
             if not self._delete_created_dir:
@@ -118,6 +154,9 @@ class FsNeo4jCSVLoader(Loader):
                                            self._node_dir,
                                            file_suffix)
             node_writer.writerow(node_dict)
+            self._update_file_stats(node_writer, [node_dict[NODE_LABEL]])
+            if self._is_segment_full(node_writer):
+                self._rotate_segment(self._node_file_mapping, key)
             node_dict = csv_serializable.next_node()
 
         relation_dict = csv_serializable.next_relation()
@@ -134,6 +173,12 @@ class FsNeo4jCSVLoader(Loader):
                                                self._relation_dir,
                                                file_suffix)
             relation_writer.writerow(relation_dict)
+            self._update_file_stats(relation_writer,
+                                    [relation_dict[RELATION_START_LABEL], relation_dict[RELATION_END_LABEL]])
+            if self._is_segment_full(relation_writer):
+                # Nodes that the relationship segment depends on need to be in preceding segments
+                self._rotate_segments(self._node_file_mapping)
+                self._rotate_segment(self._relation_file_mapping, key2)
             relation_dict = csv_serializable.next_relation()
 
     def _get_writer(self,
@@ -160,7 +205,59 @@ class FsNeo4jCSVLoader(Loader):
             return writer
 
         LOGGER.info('Creating file for {}'.format(key))
-        file_out = open('{}/{}.csv'.format(dir_path, file_suffix), 'w')
+        # A segment is hidden until it's rotated so that publisher does not pick it up while it's being written
+        file_name = '.{}.csv' if self._rotate_segment_rows else '{}.csv'
+        writer = self._open_writer('{}/{}'.format(dir_path, file_name.format(file_suffix)),
+                                   list(csv_record_dict.keys()))
+        file_mapping[key] = writer
+        self._file_stats[writer] = {csv_manifest.LABELS: set(), csv_manifest.ROW_COUNT: 0}
+
+        return writer
+
+    def _update_file_stats(self, writer, labels):
+        # type: (DictWriter, List[str]) -> None
+        stats = self._file_stats.get(writer)
+        if stats is None:
+            # Resumed from checkpoint
+            return
+
+        stats[csv_manifest.LABELS].update(labels)
+        stats[csv_manifest.ROW_COUNT] += 1
+
+    def _add_manifest_entry(self, writer, path):
+        # type: (DictWriter, str) -> None
+        """
+        Adds manifest entry of the closed file.
+        :param writer:
+        :param path: Path of the file
+        :return:
+        """
+        stats = self._file_stats.pop(writer, None)
+        if stats is None:
+            return
+
+        dir_path, file_name = os.path.split(path)
+        self._manifests.setdefault(dir_path, {})[file_name] = {
+            csv_manifest.LABELS: sorted(stats[csv_manifest.LABELS]),
+            csv_manifest.HEADER: list(writer.fieldnames),
+            csv_manifest.ROW_COUNT: stats[csv_manifest.ROW_COUNT],
+            csv_manifest.BYTE_SIZE: os.path.getsize(path)
+        }
+
+    def _open_writer(self,
+                     path,  # type: str
+                     fieldnames,  # type: List[str]
+                     append=False,  # type: bool
+                     ):
+        # type: (...) -> DictWriter
+        """
+        Opens a csv writer on the path. Header is written only if it's a new file.
+        :param path:
+        :param fieldnames:
+        :param append: Appends to existing file
+        :return:
+        """
+        file_out = open(path, 'a' if append else 'w')
 
         def file_out_close():
             # type: () -> None
@@ -168,21 +265,124 @@ class FsNeo4jCSVLoader(Loader):
             file_out.close()
         self._closer.register(file_out_close)
 
-        writer = csv.DictWriter(file_out, fieldnames=csv_record_dict.keys(),
+        writer = csv.DictWriter(file_out, fieldnames=fieldnames,
                                 quoting=csv.QUOTE_NONNUMERIC)
-        writer.writeheader()
-        file_mapping[key] = writer
+        if not append:
+            writer.writeheader()
+        self._file_outs[writer] = file_out
 
         return writer
 
+    def _is_segment_full(self, writer):
+        # type: (DictWriter) -> bool
+        if not self._rotate_segment_rows:
+            return False
+
+        self._row_counts[writer] = self._row_counts.get(writer, 0) + 1
+        return self._row_counts[writer] >= self._rotate_segment_rows
+
+    def _rotate_segments(self, file_mapping):
+        # type: (Dict[Any, DictWriter]) -> None
+        for key in sorted(file_mapping.keys()):
+            self._rotate_segment(file_mapping, key)
+
+    def _rotate_segment(self,
+                        file_mapping,  # type: Dict[Any, DictWriter]
+                        key,  # type: Any
+                        ):
+        # type: (...) -> None
+        """
+        Closes the file of the key and renames it with the next sequence so that publisher can pick it up. Next row of
+        the key goes to a new file.
+        :param file_mapping:
+        :param key:
+        :return:
+        """
+        writer = file_mapping.pop(key)
+        self._row_counts.pop(writer, None)
+        file_out = self._file_outs.pop(writer)
+        file_out.close()
+
+        dir_path, file_name = os.path.split(file_out.name)
+        segment_path = os.path.join(dir_path, '{:08d}_{}'.format(self._segment_seq, file_name.lstrip('.')))
+        self._segment_seq += 1
+        os.rename(file_out.name, segment_path)
+        self._add_manifest_entry(writer, segment_path)
+        LOGGER.info('Rotated segment {}'.format(segment_path))
+
+    def get_checkpoint(self):
+        # type: () -> Optional[Dict[str, List[Dict[str, Any]]]]
+        """
+        Flushes all the files and provides their offsets along with the key and header of each file.
+        :return: Checkpoint. None if segments are rotated, as rotated segments may have been published already.
+        """
+        if self._rotate_segment_rows:
+            return None
+
+        checkpoint = {}
+        for name, file_mapping in [('nodes', self._node_file_mapping), ('relations', self._relation_file_mapping)]:
+            entries = []
+            for key, writer in six.iteritems(file_mapping):
+                file_out = self._file_outs[writer]
+                file_out.flush()
+                os.fsync(file_out.fileno())
+                entries.append({'key': list(key),
+                                'path': file_out.name,
+                                'fieldnames': list(writer.fieldnames),
+                                'offset': file_out.tell()})
+            checkpoint[name] = entries
+        return checkpoint
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Dict[str, List[Dict[str, Any]]]) -> None
+        self._checkpoint = checkpoint
+
+    def _resume_from_checkpoint(self):
+        # type: () -> None
+        """
+        Truncates the files to the offsets in checkpoint and reopens them for appending. Files created after the
+        checkpoint are removed.
+        :return:
+        """
+        for path in [self._node_dir, self._relation_dir]:
+            if not os.path.isdir(path):
+                raise RuntimeError('Directory to resume from does not exist: {}'.format(path))
+
+        checkpointed_paths = set()  # type: Set[str]
+        for name, file_mapping in [('nodes', self._node_file_mapping), ('relations', self._relation_file_mapping)]:
+            for entry in self._checkpoint[name]:
+                LOGGER.info('Resuming {} from offset {}'.format(entry['path'], entry['offset']))
+                with open(entry['path'], 'a') as file_out:
+                    file_out.truncate(entry['offset'])
+                file_mapping[tuple(entry['key'])] = self._open_writer(entry['path'], entry['fieldnames'],
+                                                                      append=True)
+                checkpointed_paths.add(entry['path'])
+
+        for dir_path in [self._node_dir, self._relation_dir]:
+            for file_name in os.listdir(dir_path):
+                path = '{}/{}'.format(dir_path, file_name)
+                if path not in checkpointed_paths:
+                    LOGGER.info('Removing {} created after checkpoint'.format(path))
+                    os.remove(path)
+            self._register_delete_dir(dir_path)
+
     def close(self):
         # type: () -> None
         """
-        Any closeable callable registered in _closer, it will close.
+        Any closeable callable registered in _closer, it will close. With rotation, remaining files are rotated as
+        the last segments. Manifest is written once all the files are closed.
         :return:
         """
+        if self._rotate_segment_rows:
+            self._rotate_segments(self._node_file_mapping)
+            self._rotate_segments(self._relation_file_mapping)
         self._closer.close()
 
+        for writer, file_out in six.iteritems(self._file_outs):
+            self._add_manifest_entry(writer, file_out.name)
+        for dir_path, entries in six.iteritems(self._manifests):
+            csv_manifest.write_manifest(dir_path, entries)
+
     def get_scope(self):
         # type: () -> str
         return "loader.filesystem_csv_neo4j"
@@ -1,3 +1,4 @@
+import threading
 from collections import namedtuple
 
 from typing import Iterable, Any, Union, Iterator, Dict, Set  # noqa: F401
@@ -97,6 +98,8 @@ class TableMetadata(Neo4jCsvSerializable):
     # Only for deduping database, cluster, and schema (table and column will be always processed)
     serialized_nodes = set()  # type: Set[Any]
     serialized_rels = set()  # type: Set[Any]
+    # Guards dedupe sets above as TableMetadata can be serialized by multiple tasks concurrently. (e.g: ParallelJob)
+    _serialized_lock = threading.Lock()
 
     def __init__(self,
                  database,  # type: str
@@ -137,6 +140,23 @@ class TableMetadata(Neo4jCsvSerializable):
                                                                                 self.columns,
                                                                                 self.is_view)
 
+    def __getstate__(self):
+        # type: () -> Dict[str, Any]
+        """
+        Excludes node and relation iterators as generator cannot be pickled, so that TableMetadata can be passed
+        across processes. (e.g: ShardedExtractor) Iterators start over when unpickled.
+        """
+        state = self.__dict__.copy()
+        del state['_node_iterator']
+        del state['_relation_iterator']
+        return state
+
+    def __setstate__(self, state):
+        # type: (Dict[str, Any]) -> None
+        self.__dict__.update(state)
+        self._node_iterator = self._create_next_node()
+        self._relation_iterator = self._create_next_relation()
+
     def _get_table_key(self):
         # type: () -> str
         return TableMetadata.TABLE_KEY_FORMAT.format(db=self.database,
@@ -230,14 +250,28 @@ class TableMetadata(Neo4jCsvSerializable):
                   ]
 
         for node_tuple in others:
-            if node_tuple not in TableMetadata.serialized_nodes:
-                TableMetadata.serialized_nodes.add(node_tuple)
+            if TableMetadata._mark_serialized(TableMetadata.serialized_nodes, node_tuple):
                 yield {
                     NODE_LABEL: node_tuple.label,
                     NODE_KEY: node_tuple.key,
                     'name': node_tuple.name
                 }
 
+    @staticmethod
+    def _mark_serialized(serialized, item):
+        # type: (Set[Any], Any) -> bool
+        """
+        Atomically adds item into the dedupe set.
+        :param serialized: dedupe set
+        :param item:
+        :return: True if item has not been serialized before
+        """
+        with TableMetadata._serialized_lock:
+            if item in serialized:
+                return False
+            serialized.add(item)
+            return True
+
     def create_next_relation(self):
         # type: () -> Union[Dict[str, Any], None]
         try:
@@ -305,8 +339,7 @@ class TableMetadata(Neo4jCsvSerializable):
         ]
 
         for rel_tuple in others:
-            if rel_tuple not in TableMetadata.serialized_rels:
-                TableMetadata.serialized_rels.add(rel_tuple)
+            if TableMetadata._mark_serialized(TableMetadata.serialized_rels, rel_tuple):
                 yield {
                     RELATION_START_LABEL: rel_tuple.start_label,
                     RELATION_END_LABEL: rel_tuple.end_label,
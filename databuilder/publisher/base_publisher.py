@@ -47,6 +47,43 @@ class Publisher(Scoped):
         """
         pass
 
+    def get_published_count(self):
+        # type: () -> int
+        """
+        Number of records published so far, including the ones published before a failure. It's used for publish
+        statistics of the job. Publisher that keeps track of it is expected to override this.
+        :return:
+        """
+        return 0
+
+    def supports_streaming(self):
+        # type: () -> bool
+        """
+        Whether publisher can publish output of the task while the task is still running. (e.g: DefaultJob with
+        is_streaming_publish)
+        :return:
+        """
+        return False
+
+    def begin_stream(self):
+        # type: () -> None
+        """
+        Switches publisher into streaming mode, where publish keeps publishing output of the task as it becomes
+        available, until end_stream is called. It's called after init and before publish.
+        :return: None
+        """
+        raise NotImplementedError('{} does not support streaming'.format(self.__class__.__name__))
+
+    def end_stream(self, is_success=True):
+        # type: (bool) -> None
+        """
+        Signals that the task is finished, so that publish returns after publishing the rest of the output. If the
+        task failed, publish stops without publishing the rest, and fails.
+        :param is_success: Whether the task succeeded
+        :return: None
+        """
+        pass
+
     def register_call_back(self, callback):
         # type: (Callback) -> None
         """
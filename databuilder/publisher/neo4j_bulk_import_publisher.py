@@ -0,0 +1,421 @@
+import csv
+import logging
+import os
+from os.path import basename, join, relpath, splitext
+from string import Template
+
+import six
+from pyhocon import ConfigFactory  # noqa: F401
+from pyhocon import ConfigTree  # noqa: F401
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple  # noqa: F401
+
+from databuilder.publisher.base_publisher import Publisher
+from databuilder.publisher.neo4j_csv_publisher import NODE_FILES_DIR, RELATION_FILES_DIR, JOB_PUBLISH_TAG, \
+    NODE_KEY_KEY, NODE_LABEL_KEY, NODE_REQUIRED_KEYS, RELATION_START_KEY, RELATION_START_LABEL, RELATION_END_KEY, \
+    RELATION_END_LABEL, RELATION_TYPE, RELATION_REVERSE_TYPE, RELATION_REQUIRED_KEYS, UNQUOTED_SUFFIX, \
+    PUBLISHED_TAG_PROPERTY_NAME, CREATE_UNIQUE_INDEX_TEMPLATE, _parse_unquoted_value
+
+# Directory where converted CSV files and the import script are written into
+IMPORT_DIR = 'import_directory'
+
+# Either admin_import, which converts CSV files for neo4j-admin import, or load_csv, which generates LOAD CSV script
+IMPORT_MODE = 'mode'
+ADMIN_IMPORT_MODE = 'admin_import'
+LOAD_CSV_MODE = 'load_csv'
+
+# Path of neo4j-admin and cypher-shell executables used in the import command
+NEO4J_ADMIN_PATH = 'neo4j_admin_path'
+CYPHER_SHELL_PATH = 'cypher_shell_path'
+
+# Name of the database that neo4j-admin import creates
+NEO4J_DATABASE = 'neo4j_database'
+
+# Number of rows per transaction of LOAD CSV
+PERIODIC_COMMIT_SIZE = 'periodic_commit_size'
+
+# URL prefix of the converted files in LOAD CSV. By default, Neo4j only loads files from its import directory
+# (dbms.directories.import), where URL is relative to it. Point it to import_directory (or copy the directory into it).
+LOAD_CSV_URL_PREFIX = 'load_csv_url_prefix'
+
+DEFAULT_CONFIG = ConfigFactory.from_dict({IMPORT_MODE: ADMIN_IMPORT_MODE,
+                                          NEO4J_ADMIN_PATH: 'neo4j-admin',
+                                          CYPHER_SHELL_PATH: 'cypher-shell',
+                                          NEO4J_DATABASE: 'graph.db',
+                                          PERIODIC_COMMIT_SIZE: 10000,
+                                          LOAD_CSV_URL_PREFIX: 'file:///'})
+
+# Files generated in import directory
+IMPORT_SCRIPT_FILE_NAME = 'import.sh'
+CONSTRAINTS_FILE_NAME = 'constraints.cypher'
+LOAD_CSV_FILE_NAME = 'load.cypher'
+
+# Type of UNQUOTED column that is not boolean nor number
+STRING_TYPE = 'string'
+
+NODE_LOAD_CSV_TEMPLATE = Template("""USING PERIODIC COMMIT ${SIZE}
+LOAD CSV WITH HEADERS FROM '${URL}' AS row
+MERGE (node:${LABEL} {key: row.key})
+SET ${prop_body};""")
+
+RELATION_LOAD_CSV_TEMPLATE = Template("""USING PERIODIC COMMIT ${SIZE}
+LOAD CSV WITH HEADERS FROM '${URL}' AS row
+MATCH (n1:${START_LABEL} {key: row.start_key}), (n2:${END_LABEL} {key: row.end_key})
+MERGE (n1)-[r:${TYPE}]->(n2)
+SET ${prop_body};""")
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Neo4jBulkImportPublisher(Publisher):
+    """
+    A Publisher that imports output of FsNeo4jCSVLoader into empty Neo4j at once, which is far faster than
+    Neo4jCsvPublisher merging it row by row. Use it for first load or full rebuild of the graph.
+
+    It converts node and relation CSV files into import directory, and writes the import command in import.sh.
+    It does not run the command, as neo4j-admin import needs the database to be stopped.
+
+    In admin_import mode (default), files are converted into neo4j-admin import format.
+    1. Node keys are in ID space per label (key:ID(Label)) as keys are unique per label, and the label is in :LABEL.
+    2. Relations are expanded into both directions (TYPE and REVERSE_TYPE) with :START_ID(Label) / :END_ID(Label),
+       and the type is in :TYPE.
+    3. UNQUOTED columns are typed (e.g: order_pos:long) when all the values in the file are of the same type.
+    4. Duplicate nodes and relations to missing nodes are ignored as MERGE of Neo4jCsvPublisher does.
+    Unique constraints are not created by neo4j-admin import. Run constraints.cypher once the database is started.
+
+    In load_csv mode, files are converted into plain CSV files, and load.cypher with a LOAD CSV and USING PERIODIC
+    COMMIT statement per file is generated. It creates unique constraints first so that MERGE is backed by index.
+
+    In both modes, published_tag of the job is set to all nodes and relations so that Neo4jStalenessRemovalTask
+    works on the imported graph.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        super(Neo4jBulkImportPublisher, self).__init__()
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        conf = conf.with_fallback(DEFAULT_CONFIG)
+
+        self._node_files = self._list_files(conf, NODE_FILES_DIR)
+        self._relation_files = self._list_files(conf, RELATION_FILES_DIR)
+        self._import_dir = conf.get_string(IMPORT_DIR)
+
+        self._mode = conf.get_string(IMPORT_MODE)
+        if self._mode not in (ADMIN_IMPORT_MODE, LOAD_CSV_MODE):
+            raise Exception('{} should be either {} or {}'.format(IMPORT_MODE, ADMIN_IMPORT_MODE, LOAD_CSV_MODE))
+
+        self._neo4j_admin_path = conf.get_string(NEO4J_ADMIN_PATH)
+        self._cypher_shell_path = conf.get_string(CYPHER_SHELL_PATH)
+        self._database = conf.get_string(NEO4J_DATABASE)
+        self._periodic_commit_size = conf.get_int(PERIODIC_COMMIT_SIZE)
+        self._load_csv_url_prefix = conf.get_string(LOAD_CSV_URL_PREFIX)
+
+        self.publish_tag = conf.get_string(JOB_PUBLISH_TAG)  # type: str
+        if not self.publish_tag:
+            raise Exception('{} should not be empty'.format(JOB_PUBLISH_TAG))
+
+        self.labels = set()  # type: Set[str]
+        self.import_command = None  # type: Optional[str]
+        self._converted_file_count = 0
+
+    def _list_files(self, conf, path_key):
+        # type: (ConfigTree, str) -> List[str]
+        """
+        List files from directory, including files in its sub-directories. Hidden files (e.g: manifest) are ignored.
+        :param conf:
+        :param path_key:
+        :return: List of file paths
+        """
+        if path_key not in conf:
+            return []
+
+        files = []  # type: List[str]
+        for dir_path, _, file_names in os.walk(conf.get_string(path_key)):
+            files.extend(join(dir_path, f) for f in sorted(file_names) if not f.startswith('.'))
+        return files
+
+    def publish_impl(self):
+        # type: () -> None
+        """
+        Converts node and relation files, and writes the import script.
+        :return:
+        """
+        for sub_dir in ('nodes', 'relations'):
+            path = join(self._import_dir, sub_dir)
+            if not os.path.exists(path):
+                os.makedirs(path)
+
+        node_files = []  # type: List[Tuple[str, str, List[Tuple[str, str]]]]
+        for node_file in self._node_files:
+            node_files.extend(self._convert_node_file(node_file))
+
+        relation_files = []  # type: List[Tuple[str, Tuple[str, str, str], List[Tuple[str, str]]]]
+        for relation_file in self._relation_files:
+            relation_files.extend(self._convert_relation_file(relation_file))
+
+        constraints = ['{};'.format(CREATE_UNIQUE_INDEX_TEMPLATE.substitute(LABEL=label))
+                       for label in sorted(self.labels)]
+        if self._mode == ADMIN_IMPORT_MODE:
+            self._write_file(CONSTRAINTS_FILE_NAME, constraints)
+            self.import_command = self._create_admin_import_command([path for path, _, _ in node_files],
+                                                                    [path for path, _, _ in relation_files])
+        else:
+            statements = constraints + [self._create_node_load_csv_statement(path, label, props)
+                                        for path, label, props in node_files]
+            statements.extend(self._create_relation_load_csv_statement(path, labels_and_type, props)
+                              for path, labels_and_type, props in relation_files)
+            self._write_file(LOAD_CSV_FILE_NAME, statements)
+            self.import_command = 'cat {} | {}'.format(join(self._import_dir, LOAD_CSV_FILE_NAME),
+                                                       self._cypher_shell_path)
+
+        self._write_file(IMPORT_SCRIPT_FILE_NAME, ['#!/bin/sh', self.import_command])
+        LOGGER.info('Converted {} node files and {} relation files. Import with: {}'
+                    .format(len(node_files), len(relation_files), self.import_command))
+
+    def _convert_node_file(self, node_file):
+        # type: (str) -> List[Tuple[str, str, List[Tuple[str, str]]]]
+        """
+        Converts node file into a file per label, as ID space is defined per file.
+        :param node_file:
+        :return: List of converted file path, its label, and its properties with type
+        """
+        props = self._get_props(node_file, NODE_REQUIRED_KEYS)
+        converted = []  # type: List[Tuple[str, str, List[Tuple[str, str]]]]
+        writers = {}  # type: Dict[str, Any]
+        file_outs = []  # type: List[Any]
+        try:
+            with open(node_file, 'r') as node_csv:
+                for node_record in csv.DictReader(node_csv):
+                    label = node_record[NODE_LABEL_KEY]
+                    if label not in writers:
+                        path = self._get_converted_path('nodes', node_file)
+                        file_out = open(path, 'w')
+                        file_outs.append(file_out)
+                        writers[label] = csv.writer(file_out)
+                        writers[label].writerow(self._create_node_header(label, props))
+                        converted.append((path, label, props))
+                        self.labels.add(label)
+
+                    writers[label].writerow([node_record[NODE_KEY_KEY]] +
+                                            [self._convert_value(node_record, k) for k, _ in props] +
+                                            [self.publish_tag] +
+                                            ([label] if self._mode == ADMIN_IMPORT_MODE else []))
+        finally:
+            for file_out in file_outs:
+                file_out.close()
+        return converted
+
+    def _convert_relation_file(self, relation_file):
+        # type: (str) -> List[Tuple[str, Tuple[str, str, str], List[Tuple[str, str]]]]
+        """
+        Converts relation file into a file per start label, end label and type, where each relation is expanded into
+        both directions.
+        :param relation_file:
+        :return: List of converted file path, its start label, end label and type, and its properties with type
+        """
+        props = self._get_props(relation_file, RELATION_REQUIRED_KEYS)
+        converted = []  # type: List[Tuple[str, Tuple[str, str, str], List[Tuple[str, str]]]]
+        writers = {}  # type: Dict[Tuple[str, str, str], Any]
+        file_outs = []  # type: List[Any]
+        try:
+            with open(relation_file, 'r') as relation_csv:
+                for rel_record in csv.DictReader(relation_csv):
+                    values = [self._convert_value(rel_record, k) for k, _ in props] + [self.publish_tag]
+                    directions = [(rel_record[RELATION_START_LABEL], rel_record[RELATION_END_LABEL],
+                                   rel_record[RELATION_TYPE], rel_record[RELATION_START_KEY],
+                                   rel_record[RELATION_END_KEY]),
+                                  (rel_record[RELATION_END_LABEL], rel_record[RELATION_START_LABEL],
+                                   rel_record[RELATION_REVERSE_TYPE], rel_record[RELATION_END_KEY],
+                                   rel_record[RELATION_START_KEY])]
+                    for start_label, end_label, rel_type, start_key, end_key in directions:
+                        key = (start_label, end_label, rel_type)
+                        if key not in writers:
+                            path = self._get_converted_path('relations', relation_file)
+                            file_out = open(path, 'w')
+                            file_outs.append(file_out)
+                            writers[key] = csv.writer(file_out)
+                            writers[key].writerow(self._create_relation_header(start_label, end_label, props))
+                            converted.append((path, key, props))
+
+                        writers[key].writerow([start_key, end_key] + values +
+                                              ([rel_type] if self._mode == ADMIN_IMPORT_MODE else []))
+        finally:
+            for file_out in file_outs:
+                file_out.close()
+        return converted
+
+    def _get_converted_path(self, sub_dir, path):
+        # type: (str, str) -> str
+        """
+        Numbers converted files, as a file is converted into multiple files and files from different sub-directories
+        may have the same name.
+        """
+        self._converted_file_count += 1
+        return join(self._import_dir, sub_dir,
+                    '{}_{}.csv'.format(self._converted_file_count, splitext(basename(path))[0]))
+
+    def _get_props(self, path, excludes):
+        # type: (str, Iterable[str]) -> List[Tuple[str, str]]
+        """
+        Reads properties from the header of the file. Type of UNQUOTED property is inferred from all its values in the
+        file, as it needs to be the same for the column.
+        :param path:
+        :param excludes: set of excluded columns that are not properties (e.g: KEY, LABEL ...)
+        :return: List of property name and its type
+        """
+        with open(path, 'r') as csv_file:
+            reader = csv.DictReader(csv_file)
+            header = [k for k in reader.fieldnames if k not in excludes]
+            types = {k: None for k in header if k.endswith(UNQUOTED_SUFFIX)}  # type: Dict[str, Optional[str]]
+            for record in reader:
+                for k, current_type in six.iteritems(types):
+                    types[k] = _merge_type(current_type, _parse_unquoted_value(record[k]))
+
+        return [(k, types.get(k) or STRING_TYPE) for k in header]
+
+    def _convert_value(self, record, key):
+        # type: (Dict[str, str], str) -> str
+        if not key.endswith(UNQUOTED_SUFFIX):
+            return record[key]
+
+        value = _parse_unquoted_value(record[key])
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return six.text_type(value)
+
+    def _create_node_header(self, label, props):
+        # type: (str, List[Tuple[str, str]]) -> List[str]
+        if self._mode == ADMIN_IMPORT_MODE:
+            return (['key:ID({})'.format(label)] +
+                    [_get_admin_import_column(k, prop_type) for k, prop_type in props] +
+                    [PUBLISHED_TAG_PROPERTY_NAME, ':LABEL'])
+        return ['key'] + [_get_prop_name(k) for k, _ in props] + [PUBLISHED_TAG_PROPERTY_NAME]
+
+    def _create_relation_header(self, start_label, end_label, props):
+        # type: (str, str, List[Tuple[str, str]]) -> List[str]
+        if self._mode == ADMIN_IMPORT_MODE:
+            return ([':START_ID({})'.format(start_label), ':END_ID({})'.format(end_label)] +
+                    [_get_admin_import_column(k, prop_type) for k, prop_type in props] +
+                    [PUBLISHED_TAG_PROPERTY_NAME, ':TYPE'])
+        return ['start_key', 'end_key'] + [_get_prop_name(k) for k, _ in props] + [PUBLISHED_TAG_PROPERTY_NAME]
+
+    def _create_admin_import_command(self, node_files, relation_files):
+        # type: (List[str], List[str]) -> str
+        """
+        Creates neo4j-admin import command. Node keys are strings, and labels and relation types are given by :LABEL
+        and :TYPE columns of the files.
+        :param node_files:
+        :param relation_files:
+        :return:
+        """
+        args = [self._neo4j_admin_path, 'import',
+                '--database={}'.format(self._database),
+                '--id-type=STRING',
+                '--ignore-duplicate-nodes=true',
+                '--ignore-missing-nodes=true']
+        args.extend('--nodes={}'.format(path) for path in node_files)
+        args.extend('--relationships={}'.format(path) for path in relation_files)
+        return ' '.join(args)
+
+    def _create_node_load_csv_statement(self, path, label, props):
+        # type: (str, str, List[Tuple[str, str]]) -> str
+        prop_body = self._create_props_body(props, 'node')
+        return NODE_LOAD_CSV_TEMPLATE.substitute(SIZE=self._periodic_commit_size,
+                                                 URL=self._get_url(path),
+                                                 LABEL=label,
+                                                 prop_body=prop_body)
+
+    def _create_relation_load_csv_statement(self, path, labels_and_type, props):
+        # type: (str, Tuple[str, str, str], List[Tuple[str, str]]) -> str
+        start_label, end_label, rel_type = labels_and_type
+        prop_body = self._create_props_body(props, 'r')
+        return RELATION_LOAD_CSV_TEMPLATE.substitute(SIZE=self._periodic_commit_size,
+                                                     URL=self._get_url(path),
+                                                     START_LABEL=start_label,
+                                                     END_LABEL=end_label,
+                                                     TYPE=rel_type,
+                                                     prop_body=prop_body)
+
+    def _create_props_body(self, props, identifier):
+        # type: (List[Tuple[str, str]], str) -> str
+        """
+        Creates properties body of LOAD CSV statement, where typed property is converted from string.
+
+        e.g: node.name = row.name, node.order_pos = toInteger(row.order_pos), node.published_tag = row.published_tag
+
+        :param props: List of property name and its type
+        :param identifier: identifier that will be used in CYPHER query as shown on above example
+        :return: Properties body for Cypher statement
+        """
+        body = []
+        for k, prop_type in props + [(PUBLISHED_TAG_PROPERTY_NAME, STRING_TYPE)]:
+            name = _get_prop_name(k)
+            value = _get_load_csv_value('row.{}'.format(name), prop_type)
+            body.append('{id}.{name} = {value}'.format(id=identifier, name=name, value=value))
+        return ', '.join(body)
+
+    def _get_url(self, path):
+        # type: (str) -> str
+        return '{}{}'.format(self._load_csv_url_prefix, relpath(path, self._import_dir))
+
+    def _write_file(self, file_name, lines):
+        # type: (str, List[str]) -> None
+        with open(join(self._import_dir, file_name), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def get_scope(self):
+        # type: () -> str
+        return 'publisher.neo4j_bulk_import'
+
+
+def _merge_type(current_type, value):
+    # type: (Optional[str], Any) -> Optional[str]
+    """
+    Merges type of the value into the type of the column so far. Integer and float become float, and any other mix
+    becomes string. Null does not change the type.
+    :param current_type: None if there's no value yet
+    :param value: Value of UNQUOTED column
+    :return:
+    """
+    if value is None:
+        return current_type
+
+    if isinstance(value, bool):
+        value_type = 'boolean'
+    elif isinstance(value, six.integer_types):
+        value_type = 'long'
+    elif isinstance(value, float):
+        value_type = 'double'
+    else:
+        value_type = STRING_TYPE
+
+    if current_type is None or current_type == value_type:
+        return value_type
+    if {current_type, value_type} == {'long', 'double'}:
+        return 'double'
+    return STRING_TYPE
+
+
+def _get_prop_name(key):
+    # type: (str) -> str
+    return key[:-len(UNQUOTED_SUFFIX)] if key.endswith(UNQUOTED_SUFFIX) else key
+
+
+def _get_admin_import_column(key, prop_type):
+    # type: (str, str) -> str
+    name = _get_prop_name(key)
+    return name if prop_type == STRING_TYPE else '{}:{}'.format(name, prop_type)
+
+
+def _get_load_csv_value(value, prop_type):
+    # type: (str, str) -> str
+    if prop_type == 'long':
+        return 'toInteger({})'.format(value)
+    if prop_type == 'double':
+        return 'toFloat({})'.format(value)
+    if prop_type == 'boolean':
+        return "({} = 'true')".format(value)
+    return value
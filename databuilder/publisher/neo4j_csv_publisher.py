@@ -1,18 +1,33 @@
-import copy
+import collections
 import csv
+import functools
+import hashlib
+import json
 import logging
+import os
+import shutil
+import tempfile
+import threading
 import time
-from os import listdir
-from os.path import isfile, join
+import zlib
+from multiprocessing.pool import ThreadPool
+from os import walk
+from os.path import basename, dirname, getsize, join
 from string import Template
 
 import six
-from neo4j.v1 import GraphDatabase, Transaction  # noqa: F401
+from neo4j.exceptions import CypherError, ForbiddenOnReadOnlyDatabaseError, NotALeaderError, TransientError
+from neo4j.v1 import ServiceUnavailable, SessionExpired, Transaction  # noqa: F401
 from pyhocon import ConfigFactory  # noqa: F401
 from pyhocon import ConfigTree  # noqa: F401
-from typing import Set, List  # noqa: F401
+from statsd import StatsClient
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, List, Tuple  # noqa: F401
 
 from databuilder.publisher.base_publisher import Publisher
+from databuilder.utils import csv_manifest, neo4j_driver_registry
+from databuilder.utils.csv_sort import sort_csv
+from databuilder.utils.node_id_cache import NodeIdCache
+from databuilder.utils.publish_journal import IS_DONE, OFFSET, TRANSACTION_COUNT, PublishJournal
 
 # Config keys
 # A directory that contains CSV files for nodes
@@ -23,6 +38,13 @@ RELATION_FILES_DIR = 'relation_files_directory'
 NEO4J_END_POINT_KEY = 'neo4j_endpoint'
 # A transaction size that determines how often it commits.
 NEO4J_TRANSCATION_SIZE = 'neo4j_transaction_size'
+# Commits also when payload (statements and parameters) of a transaction reaches this size. 0 disables it.
+NEO4J_TRANSACTION_MAX_BYTES = 'neo4j_transaction_max_bytes'
+# Adapts the transaction size to commit latency, within min and max transaction size. (see TransactionSizer)
+NEO4J_ADAPTIVE_TRANSACTION_SIZE = 'neo4j_adaptive_transaction_size'
+NEO4J_TRANSACTION_TARGET_LATENCY_SEC = 'neo4j_transaction_target_latency_sec'
+NEO4J_MIN_TRANSACTION_SIZE = 'neo4j_min_transaction_size'
+NEO4J_MAX_TRANSACTION_SIZE = 'neo4j_max_transaction_size'
 # A boolean flag to make it fail if relationship is not created
 NEO4J_RELATIONSHIP_CREATION_CONFIRM = 'neo4j_relationship_creation_confirm'
 
@@ -31,6 +53,50 @@ NEO4J_MAX_CONN_LIFE_TIME_SEC = 'neo4j_max_conn_life_time_sec'
 # list of nodes that are create only, and not updated if match exists
 NEO4J_CREATE_ONLY_NODES = 'neo4j_create_only_nodes'
 
+# Number of rows per UNWIND statement. Rows are grouped by label and header, and sent as parameters of a statement.
+# 0 publishes a statement per row.
+NEO4J_UNWIND_BATCH_SIZE = 'neo4j_unwind_batch_size'
+# A boolean flag to set properties only when content hash of the row differs from the one stored in Neo4j.
+# Requires neo4j_unwind_batch_size.
+NEO4J_CONTENT_HASH = 'neo4j_content_hash'
+# A boolean flag to cache internal ids of the nodes published, so that relationships match the nodes by id instead of
+# by key. Requires neo4j_unwind_batch_size.
+NEO4J_NODE_ID_CACHE = 'neo4j_node_id_cache'
+# Number of node ids kept in memory before spilling into a file under the directory (system temp dir if not set)
+NEO4J_NODE_ID_CACHE_MAX_MEMORY_SIZE = 'neo4j_node_id_cache_max_memory_size'
+NEO4J_NODE_ID_CACHE_SPILL_DIR = 'neo4j_node_id_cache_spill_dir'
+
+# Timeout of waiting for indices created to be online
+NEO4J_INDEX_AWAIT_TIMEOUT_SEC = 'neo4j_index_await_timeout_sec'
+
+# Number of workers publishing concurrently, each with its own session. Node files are published concurrently, and
+# relationships are published in partitions by the node shared with other relationships. Published sequentially with
+# 1, and in streaming mode.
+NEO4J_PUBLISH_PARALLELISM = 'neo4j_publish_parallelism'
+# Number of retries of a transaction on transient error (e.g: DeadlockDetected, leader switch), with exponential
+# backoff.
+NEO4J_TRANSIENT_ERROR_MAX_RETRIES = 'neo4j_transient_error_max_retries'
+NEO4J_TRANSIENT_ERROR_BACKOFF_SEC = 'neo4j_transient_error_backoff_sec'
+
+# Sorts rows of each node file by key, and of each relation file by start key and end key, before publishing, so that
+# consecutive transactions touch nodes close to each other. Files are sorted into copies under the directory (system
+# temp dir if not set) with an external merge sort, keeping up to the number of rows in memory. The directory is also
+# where relation files are split into partitions. (see neo4j_publish_parallelism)
+NEO4J_SORT_BY_KEY = 'neo4j_sort_by_key'
+NEO4J_SORT_MAX_MEMORY_ROWS = 'neo4j_sort_max_memory_rows'
+NEO4J_SORT_DIR = 'neo4j_sort_dir'
+
+# Resumes from the journal of the previous publish that failed, skipping rows already committed
+RESUME = 'resume'
+
+# How often it looks for new segments in streaming mode
+STREAM_POLL_INTERVAL_SEC = 'stream_poll_interval_sec'
+
+# Emits publish statistics through statsd with the prefix if enabled.
+# To configure statsd itself, use environment variable: https://statsd.readthedocs.io/en/v3.2.1/configure.html
+IS_STATSD_ENABLED = 'is_statsd_enabled'
+STATSD_PREFIX = 'statsd_prefix'
+
 NEO4J_USER = 'neo4j_user'
 NEO4J_PASSWORD = 'neo4j_password'
 
@@ -40,6 +106,9 @@ JOB_PUBLISH_TAG = 'job_publish_tag'
 # Neo4j property name for published tag
 PUBLISHED_TAG_PROPERTY_NAME = 'published_tag'
 
+# Neo4j property name for content hash of the properties (see neo4j_content_hash)
+CONTENT_HASH_PROPERTY_NAME = 'content_hash'
+
 # CSV HEADER
 # A header with this suffix will be pass to Neo4j statement without quote
 UNQUOTED_SUFFIX = ':UNQUOTED'
@@ -67,24 +136,78 @@ RELATION_REVERSE_TYPE = 'REVERSE_TYPE'
 RELATION_REQUIRED_KEYS = {RELATION_START_LABEL, RELATION_START_KEY,
                           RELATION_END_LABEL, RELATION_END_KEY,
                           RELATION_TYPE, RELATION_REVERSE_TYPE}
+# Fields of UNWIND row with internal id of start node and end node, when they are in the node id cache
+RELATION_START_ID = 'START_ID'
+RELATION_END_ID = 'END_ID'
 
 DEFAULT_CONFIG = ConfigFactory.from_dict({NEO4J_TRANSCATION_SIZE: 500,
+                                          NEO4J_TRANSACTION_MAX_BYTES: 0,
+                                          NEO4J_ADAPTIVE_TRANSACTION_SIZE: False,
+                                          NEO4J_TRANSACTION_TARGET_LATENCY_SEC: 5,
+                                          NEO4J_MIN_TRANSACTION_SIZE: 10,
+                                          NEO4J_MAX_TRANSACTION_SIZE: 10000,
                                           NEO4J_RELATIONSHIP_CREATION_CONFIRM: False,
-                                          NEO4J_MAX_CONN_LIFE_TIME_SEC: 50})
-
-NODE_MERGE_TEMPLATE = Template("""MERGE (node:$LABEL {key: '${KEY}'})
+                                          NEO4J_MAX_CONN_LIFE_TIME_SEC: 50,
+                                          NEO4J_UNWIND_BATCH_SIZE: 0,
+                                          NEO4J_CONTENT_HASH: False,
+                                          NEO4J_NODE_ID_CACHE: False,
+                                          NEO4J_NODE_ID_CACHE_MAX_MEMORY_SIZE: 1000000,
+                                          NEO4J_SORT_BY_KEY: False,
+                                          NEO4J_SORT_MAX_MEMORY_ROWS: 100000,
+                                          NEO4J_INDEX_AWAIT_TIMEOUT_SEC: 300,
+                                          NEO4J_PUBLISH_PARALLELISM: 1,
+                                          NEO4J_TRANSIENT_ERROR_MAX_RETRIES: 3,
+                                          NEO4J_TRANSIENT_ERROR_BACKOFF_SEC: 1,
+                                          RESUME: False,
+                                          STREAM_POLL_INTERVAL_SEC: 1,
+                                          IS_STATSD_ENABLED: False,
+                                          STATSD_PREFIX: 'amundsen.databuilder.publisher.neo4j'})
+
+NODE_MERGE_TEMPLATE = Template("""MERGE (node:$LABEL {key: $$row.KEY})
 ON CREATE SET ${create_prop_body}
 ${update_statement}""")
 
 NODE_UPDATE_TEMPLATE = Template("""ON MATCH SET ${update_prop_body}""")
 
-RELATION_MERGE_TEMPLATE = Template("""MATCH (n1:$START_LABEL {key: '${START_KEY}'}),
-(n2:$END_LABEL {key: '${END_KEY}'})
+NODE_UNWIND_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+MERGE (node:$LABEL {key: row.KEY})
+ON CREATE SET ${create_prop_body}
+${update_statement}""")
+
+# Properties are set only if content hash differs. (FOREACH is the way to SET conditionally in Cypher)
+NODE_UNWIND_HASH_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+MERGE (node:$LABEL {key: row.KEY})
+SET node.${PUBLISHED_TAG} = $$publish_tag
+FOREACH (_ IN CASE WHEN node.${CONTENT_HASH} = row.${CONTENT_HASH} THEN [] ELSE [1] END |
+SET ${prop_body})""")
+
+RELATION_MERGE_TEMPLATE = Template("""MATCH (n1:$START_LABEL {key: $$row.START_KEY}),
+(n2:$END_LABEL {key: $$row.END_KEY})
 MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
 $PROP_STMT RETURN n1.key, n2.key""")
 
+# Returned by UNWIND node merge statement for the node id cache
+NODE_ID_RETURN_CLAUSE = 'RETURN row.KEY AS key, id(node) AS id'
+
+RELATION_UNWIND_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+$MATCH_CLAUSE
+MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
+SET r1 += row.props, r2 += row.props, r1.${PUBLISHED_TAG} = $$publish_tag, r2.${PUBLISHED_TAG} = $$publish_tag
+RETURN count(*) AS count""")
+
+RELATION_UNWIND_HASH_MERGE_TEMPLATE = Template("""UNWIND $$batch AS row
+$MATCH_CLAUSE
+MERGE (n1)-[r1:$TYPE]->(n2)-[r2:$REVERSE_TYPE]->(n1)
+SET r1.${PUBLISHED_TAG} = $$publish_tag, r2.${PUBLISHED_TAG} = $$publish_tag
+FOREACH (_ IN CASE WHEN r1.${CONTENT_HASH} = row.${CONTENT_HASH} THEN [] ELSE [1] END |
+SET r1 += row.props, r2 += row.props,
+r1.${CONTENT_HASH} = row.${CONTENT_HASH}, r2.${CONTENT_HASH} = row.${CONTENT_HASH})
+RETURN count(*) AS count""")
+
 CREATE_UNIQUE_INDEX_TEMPLATE = Template('CREATE CONSTRAINT ON (node:${LABEL}) ASSERT node.key IS UNIQUE')
 
+AWAIT_INDEXES_TEMPLATE = Template('CALL db.awaitIndexes(${TIMEOUT_SEC})')
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -96,7 +219,72 @@ class Neo4jCsvPublisher(Publisher):
     Neo4j follows Label Node properties Graph and more information about this is in:
     https://neo4j.com/docs/developer-manual/current/introduction/graphdb-concepts/
 
-    #TODO User UNWIND batch operation for better performance
+    In streaming mode (see DefaultJob.IS_STREAMING_PUBLISH), it publishes segments rotated by FsNeo4jCSVLoader
+    (rotate_segment_rows) while the task is still running. Segments are published in the sequence they are rotated,
+    which commits nodes before the relationships loaded after them. Note that a relationship is created only if both
+    of its nodes were loaded before it, or exist in Neo4j already.
+
+    With neo4j_unwind_batch_size, nodes and relationships are published in batches: rows of a file are grouped by
+    label and header (by labels and types for relationships), and each batch is sent as a parameter of a single UNWIND
+    statement, instead of a statement per row. Neo4j can plan the statement once and reuse the plan for every batch of
+    the same shape. Values of UNQUOTED columns are converted into the type Cypher would parse them into.
+    (boolean, integer, float, null, or string)
+
+    Without it, a statement per row is sent with the row as $row parameter. Statements are cached per shape of the
+    row (label and header, or labels, types and header for relationships), thus each row only binds parameters, and
+    Neo4j reuses the plan of the statement. UNQUOTED values are converted the same way.
+
+    With neo4j_content_hash, a hash of the properties of each row is stored as content_hash property, and properties
+    are set only when the hash differs from the stored one. As most of metadata does not change between runs, this
+    avoids rewriting properties that are the same. published_tag is still set on every node and relationship within
+    the same UNWIND statement, so that Neo4jStalenessRemovalTask keeps working. It requires neo4j_unwind_batch_size.
+
+    With neo4j_node_id_cache, UNWIND node statements return internal id of each node, and the ids are cached once
+    committed (see NodeIdCache). Relationships whose nodes are in the cache match them by id, which is a direct lookup
+    instead of two index seeks per relationship, and the rest match by key as usual. A node matched by id is also
+    checked by its key, in case the node is deleted and its id is reused meanwhile. It requires
+    neo4j_unwind_batch_size.
+
+    With neo4j_sort_by_key, it plans publish order before publishing: each node file is sorted by KEY, and each
+    relation file by START_KEY and END_KEY, into a temporary copy that is published instead. Rows arrive in extraction
+    order, which scatters consecutive transactions over the graph. In key order, a transaction locks and reads nodes
+    next to each other, which improves page cache locality and reduces lock waits. Rows with the same key keep their
+    order, and sorting is deterministic, thus the journal offsets are still valid when resuming.
+
+    With neo4j_publish_parallelism, node files are published concurrently by a pool of workers, larger files first.
+    Each worker publishes on its own session from the shared driver. Relationships are published once all the nodes
+    are published, also by a pool of workers. Each relation file is split into a file per partition in one pass, into
+    a temporary directory under neo4j_sort_dir, and a worker publishes a partition. A relationship is partitioned by the
+    hash of its node with the shorter key: in Amundsen, the key of a node extends the key of its parent (e.g: column
+    key extends its table key), thus the node with the shorter key is the hub shared with other relationships, and
+    all the relationships of a hub are published by one worker. (e.g: columns of a table) Concurrent transactions
+    only lock the same node where it's a hub in one relationship and not in another (e.g: a table is the hub of its
+    columns, but not of its schema's relationship), and a deadlock that still happens is retried as a transient
+    error.
+
+    A transaction that fails on a transient error (e.g: deadlock, leader switch, service unavailable) is rolled back
+    and its statements are run again in a new transaction, after exponential backoff. (see RetryableTransaction)
+    With neo4j_adaptive_transaction_size, transaction size is adapted to commit latency. (see TransactionSizer)
+
+    Before publishing, it plans indices: it collects labels from node files, and START_LABEL and END_LABEL from
+    relation files, as relation files may reference labels of nodes published by another job. Unique constraints of
+    the labels are created in one session, and it waits until they are online so that MATCH by key does not fall back
+    to label scan.
+
+    If a directory has a manifest written by FsNeo4jCSVLoader, labels of node and relation files are taken from it
+    for index creation instead of scanning the files, and row counts are used to report overall progress. A file
+    without a manifest entry, or changed since the manifest is written, is scanned.
+
+    While publishing files (not in streaming mode), it writes a journal (.publish_journal.json) into the node and the
+    relation directory on every commit, with the number of rows committed from the beginning of each file. With
+    resume, rows committed by the previous publish are skipped instead of publishing the files from the beginning.
+    Rows run after the last commit are published again, which is safe as the statements are MERGE. Keep the files for
+    the next run with FsNeo4jCSVLoader's delete_created_directories=False. The journal is deleted once publish is
+    succeeded. As it's per partition of relations, neo4j_publish_parallelism should not change when resuming.
+
+    Statistics from the result summary of committed statements (see PublishStats) are aggregated per file and per
+    label, logged and returned when publish is done, and emitted through statsd if is_statsd_enabled. Comparing the
+    number of rows with nodes created and properties set shows how much of the publish is no-op writes.
     """
 
     def __init__(self):
@@ -106,6 +294,7 @@ class Neo4jCsvPublisher(Publisher):
     def init(self, conf):
         # type: (ConfigTree) -> None
         conf = conf.with_fallback(DEFAULT_CONFIG)
+        self._conf = conf
 
         self._node_files = self._list_files(conf, NODE_FILES_DIR)
         self._node_files_iter = iter(self._node_files)
@@ -113,12 +302,34 @@ class Neo4jCsvPublisher(Publisher):
         self._relation_files = self._list_files(conf, RELATION_FILES_DIR)
         self._relation_files_iter = iter(self._relation_files)
 
-        self._driver = \
-            GraphDatabase.driver(conf.get_string(NEO4J_END_POINT_KEY),
-                                 max_connection_life_time=50,
-                                 auth=(conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD)))
-        self._transaction_size = conf.get_int(NEO4J_TRANSCATION_SIZE)
-        self._session = self._driver.session()
+        # Shared with the other components, across jobs of the process (see neo4j_driver_registry)
+        self._driver = neo4j_driver_registry.get_driver(conf.get_string(NEO4J_END_POINT_KEY),
+                                                        conf.get_string(NEO4J_USER),
+                                                        conf.get_string(NEO4J_PASSWORD),
+                                                        conf)
+        self._transaction_sizer = TransactionSizer(size=conf.get_int(NEO4J_TRANSCATION_SIZE),
+                                                   max_bytes=conf.get_int(NEO4J_TRANSACTION_MAX_BYTES),
+                                                   adaptive=conf.get_bool(NEO4J_ADAPTIVE_TRANSACTION_SIZE),
+                                                   target_latency_sec=conf.get_float(
+                                                       NEO4J_TRANSACTION_TARGET_LATENCY_SEC),
+                                                   min_size=conf.get_int(NEO4J_MIN_TRANSACTION_SIZE),
+                                                   max_size=conf.get_int(NEO4J_MAX_TRANSACTION_SIZE))
+        self._unwind_batch_size = conf.get_int(NEO4J_UNWIND_BATCH_SIZE)
+        self._content_hash = conf.get_bool(NEO4J_CONTENT_HASH)
+        if self._content_hash and not self._unwind_batch_size:
+            raise Exception('{} requires {}'.format(NEO4J_CONTENT_HASH, NEO4J_UNWIND_BATCH_SIZE))
+        self._node_id_cache = None  # type: Optional[NodeIdCache]
+        if conf.get_bool(NEO4J_NODE_ID_CACHE):
+            if not self._unwind_batch_size:
+                raise Exception('{} requires {}'.format(NEO4J_NODE_ID_CACHE, NEO4J_UNWIND_BATCH_SIZE))
+            self._node_id_cache = NodeIdCache(max_memory_size=conf.get_int(NEO4J_NODE_ID_CACHE_MAX_MEMORY_SIZE),
+                                              spill_dir=conf.get_string(NEO4J_NODE_ID_CACHE_SPILL_DIR, default=None))
+        self._main_session = self._driver.session()
+        self._worker_local = threading.local()
+        self._publish_parallelism = conf.get_int(NEO4J_PUBLISH_PARALLELISM)
+        self._index_await_timeout_sec = conf.get_int(NEO4J_INDEX_AWAIT_TIMEOUT_SEC)
+        self._transient_error_max_retries = conf.get_int(NEO4J_TRANSIENT_ERROR_MAX_RETRIES)
+        self._transient_error_backoff_sec = conf.get_float(NEO4J_TRANSIENT_ERROR_BACKOFF_SEC)
         self._confirm_rel_created = conf.get_bool(NEO4J_RELATIONSHIP_CREATION_CONFIRM)
 
         # config is list of node label.
@@ -129,13 +340,47 @@ class Neo4jCsvPublisher(Publisher):
         if not self.publish_tag:
             raise Exception('{} should not be empty'.format(JOB_PUBLISH_TAG))
 
+        self._stream_poll_interval_sec = conf.get_float(STREAM_POLL_INTERVAL_SEC)
+        self._is_streaming = False
+        self._is_stream_aborted = False
+        self._end_of_stream = threading.Event()
+
+        self._manifests = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
+        self._progress_lock = threading.Lock()
+        self._published_count = 0
+        self._total_count = None  # type: Optional[int]
+
+        self._sort_by_key = conf.get_bool(NEO4J_SORT_BY_KEY)
+        self._sort_max_memory_rows = conf.get_int(NEO4J_SORT_MAX_MEMORY_ROWS)
+        self._sort_dir = conf.get_string(NEO4J_SORT_DIR, default=None)
+        # Temporary directory of the sorted copies and the split relation files, the sorted copy of each file
+        # (see _plan_publish_order), and the split file of each relation file and partition
+        # (see _split_relation_files)
+        self._temp_dir = None  # type: Optional[str]
+        self._sorted_paths = {}  # type: Dict[str, str]
+        self._partition_paths = {}  # type: Dict[Tuple[str, int], str]
+
+        self._resume = conf.get_bool(RESUME)
+        # Statement per shape of the row (see create_node_merge_statement and create_relationship_merge_statement)
+        self._statement_cache = {}  # type: Dict[Tuple, str]
+        self._node_journal = None  # type: Optional[PublishJournal]
+        self._relation_journal = None  # type: Optional[PublishJournal]
+
+        self.stats = PublishStats()
+        if conf.get_bool(IS_STATSD_ENABLED):
+            self._statsd = StatsClient(prefix=conf.get_string(STATSD_PREFIX))  # type: Optional[StatsClient]
+        else:
+            self._statsd = None
+
         LOGGER.info('Publishing Node csv files {}, and Relation CSV files {}'
                     .format(self._node_files, self._relation_files))
 
     def _list_files(self, conf, path_key):
         # type: (ConfigTree, str) -> List[str]
         """
-        List files from directory
+        List files from directory, including files in its sub-directories so that outputs of multiple loaders
+        written into separate sub-directories (e.g: ParallelJob) can be published together. Hidden files (e.g: a
+        segment being written) are ignored.
         :param conf:
         :param path_key:
         :return: List of file paths
@@ -144,88 +389,639 @@ class Neo4jCsvPublisher(Publisher):
             return []
 
         path = conf.get_string(path_key)
-        return [join(path, f) for f in listdir(path) if isfile(join(path, f))]
+        files = []  # type: List[str]
+        for dir_path, _, file_names in walk(path):
+            files.extend(join(dir_path, f) for f in sorted(file_names) if not f.startswith('.'))
+        return files
+
+    @property
+    def _session(self):
+        # type: () -> Any
+        """
+        Session of the current worker when publishing in parallel, otherwise the main session
+        """
+        return getattr(self._worker_local, 'session', None) or self._main_session
 
-    def publish_impl(self):
+    def supports_streaming(self):
+        # type: () -> bool
+        return True
+
+    def get_published_count(self):
+        # type: () -> int
+        """
+        :return: Number of rows committed so far (see PublishStats)
+        """
+        return self.stats.to_dict()['total']['rows']
+
+    def begin_stream(self):
         # type: () -> None
+        self._is_streaming = True
+
+    def end_stream(self, is_success=True):
+        # type: (bool) -> None
+        self._is_stream_aborted = not is_success
+        self._end_of_stream.set()
+
+    def publish_impl(self):
+        # type: () -> Dict[str, Any]
         """
-        Publishes Nodes first and then Relations
-        :return:
+        Publishes Nodes first and then Relations. In streaming mode, publishes segments as they are rotated.
+        :return: Statistics of the publish. (see PublishStats.to_dict)
         """
 
         start = time.time()
 
-        LOGGER.info('Creating indices using Node files: {}'.format(self._node_files))
-        for node_file in self._node_files:
-            self._create_indices(node_file=node_file)
+        try:
+            if self._is_streaming:
+                self._publish_stream()
+            else:
+                self._publish_files()
+        finally:
+            if self._node_id_cache is not None:
+                LOGGER.info('Node id cache has {} ids'.format(len(self._node_id_cache)))
+                self._node_id_cache.close()
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+                self._temp_dir = None
+
+        LOGGER.info('Successfully published. Elapsed: {} seconds'.format(time.time() - start))
+        self.stats.report(self._statsd)
+        return self.stats.to_dict()
+
+    def _publish_files(self):
+        # type: () -> None
+        self._total_count = self._get_total_count(self._node_files + self._relation_files)
+        self._node_journal = self._create_journal(NODE_FILES_DIR)
+        self._relation_journal = self._create_journal(RELATION_FILES_DIR)
+
+        self._create_indices(self._plan_indices(self._node_files, self._relation_files))
+        self._plan_publish_order(self._node_files, self._relation_files)
 
         LOGGER.info('Publishing Node files: {}'.format(self._node_files))
-        while True:
-            try:
-                node_file = next(self._node_files_iter)
-                self._publish_node(node_file)
-            except StopIteration:
-                break
+        self._publish_node_files()
 
         LOGGER.info('Publishing Relationship files: {}'.format(self._relation_files))
-        while True:
-            try:
-                relation_file = next(self._relation_files_iter)
-                self._publish_relation(relation_file)
-            except StopIteration:
-                break
+        self._publish_relation_files()
 
-        # TODO: Add statsd support
-        LOGGER.info('Successfully published. Elapsed: {} seconds'.format(time.time() - start))
+        for journal in (self._node_journal, self._relation_journal):
+            if journal:
+                journal.delete()
+
+    def _publish_node_files(self):
+        # type: () -> None
+        if self._publish_parallelism > 1:
+            self._publish_nodes_in_parallel(list(self._node_files_iter))
+            return
+
+        for node_file in self._node_files_iter:
+            self._publish_node(node_file)
+
+    def _publish_relation_files(self):
+        # type: () -> None
+        if self._publish_parallelism > 1:
+            self._publish_relations_in_parallel(list(self._relation_files_iter))
+            return
+
+        for relation_file in self._relation_files_iter:
+            self._publish_relation(relation_file)
+
+    def _create_journal(self, path_key):
+        # type: (str) -> Optional[PublishJournal]
+        if path_key not in self._conf:
+            return None
+        return PublishJournal(self._conf.get_string(path_key), resume=self._resume)
+
+    def _begin_file_transaction(self, path, journal, partition=None):
+        # type: (str, Optional[PublishJournal], Optional[int]) -> Tuple[Optional[RetryableTransaction], int]
+        """
+        Begins transaction for publishing the file. With journal, each commit is recorded into it, and when resuming,
+        rows committed by the previous publish are skipped.
+        :param path:
+        :param journal:
+        :param partition:
+        :return: Transaction, and number of rows to skip from the beginning of the file. No transaction if all the rows
+        are committed by the previous publish.
+        """
+        if journal is None:
+            return self._begin_transaction(), 0
+
+        journal_partition = self._get_journal_partition(partition)
+        entry = journal.get_entry(path, journal_partition)
+        offset = entry[OFFSET] if entry else 0
+        transaction_count = entry[TRANSACTION_COUNT] if entry else 0
+        if entry:
+            LOGGER.info('Resuming {} from row {} committed in {} transactions'.format(path, offset, transaction_count))
+            with self._progress_lock:
+                self._published_count += offset
+            if entry[IS_DONE]:
+                return None, offset
+
+        def on_commit(tx):
+            # type: (RetryableTransaction) -> None
+            journal.update(path, journal_partition, tx.committed_offset, transaction_count + tx.commit_count)
+
+        return self._begin_transaction(offset=offset, on_commit=on_commit), offset
+
+    def _commit_file_transaction(self, tx, path, journal, partition=None):
+        # type: (RetryableTransaction, str, Optional[PublishJournal], Optional[int]) -> None
+        """
+        Commits the rest of the file, and marks the file done in the journal.
+        """
+        tx.commit()
+        if journal is not None:
+            journal_partition = self._get_journal_partition(partition)
+            entry = journal.get_entry(path, journal_partition)
+            journal.update(path, journal_partition,
+                           offset=tx.committed_offset,
+                           transaction_count=entry[TRANSACTION_COUNT] if entry else 0,
+                           is_done=True)
+        self._report_progress(path, tx.row_count)
+
+    def _get_journal_partition(self, partition):
+        # type: (Optional[int]) -> Optional[str]
+        if partition is None:
+            return None
+        return '{}/{}'.format(partition, self._publish_parallelism)
+
+    def _get_manifest_entry(self, path):
+        # type: (str) -> Optional[Dict[str, Any]]
+        dir_path = dirname(path)
+        if dir_path not in self._manifests:
+            self._manifests[dir_path] = csv_manifest.read_manifest(dir_path)
+        return csv_manifest.get_manifest_entry(self._manifests[dir_path], path)
+
+    def _get_total_count(self, paths):
+        # type: (List[str]) -> Optional[int]
+        """
+        :param paths:
+        :return: Total number of rows of the files from manifests. None if any of them is not in a manifest.
+        """
+        total_count = 0
+        for path in paths:
+            entry = self._get_manifest_entry(path)
+            if not entry:
+                return None
+            total_count += entry[csv_manifest.ROW_COUNT]
+        return total_count
+
+    def _report_progress(self, path, record_count):
+        # type: (str, int) -> None
+        """
+        Logs number of records committed from the file, and overall progress if total number of records is known.
+        :param path:
+        :param record_count:
+        :return:
+        """
+        with self._progress_lock:
+            self._published_count += record_count
+            if not self._total_count:
+                LOGGER.info('Committed {} records of {}'.format(record_count, path))
+                return
+
+            LOGGER.info('Committed {} records of {}. Published {} of {} records ({:.1f}%)'.format(
+                record_count, path, self._published_count, self._total_count,
+                100.0 * self._published_count / self._total_count))
+
+    def _publish_nodes_in_parallel(self, node_files):
+        # type: (List[str]) -> None
+        """
+        Publishes node files concurrently using a pool of workers. Larger files are scheduled first so that a large file
+        is not left to the end, publishing alone. If any of the files fails, it raises the error once the other files
+        are finished.
+        :param node_files:
+        :return:
+        """
+        node_files = sorted(node_files, key=getsize, reverse=True)
+        self._run_in_parallel(self._publish_node, [(node_file,) for node_file in node_files])
+
+    def _publish_relations_in_parallel(self, relation_files):
+        # type: (List[str]) -> None
+        """
+        Publishes relation files concurrently using a pool of workers, where each worker publishes a partition of
+        relations from all the files.
+        :param relation_files:
+        :return:
+        """
+        self._split_relation_files(relation_files)
+        self._run_in_parallel(self._publish_relation_partition,
+                              [(relation_files, partition) for partition in range(self._publish_parallelism)])
+
+    def _split_relation_files(self, relation_files):
+        # type: (List[str]) -> None
+        """
+        Splits each relation file into a file per partition, in one pass, so that a worker reads only its partition.
+        Rows keep their order in the file. A partition without any row of the file has no split file.
+        :param relation_files:
+        :return:
+        """
+        start = time.time()
+        for relation_file in relation_files:
+            with self._open_for_publish(relation_file) as relation_csv:
+                reader = csv.DictReader(relation_csv)
+                split_files = {}  # type: Dict[int, Any]
+                try:
+                    writers = {}  # type: Dict[int, csv.DictWriter]
+                    for rel_record in reader:
+                        partition = self._get_relation_partition(rel_record)
+                        if partition not in writers:
+                            split_path = join(self._get_temp_dir(), 'partition_{}_{}_{}'.format(
+                                len(self._partition_paths), partition, basename(relation_file)))
+                            split_files[partition] = open(split_path, 'w')
+                            writers[partition] = csv.DictWriter(split_files[partition], reader.fieldnames,
+                                                                quoting=csv.QUOTE_NONNUMERIC)
+                            writers[partition].writeheader()
+                            self._partition_paths[(relation_file, partition)] = split_path
+                        writers[partition].writerow(rel_record)
+                finally:
+                    for split_file in split_files.values():
+                        split_file.close()
+
+        LOGGER.info('Split {} relation files into {} partitions. Elapsed: {} seconds'
+                    .format(len(relation_files), self._publish_parallelism, time.time() - start))
+
+    def _get_relation_partition(self, rel_record):
+        # type: (Dict[str, str]) -> int
+        """
+        :param rel_record:
+        :return: Partition of the relation, by its node that has the shorter key
+        """
+        if len(rel_record[RELATION_START_KEY]) <= len(rel_record[RELATION_END_KEY]):
+            node = '{}\t{}'.format(rel_record[RELATION_START_LABEL], rel_record[RELATION_START_KEY])
+        else:
+            node = '{}\t{}'.format(rel_record[RELATION_END_LABEL], rel_record[RELATION_END_KEY])
+        # In Python 2, csv reads str, which is already bytes
+        if not isinstance(node, bytes):
+            node = node.encode('utf-8')
+        # Stable across processes, unlike hash, so that the partitions are the same when resuming
+        return zlib.crc32(node) % self._publish_parallelism
+
+    def _publish_relation_partition(self, relation_files, partition):
+        # type: (List[str], int) -> None
+        """
+        Publishes the partition of relations from the files.
+        :param relation_files:
+        :param partition:
+        :return:
+        """
+        for relation_file in relation_files:
+            if (relation_file, partition) in self._partition_paths:
+                self._publish_relation(relation_file, partition=partition)
+
+    def _run_in_parallel(self, func, args_list):
+        # type: (Callable[..., None], List[Tuple]) -> None
+        """
+        Runs func for each args using a pool of workers, where each worker has its own session. If any of them fails,
+        it raises the error once the others are finished.
+        :param func:
+        :param args_list:
+        :return:
+        """
+        sessions = []  # type: List[Any]
+        pool = ThreadPool(processes=self._publish_parallelism,
+                          initializer=self._init_worker_session,
+                          initargs=(sessions,))
+        try:
+            results = [pool.apply_async(func, args) for args in args_list]
+            errors = []
+            for args, result in zip(args_list, results):
+                try:
+                    result.get()
+                except Exception as e:
+                    LOGGER.exception('Failed to publish {}'.format(args))
+                    errors.append(e)
+        finally:
+            pool.terminate()
+            pool.join()
+            for session in sessions:
+                session.close()
+
+        if errors:
+            raise errors[0]
+
+    def _init_worker_session(self, sessions):
+        # type: (List[Any]) -> None
+        """
+        Opens a session for the worker thread.
+        :param sessions: Sessions opened so far, to be closed when the pool is finished
+        :return:
+        """
+        self._worker_local.session = self._driver.session()
+        sessions.append(self._worker_local.session)
+
+    def _publish_stream(self):
+        # type: () -> None
+        """
+        Publishes segments in sequence order as they are rotated, until end of stream.
+        :return:
+        """
+        published = set()  # type: Set[str]
+        while True:
+            # Checked before listing, so that the listing after end of stream sees all the segments
+            is_end_of_stream = self._end_of_stream.is_set()
+            segments = self._list_segments(published)
+            for _, is_relation, segment in segments:
+                if self._is_stream_aborted:
+                    raise Exception('Stream is aborted as the task failed. Remaining segments are not published')
+
+                if is_relation:
+                    self._create_indices(self._plan_indices([], [segment]))
+                    self._plan_publish_order([], [segment])
+                    self._publish_relation(segment)
+                else:
+                    self._create_indices(self._plan_indices([segment], []))
+                    self._plan_publish_order([segment], [])
+                    self._publish_node(segment)
+                published.add(segment)
+
+            if is_end_of_stream:
+                if self._is_stream_aborted:
+                    raise Exception('Stream is aborted as the task failed')
+                return
+
+            if not segments:
+                self._end_of_stream.wait(self._stream_poll_interval_sec)
+
+    def _list_segments(self, published):
+        # type: (Set[str]) -> List[Tuple[int, bool, str]]
+        """
+        Lists segments that are not published yet.
+        :param published: Segments already published
+        :return: List of (sequence, is relation, path) in sequence order
+        """
+        # Relationship segments are listed first. As node segments are rotated before a relationship segment, the
+        # node segments that a listed relationship segment depends on are listed too.
+        relation_segments = self._list_files(self._conf, RELATION_FILES_DIR)
+        node_segments = self._list_files(self._conf, NODE_FILES_DIR)
+
+        segments = [(self._get_segment_sequence(path), False, path) for path in node_segments]
+        segments.extend((self._get_segment_sequence(path), True, path) for path in relation_segments)
+        return sorted(segment for segment in segments if segment[2] not in published)
+
+    def _get_segment_sequence(self, path):
+        # type: (str) -> int
+        sequence = basename(path).split('_', 1)[0]
+        if not sequence.isdigit():
+            raise Exception('{} is not a segment. Use rotate_segment_rows in the loader for streaming'.format(path))
+        return int(sequence)
 
     def get_scope(self):
         # type: () -> str
         return 'publisher.neo4j'
 
-    def _create_indices(self, node_file):
+    def _plan_indices(self, node_files, relation_files):
+        # type: (List[str], List[str]) -> Set[str]
         """
-        Go over the node file and try creating unique index
-        :param node_file:
+        Collects labels of the files that this publisher has not created index for.
+        :param node_files:
+        :param relation_files:
+        :return: Labels to create index for
+        """
+        node_labels = set()  # type: Set[str]
+        for node_file in node_files:
+            node_labels.update(self._read_labels(node_file, [NODE_LABEL_KEY]))
+
+        relation_labels = set()  # type: Set[str]
+        for relation_file in relation_files:
+            relation_labels.update(self._read_labels(relation_file, [RELATION_START_LABEL, RELATION_END_LABEL]))
+
+        labels = (node_labels | relation_labels) - self.labels
+        if labels:
+            LOGGER.info('Index plan: labels of nodes {}, labels only referenced by relations {}. Creating index for {}'
+                        .format(sorted(node_labels), sorted(relation_labels - node_labels), sorted(labels)))
+        return labels
+
+    def _create_indices(self, labels):
+        # type: (Set[str]) -> None
+        """
+        Try creating unique index of the labels in a session, and waits until they are online.
+        :param labels:
         :return:
         """
-        # type: (str) -> None
+        if not labels:
+            return
+
         LOGGER.info('Creating indices. (Existing indices will be ignored)')
+        with self._driver.session() as session:
+            for label in sorted(labels):
+                self._try_create_index(label, session)
+                self.labels.add(label)
 
-        with open(node_file, 'r') as node_csv:
-            for node_record in csv.DictReader(node_csv):
-                label = node_record[NODE_LABEL_KEY]
-                if label not in self.labels:
-                    self._try_create_index(label)
-                    self.labels.add(label)
+            stmt = AWAIT_INDEXES_TEMPLATE.substitute(TIMEOUT_SEC=self._index_await_timeout_sec)
+            LOGGER.info('Waiting for indices to be online: {}'.format(stmt))
+            session.run(stmt)
 
         LOGGER.info('Indices have been created.')
 
+    def _plan_publish_order(self, node_files, relation_files):
+        # type: (List[str], List[str]) -> None
+        """
+        Sorts node files by key, and relation files by start key and end key, into temporary copies, if
+        neo4j_sort_by_key is set.
+        :param node_files:
+        :param relation_files:
+        :return:
+        """
+        if not self._sort_by_key:
+            return
+
+        start = time.time()
+        for paths, key_fields in ((node_files, [NODE_KEY_KEY]),
+                                  (relation_files, [RELATION_START_KEY, RELATION_END_KEY])):
+            for path in paths:
+                # Numbered, as files in sub-directories can have the same name
+                sorted_path = os.path.join(self._get_temp_dir(),
+                                           '{}_{}'.format(len(self._sorted_paths), basename(path)))
+                sort_csv(path, sorted_path, key_fields,
+                         max_memory_rows=self._sort_max_memory_rows,
+                         temp_dir=self._get_temp_dir())
+                self._sorted_paths[path] = sorted_path
+
+        LOGGER.info('Sorted {} files by key. Elapsed: {} seconds'.format(len(node_files) + len(relation_files),
+                                                                         time.time() - start))
+
+    def _get_temp_dir(self):
+        # type: () -> str
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='neo4j_publish_order_', dir=self._sort_dir)
+        return self._temp_dir
+
+    def _open_for_publish(self, path, partition=None):
+        # type: (str, Optional[int]) -> Any
+        """
+        Opens the file to publish, or its sorted copy if it's sorted (see _plan_publish_order), or its split file of
+        the partition if set. (see _split_relation_files)
+        """
+        if partition is not None:
+            return open(self._partition_paths[(path, partition)], 'r')
+        return open(self._sorted_paths.get(path, path), 'r')
+
+    def _read_labels(self, path, label_keys):
+        # type: (str, List[str]) -> Iterable[str]
+        """
+        Reads labels of the file from manifest. If it's not in the manifest, it scans the file.
+        :param path:
+        :param label_keys: Columns of the labels (e.g: LABEL for node, START_LABEL and END_LABEL for relation)
+        :return:
+        """
+        entry = self._get_manifest_entry(path)
+        if entry:
+            return entry[csv_manifest.LABELS]
+
+        with open(path, 'r') as csv_file:
+            return {record[key] for record in csv.DictReader(csv_file) for key in label_keys}
+
     def _publish_node(self, node_file):
         # type: (str) -> None
         """
-        Iterate over the csv records of a file, each csv record transform to Merge statement and will be executed.
+        Iterate over the csv records of a file, each csv record is executed with Merge statement of its shape.
         All nodes should have a unique key, and this method will try to create unique index on the LABEL when it sees
         first time within a job scope.
-        Example of Cypher query executed by this method:
-        MERGE (col_test_id1:Column {key: 'presto://gold.test_schema1/test_table1/test_id1'})
-        ON CREATE SET col_test_id1.name = 'test_id1',
-                      col_test_id1.order_pos = 2,
-                      col_test_id1.type = 'bigint'
-        ON MATCH SET col_test_id1.name = 'test_id1',
-                     col_test_id1.order_pos = 2,
-                     col_test_id1.type = 'bigint'
+        Example of Cypher query executed by this method, with the record as $row parameter:
+        MERGE (node:Column {key: $row.KEY})
+        ON CREATE SET node.name = $row.name, node.order_pos = $row.order_pos, node.type = $row.type,
+                      node.published_tag = $publish_tag
+        ON MATCH SET node.name = $row.name, node.order_pos = $row.order_pos, node.type = $row.type,
+                     node.published_tag = $publish_tag
 
         :param node_file:
         :return:
         """
-        tx = self._session.begin_transaction()
-        with open(node_file, 'r') as node_csv:
-            for count, node_record in enumerate(csv.DictReader(node_csv)):
-                stmt = self.create_node_merge_statement(node_record=node_record)
-                tx = self._execute_statement(stmt, tx, count)
+        if self._unwind_batch_size:
+            self._publish_node_batches(node_file)
+            return
 
-        tx.commit()
-        LOGGER.info('Committed {} records'.format(count + 1))
+        tx, offset = self._begin_file_transaction(node_file, self._node_journal)
+        if tx is None:
+            return
+
+        with self._open_for_publish(node_file) as node_csv:
+            for offset, node_record in self._read_records(node_csv, offset):
+                stmt = self.create_node_merge_statement(node_record[NODE_LABEL_KEY], tuple(node_record.keys()))
+                row = self._create_row_param(node_record, NODE_REQUIRED_KEYS, {NODE_KEY_KEY})
+                self._execute_statement(stmt, row, tx, stats_key=(node_file, node_record[NODE_LABEL_KEY]),
+                                        offset=offset)
+
+        self._commit_file_transaction(tx, node_file, self._node_journal)
+
+    def _publish_node_batches(self, node_file):
+        # type: (str) -> None
+        """
+        Publishes nodes of the file in batches of UNWIND statement.
+        Example of Cypher query executed by this method, with rows as $batch parameter:
+        UNWIND $batch AS row
+        MERGE (node:Column {key: row.KEY})
+        ON CREATE SET node.name = row.name, node.order_pos = row.order_pos, node.type = row.type,
+                      node.published_tag = $publish_tag
+        ON MATCH SET node.name = row.name, node.order_pos = row.order_pos, node.type = row.type,
+                     node.published_tag = $publish_tag
+
+        :param node_file:
+        :return:
+        """
+        tx, offset = self._begin_file_transaction(node_file, self._node_journal)
+        if tx is None:
+            return
+
+        with self._open_for_publish(node_file) as node_csv:
+            batches = self._iter_batches(self._read_records(node_csv, offset),
+                                         lambda record: (record[NODE_LABEL_KEY], tuple(record.keys())))
+            for (label, header), records, offset in batches:
+                stmt = self.create_node_unwind_statement(label, header)
+                rows = [self._create_row_param(record, NODE_REQUIRED_KEYS, {NODE_KEY_KEY}) for record in records]
+                if self._content_hash:
+                    for row in rows:
+                        row[CONTENT_HASH_PROPERTY_NAME] = _content_hash(row, excludes={NODE_KEY_KEY})
+                on_committed = None
+                if self._node_id_cache is not None:
+                    on_committed = functools.partial(self._cache_node_ids, label)
+                self._execute_batch(stmt, rows, tx, stats_key=(node_file, label), offset=offset,
+                                    on_committed=on_committed)
+
+        self._commit_file_transaction(tx, node_file, self._node_journal)
+
+    def _cache_node_ids(self, label, result):
+        # type: (str, Any) -> None
+        """
+        Caches ids returned by a committed UNWIND node statement. Ids are only cached once committed, as the ids of
+        the nodes created by a transaction rolled back can be reused.
+        :param label:
+        :param result: Result of the statement, with key and id of each node
+        :return:
+        """
+        self._node_id_cache.put_all(label, ((record['key'], record['id']) for record in result))
+
+    def _read_records(self, csv_file, offset):
+        # type: (Iterable[str], int) -> Iterator[Tuple[int, Dict[str, str]]]
+        """
+        Reads records of the file, skipping rows before the offset.
+        :param csv_file:
+        :param offset: Number of rows to skip
+        :return: Iterator of (number of rows read so far, record)
+        """
+        for index, record in enumerate(csv.DictReader(csv_file)):
+            if index < offset:
+                continue
+            yield index + 1, record
+
+    def _iter_batches(self,
+                      records,  # type: Iterable[Tuple[int, Dict[str, str]]]
+                      get_group_key,  # type: Callable[[Dict[str, str]], Any]
+                      ):
+        # type: (...) -> Iterator[Tuple[Any, List[Dict[str, str]], int]]
+        """
+        Groups records by the group key, and yields a group as a batch once it reaches unwind batch size. Remaining
+        groups are yielded at the end.
+        :param records: Iterator of (number of rows read so far, record). (see _read_records)
+        :return: Iterator of (group key, records, offset) where offset is the number of rows from the beginning of the
+        file that are in the batches yielded so far, i.e: before the first row still in a group.
+        """
+        # Group key to (offset before the first record of the group, records)
+        groups = collections.OrderedDict()  # type: Dict[Any, Tuple[int, List[Dict[str, str]]]]
+        offset = 0
+        for offset, record in records:
+            key = get_group_key(record)
+            _, group = groups.setdefault(key, (offset - 1, []))
+            group.append(record)
+            if len(group) >= self._unwind_batch_size:
+                groups.pop(key)
+                yield key, group, min([start for start, _ in groups.values()] + [offset])
+
+        while groups:
+            key, (_, group) = groups.popitem(last=False)
+            yield key, group, min([start for start, _ in groups.values()] + [offset])
+
+    def create_node_unwind_statement(self, label, header):
+        # type: (str, Iterable[str]) -> str
+        """
+        Creates UNWIND node merge statement for the label and the header
+        :param label:
+        :param header: CSV header of the rows
+        :return:
+        """
+        if self._content_hash and not self.is_create_only_node({NODE_LABEL_KEY: label}):
+            prop_body = self._create_props_param_body(header, NODE_REQUIRED_KEYS, 'node', with_publish_tag=False)
+            # Header may have no property other than LABEL and KEY
+            prop_body = ', '.join([body for body in
+                                   [prop_body, 'node.{key} = row.{key}'.format(key=CONTENT_HASH_PROPERTY_NAME)]
+                                   if body])
+            stmt = NODE_UNWIND_HASH_MERGE_TEMPLATE.substitute(LABEL=label,
+                                                              prop_body=prop_body,
+                                                              PUBLISHED_TAG=PUBLISHED_TAG_PROPERTY_NAME,
+                                                              CONTENT_HASH=CONTENT_HASH_PROPERTY_NAME)
+        else:
+            prop_body = self._create_props_param_body(header, NODE_REQUIRED_KEYS, 'node')
+
+            update_statement = ''
+            if not self.is_create_only_node({NODE_LABEL_KEY: label}):
+                update_statement = NODE_UPDATE_TEMPLATE.substitute(update_prop_body=prop_body)
+
+            stmt = NODE_UNWIND_MERGE_TEMPLATE.substitute(LABEL=label,
+                                                         create_prop_body=prop_body,
+                                                         update_statement=update_statement)
+
+        if self._node_id_cache is not None:
+            stmt = '{}\n{}'.format(stmt.rstrip(), NODE_ID_RETURN_CLAUSE)
+        return stmt
 
     def is_create_only_node(self, node_record):
         # type: (dict) -> bool
@@ -239,166 +1035,749 @@ class Neo4jCsvPublisher(Publisher):
         else:
             return False
 
-    def create_node_merge_statement(self, node_record):
-        # type: (dict) -> str
+    def create_node_merge_statement(self, label, header):
+        # type: (str, Tuple[str, ...]) -> str
         """
-        Creates node merge statement
-        :param node_record:
+        Creates node merge statement for the label and the header, where the record is $row parameter. It's cached,
+        as it's the same for the records of the same shape.
+        :param label:
+        :param header: CSV header of the record
         :return:
         """
-        params = copy.deepcopy(node_record)
-        params['create_prop_body'] = self._create_props_body(node_record, NODE_REQUIRED_KEYS, 'node')
+        is_create_only = self.is_create_only_node({NODE_LABEL_KEY: label})
+        key = ('node', label, header, is_create_only)
+        stmt = self._statement_cache.get(key)
+        if stmt:
+            return stmt
 
+        prop_body = self._create_props_param_body(header, NODE_REQUIRED_KEYS, 'node', row='$row')
         update_statement = ''
-        if not self.is_create_only_node(node_record):
-            update_prop_body = self._create_props_body(node_record, NODE_REQUIRED_KEYS, 'node')
-            update_statement = NODE_UPDATE_TEMPLATE.substitute(update_prop_body=update_prop_body)
-        params['update_statement'] = update_statement
+        if not is_create_only:
+            update_statement = NODE_UPDATE_TEMPLATE.substitute(update_prop_body=prop_body)
 
-        return NODE_MERGE_TEMPLATE.substitute(params)
+        stmt = NODE_MERGE_TEMPLATE.substitute(LABEL=label,
+                                              create_prop_body=prop_body,
+                                              update_statement=update_statement)
+        self._statement_cache[key] = stmt
+        return stmt
 
-    def _publish_relation(self, relation_file):
-        # type: (str) -> None
+    def _publish_relation(self, relation_file, partition=None):
+        # type: (str, Optional[int]) -> None
         """
         Creates relation between two nodes.
         (In Amundsen, all relation is bi-directional)
 
-        Example of Cypher query executed by this method:
-        MATCH (n1:Table {key: 'presto://gold.test_schema1/test_table1'}),
-              (n2:Column {key: 'presto://gold.test_schema1/test_table1/test_col1'})
+        Example of Cypher query executed by this method, with the record as $row parameter:
+        MATCH (n1:Table {key: $row.START_KEY}),
+              (n2:Column {key: $row.END_KEY})
         MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)
+        ON CREATE SET r1.published_tag = $publish_tag , r2.published_tag = $publish_tag
+        ON MATCH SET r1.published_tag = $publish_tag , r2.published_tag = $publish_tag
         RETURN n1.key, n2.key
 
         :param relation_file:
+        :param partition: Publishes only the relations in the partition, if set
         :return:
         """
 
-        tx = self._session.begin_transaction()
-        with open(relation_file, 'r') as relation_csv:
-            for count, rel_record in enumerate(csv.DictReader(relation_csv)):
-                stmt = self.create_relationship_merge_statement(rel_record=rel_record)
-                tx = self._execute_statement(stmt, tx, count,
-                                             expect_result=self._confirm_rel_created)
-
-        tx.commit()
-        LOGGER.info('Committed {} records'.format(count + 1))
-
-    def create_relationship_merge_statement(self, rel_record):
-        # type: (dict) -> str
+        if self._unwind_batch_size:
+            self._publish_relation_batches(relation_file, partition)
+            return
+
+        tx, offset = self._begin_file_transaction(relation_file, self._relation_journal, partition)
+        if tx is None:
+            return
+
+        with self._open_for_publish(relation_file, partition) as relation_csv:
+            for offset, rel_record in self._read_records(relation_csv, offset):
+                stmt = self.create_relationship_merge_statement(rel_record[RELATION_START_LABEL],
+                                                                rel_record[RELATION_END_LABEL],
+                                                                rel_record[RELATION_TYPE],
+                                                                rel_record[RELATION_REVERSE_TYPE],
+                                                                tuple(rel_record.keys()))
+                row = self._create_row_param(rel_record, RELATION_REQUIRED_KEYS,
+                                             {RELATION_START_KEY, RELATION_END_KEY})
+                self._execute_statement(stmt, row, tx, expect_result=self._confirm_rel_created,
+                                        stats_key=(relation_file, rel_record[RELATION_TYPE]), offset=offset)
+
+        self._commit_file_transaction(tx, relation_file, self._relation_journal, partition)
+
+    def _publish_relation_batches(self, relation_file, partition=None):
+        # type: (str, Optional[int]) -> None
         """
-        Creates relationship merge statement
-        :param rel_record:
+        Publishes relations of the file in batches of UNWIND statement. Properties are sent as a map in the row.
+        Example of Cypher query executed by this method, with rows as $batch parameter:
+        UNWIND $batch AS row
+        MATCH (n1:Table {key: row.START_KEY}),
+              (n2:Column {key: row.END_KEY})
+        MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)
+        SET r1 += row.props, r2 += row.props, r1.published_tag = $publish_tag, r2.published_tag = $publish_tag
+        RETURN count(*) AS count
+
+        With neo4j_relationship_creation_confirm, the count returned is compared with the number of rows in the batch.
+
+        With neo4j_node_id_cache, a batch is split by whether its start node and end node are in the cache, and each
+        split is published with the statement that matches the cached nodes by id, e.g:
+        UNWIND $batch AS row
+        MATCH (n1:Table),
+              (n2:Column {key: row.END_KEY})
+        WHERE id(n1) = row.START_ID AND n1.key = row.START_KEY
+        ...
+        :param relation_file:
+        :param partition: Publishes only the relations in the partition, if set
         :return:
         """
-        param = copy.deepcopy(rel_record)
-        create_prop_body = self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r1')
-        param['PROP_STMT'] = ' '  # No properties for relationship by default
-
-        if create_prop_body:
-            # We need one more body for reverse relation
-            create_prop_body = ' , '.join([create_prop_body,
-                                           self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r2')])
-            update_prop_body = ' , '.join([self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r1'),
-                                           self._create_props_body(rel_record, RELATION_REQUIRED_KEYS, 'r2')])
-
-            param['PROP_STMT'] = """ON CREATE SET {create_prop_body}
-ON MATCH SET {update_prop_body}""".format(create_prop_body=create_prop_body,
-                                          update_prop_body=update_prop_body)
-
-        return RELATION_MERGE_TEMPLATE.substitute(param)
-
-    def _create_props_body(self,
-                           record_dict,
-                           excludes,
-                           identifier):
-        # type: (dict, Set, str) -> str
+        tx, offset = self._begin_file_transaction(relation_file, self._relation_journal, partition)
+        if tx is None:
+            return
+
+        with self._open_for_publish(relation_file, partition) as relation_csv:
+            batches = self._iter_batches(self._read_records(relation_csv, offset),
+                                         lambda record: (record[RELATION_START_LABEL], record[RELATION_END_LABEL],
+                                                         record[RELATION_TYPE], record[RELATION_REVERSE_TYPE]))
+            for (start_label, end_label, rel_type, reverse_type), records, offset in batches:
+                rows = [{RELATION_START_KEY: record[RELATION_START_KEY],
+                         RELATION_END_KEY: record[RELATION_END_KEY],
+                         'props': self._create_row_param(record, RELATION_REQUIRED_KEYS, set())}
+                        for record in records]
+                if self._content_hash:
+                    for row in rows:
+                        row[CONTENT_HASH_PROPERTY_NAME] = _content_hash(row['props'])
+
+                splits = list(self._split_by_node_ids(start_label, end_label, rows).items())
+                for index, ((start_by_id, end_by_id), split_rows) in enumerate(splits):
+                    stmt = self.create_relationship_unwind_statement(start_label, end_label, rel_type, reverse_type,
+                                                                     start_by_id=start_by_id, end_by_id=end_by_id)
+                    # The batch is published once its last split commits
+                    self._execute_batch(stmt, split_rows, tx, expect_result=self._confirm_rel_created,
+                                        stats_key=(relation_file, rel_type),
+                                        offset=offset if index == len(splits) - 1 else None)
+
+        self._commit_file_transaction(tx, relation_file, self._relation_journal, partition)
+
+    def _split_by_node_ids(self, start_label, end_label, rows):
+        # type: (str, str, List[Dict[str, Any]]) -> Dict[Tuple[bool, bool], List[Dict[str, Any]]]
+        """
+        Sets ids of the start node and the end node of the rows from the node id cache, and splits the rows by whether
+        each node is found.
+        :param start_label:
+        :param end_label:
+        :param rows: UNWIND rows of relationships
+        :return: An ordered dict of (start node is found, end node is found) to the rows
+        """
+        splits = collections.OrderedDict()  # type: Dict[Tuple[bool, bool], List[Dict[str, Any]]]
+        if self._node_id_cache is None:
+            splits[(False, False)] = rows
+            return splits
+
+        for row in rows:
+            start_id = self._node_id_cache.get(start_label, row[RELATION_START_KEY])
+            end_id = self._node_id_cache.get(end_label, row[RELATION_END_KEY])
+            if start_id is not None:
+                row[RELATION_START_ID] = start_id
+            if end_id is not None:
+                row[RELATION_END_ID] = end_id
+            splits.setdefault((start_id is not None, end_id is not None), []).append(row)
+        return splits
+
+    def create_relationship_unwind_statement(self,
+                                             start_label,  # type: str
+                                             end_label,  # type: str
+                                             rel_type,  # type: str
+                                             reverse_type,  # type: str
+                                             start_by_id=False,  # type: bool
+                                             end_by_id=False,  # type: bool
+                                             ):
+        # type: (...) -> str
+        """
+        Creates UNWIND relationship merge statement for the labels and the types
+        :param start_label:
+        :param end_label:
+        :param rel_type:
+        :param reverse_type:
+        :param start_by_id: Matches start node by START_ID of the row, instead of by key
+        :param end_by_id: Matches end node by END_ID of the row, instead of by key
+        :return:
+        """
+        patterns = []
+        conditions = []
+        for node, label, key_field, id_field, by_id in (
+                ('n1', start_label, RELATION_START_KEY, RELATION_START_ID, start_by_id),
+                ('n2', end_label, RELATION_END_KEY, RELATION_END_ID, end_by_id)):
+            if by_id:
+                patterns.append('({node}:{label})'.format(node=node, label=label))
+                conditions.append('id({node}) = row.{id_field} AND {node}.key = row.{key_field}'
+                                  .format(node=node, id_field=id_field, key_field=key_field))
+            else:
+                patterns.append('({node}:{label} {{key: row.{key_field}}})'
+                                .format(node=node, label=label, key_field=key_field))
+
+        match_clause = 'MATCH {}'.format(',\n'.join(patterns))
+        if conditions:
+            match_clause += '\nWHERE {}'.format(' AND '.join(conditions))
+
+        template = RELATION_UNWIND_HASH_MERGE_TEMPLATE if self._content_hash else RELATION_UNWIND_MERGE_TEMPLATE
+        return template.substitute(MATCH_CLAUSE=match_clause,
+                                   TYPE=rel_type,
+                                   REVERSE_TYPE=reverse_type,
+                                   PUBLISHED_TAG=PUBLISHED_TAG_PROPERTY_NAME,
+                                   CONTENT_HASH=CONTENT_HASH_PROPERTY_NAME)
+
+    def create_relationship_merge_statement(self, start_label, end_label, rel_type, reverse_type, header):
+        # type: (str, str, str, str, Tuple[str, ...]) -> str
         """
-        Creates properties body with params required for resolving template.
+        Creates relationship merge statement for the labels, the types and the header, where the record is $row
+        parameter. It's cached, as it's the same for the records of the same shape.
+        :param start_label:
+        :param end_label:
+        :param rel_type:
+        :param reverse_type:
+        :param header: CSV header of the record
+        :return:
+        """
+        key = ('relation', start_label, end_label, rel_type, reverse_type, header)
+        stmt = self._statement_cache.get(key)
+        if stmt:
+            return stmt
+
+        # We need one more body for reverse relation
+        prop_body = ' , '.join([self._create_props_param_body(header, RELATION_REQUIRED_KEYS, 'r1', row='$row'),
+                                self._create_props_param_body(header, RELATION_REQUIRED_KEYS, 'r2', row='$row')])
+        prop_stmt = """ON CREATE SET {create_prop_body}
+ON MATCH SET {update_prop_body}""".format(create_prop_body=prop_body,
+                                          update_prop_body=prop_body)
+
+        stmt = RELATION_MERGE_TEMPLATE.substitute(START_LABEL=start_label,
+                                                  END_LABEL=end_label,
+                                                  TYPE=rel_type,
+                                                  REVERSE_TYPE=reverse_type,
+                                                  PROP_STMT=prop_stmt)
+        self._statement_cache[key] = stmt
+        return stmt
+
+    def _create_props_param_body(self,
+                                 header,  # type: Iterable[str]
+                                 excludes,  # type: Set[str]
+                                 identifier,  # type: str
+                                 with_publish_tag=True,  # type: bool
+                                 row='row',  # type: str
+                                 ):
+        # type: (...) -> str
+        """
+        Creates properties body that sets properties from the fields of UNWIND row.
 
-        e.g: Note that node.key3 is not quoted if header has UNQUOTED_SUFFIX.
-        identifier.key1 = 'val1' , identifier.key2 = 'val2', identifier.key3 = val3
+        e.g: identifier.key1 = row.key1, identifier.key2 = row.key2, identifier.published_tag = $publish_tag
 
-        :param record_dict: A dict represents CSV row
+        :param header: CSV header of the rows
         :param excludes: set of excluded columns that does not need to be in properties (e.g: KEY, LABEL ...)
         :param identifier: identifier that will be used in CYPHER query as shown on above example
-        :param is_update: Creates property body for update statement in MERGE
+        :param with_publish_tag: Sets published tag too
+        :param row: Expression of the row (e.g: $row for the row parameter of a statement per row)
         :return: Properties body for Cypher statement
         """
-        template_params = {}
         props = []
-        for k, v in six.iteritems(record_dict):
+        for k in header:
             if k in excludes:
-                template_params[k] = v
                 continue
 
-            # escape quote for Cypher query
-            # if isinstance(str, v):
-            v = v.replace('\'', "\\'")
-
             if k.endswith(UNQUOTED_SUFFIX):
                 k = k[:-len(UNQUOTED_SUFFIX)]
-                props.append('{id}.{key} = {val}'.format(id=identifier, key=k, val=v))
-            else:
-                props.append("""{id}.{key} = '{val}'""".format(id=identifier, key=k, val=v))
+            props.append('{id}.{key} = {row}.{key}'.format(id=identifier, key=k, row=row))
 
-            template_params[k] = v
-
-        props.append("""{id}.{key} = '{val}'""".format(id=identifier,
-                                                       key=PUBLISHED_TAG_PROPERTY_NAME,
-                                                       val=self.publish_tag))
+        if with_publish_tag:
+            props.append('{id}.{key} = $publish_tag'.format(id=identifier, key=PUBLISHED_TAG_PROPERTY_NAME))
 
         return ', '.join(props)
 
-    def _execute_statement(self,
-                           stmt,
-                           tx,
-                           count,
-                           expect_result=False):
-        # type: (str, Transaction, int, bool) -> Transaction
+    def _create_row_param(self,
+                          record_dict,  # type: Dict[str, str]
+                          excludes,  # type: Set[str]
+                          keys,  # type: Set[str]
+                          ):
+        # type: (...) -> Dict[str, Any]
+        """
+        Creates a row of UNWIND parameter (or row parameter of a statement per row) from CSV row. Values of UNQUOTED
+        columns are converted.
+        :param record_dict: A dict represents CSV row
+        :param excludes: set of columns that are not properties (e.g: KEY, LABEL ...)
+        :param keys: set of excluded columns that are still needed in the row to match nodes (e.g: KEY)
+        :return: Row of UNWIND parameter
+        """
+        row = {}  # type: Dict[str, Any]
+        for k, v in six.iteritems(record_dict):
+            if k in excludes:
+                if k in keys:
+                    row[k] = v
+                continue
+
+            if k.endswith(UNQUOTED_SUFFIX):
+                row[k[:-len(UNQUOTED_SUFFIX)]] = _parse_unquoted_value(v)
+            else:
+                row[k] = v
+        return row
+
+    def _begin_transaction(self, offset=0, on_commit=None):
+        # type: (int, Optional[Callable[[RetryableTransaction], None]]) -> RetryableTransaction
+        return RetryableTransaction(session=self._session,
+                                    sizer=self._transaction_sizer,
+                                    max_retries=self._transient_error_max_retries,
+                                    backoff_sec=self._transient_error_backoff_sec,
+                                    stats=self.stats,
+                                    offset=offset,
+                                    on_commit=on_commit)
+
+    def _execute_batch(self,
+                       stmt,  # type: str
+                       rows,  # type: List[Dict[str, Any]]
+                       tx,  # type: RetryableTransaction
+                       expect_result=False,  # type: bool
+                       stats_key=None,  # type: Optional[Tuple[str, str]]
+                       offset=None,  # type: Optional[int]
+                       on_committed=None,  # type: Optional[Callable[[Any], None]]
+                       ):
+        # type: (...) -> None
+        """
+        Executes UNWIND statement with rows as batch parameter.
+        If 'expect_result' flag is True, it confirms if the count returned by the statement is same as number of rows.
+        :param stmt:
+        :param rows:
+        :param tx:
+        :param expect_result: By having this True, it will validate the count returned.
+        :param stats_key: File and label (type for relationship) that statistics of the statement is aggregated into
+        :param offset: Number of rows from the beginning of the file that are published once the statement commits
+        :param on_committed: Called with the result of the statement once it commits
+        :return:
+        """
+        def validate(result):
+            # type: (Any) -> None
+            record = result.single()
+            if not record or record['count'] != len(rows):
+                raise RuntimeError('Failed to executed statement: {}. Expected {} rows, but got {}'
+                                   .format(stmt, len(rows), record['count'] if record else None))
+
+        tx.run(six.text_type(stmt),
+               parameters={'batch': rows, 'publish_tag': self.publish_tag},
+               row_count=len(rows),
+               validate=validate if expect_result else None,
+               stats_key=stats_key,
+               offset=offset,
+               on_committed=on_committed)
 
+    def _execute_statement(self,
+                           stmt,  # type: str
+                           row,  # type: Dict[str, Any]
+                           tx,  # type: RetryableTransaction
+                           expect_result=False,  # type: bool
+                           stats_key=None,  # type: Optional[Tuple[str, str]]
+                           offset=None,  # type: Optional[int]
+                           ):
+        # type: (...) -> None
         """
-        Executes statement against Neo4j. If execution fails, it rollsback and raise exception.
+        Executes statement against Neo4j with the row as $row parameter.
         If 'expect_result' flag is True, it confirms if result object is not null.
         :param stmt:
+        :param row:
         :param tx:
-        :param count:
         :param expect_result: By having this True, it will validate if result object is not None.
+        :param stats_key: File and label (type for relationship) that statistics of the statement is aggregated into
+        :param offset: Number of rows from the beginning of the file that are published once the statement commits
         :return:
         """
-        try:
-            if LOGGER.isEnabledFor(logging.DEBUG):
-                LOGGER.debug('Executing statement: {}'.format(stmt))
+        def validate(result):
+            # type: (Any) -> None
+            if not result.single():
+                raise RuntimeError('Failed to executed statement: {} with {}'.format(stmt, row))
 
-            if six.PY2:
-                result = tx.run(unicode(stmt, errors='ignore'))  # noqa
-            else:
-                result = tx.run(str(stmt).encode('utf-8', 'ignore'))
-            if expect_result and not result.single():
-                raise RuntimeError('Failed to executed statement: {}'.format(stmt))
-
-            if count > 1 and count % self._transaction_size == 0:
-                tx.commit()
-                LOGGER.info('Committed {} records so far'.format(count))
-                return self._session.begin_transaction()
-
-            return tx
-        except Exception as e:
-            LOGGER.exception('Failed to execute Cypher query')
-            if not tx.closed():
-                tx.rollback()
-            raise e
+        tx.run(six.text_type(stmt),
+               parameters={'row': row, 'publish_tag': self.publish_tag},
+               validate=validate if expect_result else None,
+               stats_key=stats_key,
+               offset=offset)
 
     def _try_create_index(self,
-                          label):
-        # type: (str) -> None
+                          label,  # type: str
+                          session,  # type: Any
+                          ):
+        # type: (...) -> None
         """
         For any label seen first time for this publisher it will try to create unique index.
         There's no side effect on Neo4j side issuing index creation for existing index.
         :param label:
+        :param session:
         :return:
         """
         stmt = CREATE_UNIQUE_INDEX_TEMPLATE.substitute(LABEL=label)
         LOGGER.info('Trying to create index for label {label} if not exist: {stmt}'.format(label=label,
                                                                                            stmt=stmt))
-        with self._driver.session() as session:
-            session.run(stmt)
+        session.run(stmt)
+
+
+class TransactionSizer(object):
+    """
+    Decides when a transaction commits, by number of rows and by payload bytes. Shared by the transactions of a
+    publisher, including the ones of concurrent workers.
+
+    When adaptive, it halves the size when a commit takes longer than the target latency or a transaction fails on
+    a transient error (e.g: out of memory), and doubles it when a commit takes less than half of the target latency,
+    within min and max size.
+    """
+    def __init__(self,
+                 size,  # type: int
+                 max_bytes=0,  # type: int
+                 adaptive=False,  # type: bool
+                 target_latency_sec=5.0,  # type: float
+                 min_size=10,  # type: int
+                 max_size=10000,  # type: int
+                 ):
+        # type: (...) -> None
+        self.size = size
+        self._max_bytes = max_bytes
+        self._adaptive = adaptive
+        self._target_latency_sec = target_latency_sec
+        self._min_size = min_size
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    def is_full(self, row_count, byte_size):
+        # type: (int, int) -> bool
+        return row_count >= self.size or (0 < self._max_bytes <= byte_size)
+
+    def on_commit(self, latency_sec):
+        # type: (float) -> None
+        if not self._adaptive:
+            return
+
+        if latency_sec > self._target_latency_sec:
+            self._resize(self.size // 2)
+        elif latency_sec < self._target_latency_sec / 2:
+            self._resize(self.size * 2)
+
+    def on_transient_error(self):
+        # type: () -> None
+        if self._adaptive:
+            self._resize(self.size // 2)
+
+    def _resize(self, size):
+        # type: (int) -> None
+        with self._lock:
+            size = min(max(size, self._min_size), self._max_size)
+            if size != self.size:
+                LOGGER.info('Transaction size is changed from {} to {}'.format(self.size, size))
+                self.size = size
+
+
+# Errors that a transaction can succeed when it's run again. (e.g: deadlock, leader switch, service unavailable)
+RETRYABLE_ERRORS = (TransientError, NotALeaderError, ForbiddenOnReadOnlyDatabaseError, ServiceUnavailable,
+                    SessionExpired)
+
+
+def _is_retryable(error):
+    # type: (Exception) -> bool
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    # Out of memory is reported as DatabaseError by some versions of Neo4j
+    return isinstance(error, CypherError) and 'OutOfMemory' in (error.code or '')
+
+
+# (statement, parameters, row count, validate, stats key, on committed)
+_PendingStatement = Tuple[Any, Optional[Dict[str, Any]], int, Optional[Callable[[Any], None]],
+                          Optional[Tuple[str, str]], Optional[Callable[[Any], None]]]
+
+
+class RetryableTransaction(object):
+    """
+    A transaction that commits when TransactionSizer decides it's full. Statements run since the last commit are kept,
+    so that when it fails on a transient error, it rolls back and runs them again in a new transaction, after
+    exponential backoff. This is safe as the statements are MERGE. On any other error, it rolls back and raises it.
+    """
+    def __init__(self,
+                 session,  # type: Any
+                 sizer,  # type: TransactionSizer
+                 max_retries,  # type: int
+                 backoff_sec,  # type: float
+                 stats=None,  # type: Optional[PublishStats]
+                 offset=0,  # type: int
+                 on_commit=None,  # type: Optional[Callable[[RetryableTransaction], None]]
+                 ):
+        # type: (...) -> None
+        """
+        :param session:
+        :param sizer:
+        :param max_retries:
+        :param backoff_sec:
+        :param stats: Aggregates result summaries of committed statements, if set
+        :param offset: Number of rows from the beginning of the file that are committed before this transaction
+        :param on_commit: Called after each commit (e.g: to record committed_offset in a journal)
+        """
+        self._session = session
+        self._sizer = sizer
+        self._max_retries = max_retries
+        self._backoff_sec = backoff_sec
+        self._stats = stats
+        self._on_commit = on_commit
+        self._tx = None  # type: Optional[Transaction]
+        # Statements run since the last commit
+        self._pending = []  # type: List[_PendingStatement]
+        # (stats key, row count, result, on committed) of the statements run in the current transaction
+        self._results = []  # type: List[Tuple[Optional[Tuple[str, str]], int, Any, Optional[Callable[[Any], None]]]]
+        self._pending_rows = 0
+        self._pending_bytes = 0
+        # Number of rows run, including the pending ones
+        self.row_count = 0
+        # Offset of the last statement run, and of the last statement committed. (see run)
+        self._last_offset = offset
+        self.committed_offset = offset
+        self.commit_count = 0
+
+    def run(self,
+            statement,  # type: Any
+            parameters=None,  # type: Optional[Dict[str, Any]]
+            row_count=1,  # type: int
+            validate=None,  # type: Optional[Callable[[Any], None]]
+            stats_key=None,  # type: Optional[Tuple[str, str]]
+            offset=None,  # type: Optional[int]
+            on_committed=None,  # type: Optional[Callable[[Any], None]]
+            ):
+        # type: (...) -> None
+        """
+        Runs the statement, and commits if the transaction is full.
+        :param statement:
+        :param parameters:
+        :param row_count: Number of rows the statement publishes
+        :param validate: Validates the result of the statement, raising an error if it's not valid
+        :param stats_key: File and label that result summary of the statement is aggregated into, once committed
+        :param offset: Number of rows from the beginning of the file that are published once the statement commits
+        :param on_committed: Called with the result of the statement once it commits (e.g: to read returned records)
+        :return:
+        """
+        if offset is not None:
+            self._last_offset = offset
+        self._pending.append((statement, parameters, row_count, validate, stats_key, on_committed))
+        self._pending_rows += row_count
+        self._pending_bytes += _estimate_bytes(statement) + _estimate_bytes(parameters)
+        self.row_count += row_count
+
+        self._execute(run_last=True, commit=self._sizer.is_full(self._pending_rows, self._pending_bytes))
+
+    def commit(self):
+        # type: () -> None
+        if self._tx is None:
+            return
+        self._execute(run_last=False, commit=True)
+
+    def _execute(self, run_last, commit):
+        # type: (bool, bool) -> None
+        """
+        Runs the last statement and/or commits. On transient error, it retries by running all the pending statements
+        in a new transaction.
+        :param run_last: Runs the last pending statement
+        :param commit:
+        :return:
+        """
+        retry = 0
+        is_replay = False
+        while True:
+            try:
+                if is_replay:
+                    for entry in self._pending:
+                        self._run(*entry)
+                elif run_last:
+                    self._run(*self._pending[-1])
+
+                if commit:
+                    self._commit()
+                return
+            except Exception as e:
+                LOGGER.exception('Failed to execute Cypher query')
+                self._rollback()
+                if not _is_retryable(e) or retry >= self._max_retries:
+                    raise e
+
+                self._sizer.on_transient_error()
+                backoff_sec = self._backoff_sec * (2 ** retry)
+                retry += 1
+                LOGGER.warning('Retrying {} statements in {} seconds. ({}/{})'.format(
+                    len(self._pending), backoff_sec, retry, self._max_retries))
+                time.sleep(backoff_sec)
+                is_replay = True
+
+    def _run(self,
+             statement,  # type: Any
+             parameters,  # type: Optional[Dict[str, Any]]
+             row_count,  # type: int
+             validate,  # type: Optional[Callable[[Any], None]]
+             stats_key,  # type: Optional[Tuple[str, str]]
+             on_committed,  # type: Optional[Callable[[Any], None]]
+             ):
+        # type: (...) -> None
+        if self._tx is None:
+            self._tx = self._session.begin_transaction()
+
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug('Executing statement: {} with {} rows'.format(statement, row_count))
+
+        if parameters is None:
+            result = self._tx.run(statement)
+        else:
+            result = self._tx.run(statement, parameters)
+        if validate:
+            validate(result)
+        if (self._stats is not None and stats_key is not None) or on_committed:
+            self._results.append((stats_key, row_count, result, on_committed))
+
+    def _commit(self):
+        # type: () -> None
+        start = time.time()
+        self._tx.commit()
+        self._tx = None
+        self._sizer.on_commit(time.time() - start)
+        LOGGER.info('Committed {} records so far'.format(self.row_count))
+
+        # Results are fetched by the commit, thus reading their summaries and records does not make a round trip per
+        # statement.
+        for stats_key, row_count, result, on_committed in self._results:
+            if self._stats is not None and stats_key is not None:
+                self._stats.add(stats_key[0], stats_key[1], row_count, result.summary())
+            if on_committed:
+                on_committed(result)
+        self._results = []
+
+        self.committed_offset = self._last_offset
+        self.commit_count += 1
+        if self._on_commit:
+            self._on_commit(self)
+
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_bytes = 0
+
+    def _rollback(self):
+        # type: () -> None
+        tx, self._tx = self._tx, None
+        self._results = []
+        if tx is not None and not tx.closed():
+            tx.rollback()
+
+
+class PublishStats(object):
+    """
+    Statistics of a publish, from the result summary of committed statements: number of rows, nodes created,
+    properties set, relationships created, and time the server took to produce and consume the result. They are
+    aggregated in total, per file, and per label (type for relationship). Shared by the transactions of a publisher.
+    """
+    COUNTERS = ('rows', 'nodes_created', 'properties_set', 'relationships_created', 'db_time_ms')
+
+    def __init__(self):
+        # type: () -> None
+        self._lock = threading.Lock()
+        self._total = dict.fromkeys(PublishStats.COUNTERS, 0)  # type: Dict[str, int]
+        self._files = collections.OrderedDict()  # type: Dict[str, Dict[str, int]]
+        self._labels = collections.OrderedDict()  # type: Dict[str, Dict[str, int]]
+
+    def add(self, path, label, row_count, summary):
+        # type: (str, str, int, Any) -> None
+        """
+        :param path: File of the statement
+        :param label: Label of nodes, or type of relationships of the statement
+        :param row_count: Number of rows the statement published
+        :param summary: Result summary of the statement
+        :return:
+        """
+        counters = {'rows': row_count,
+                    'nodes_created': int(summary.counters.nodes_created),
+                    'properties_set': int(summary.counters.properties_set),
+                    'relationships_created': int(summary.counters.relationships_created),
+                    'db_time_ms': int(summary.result_available_after or 0) + int(summary.result_consumed_after or 0)}
+        with self._lock:
+            for stats in (self._total,
+                          self._files.setdefault(path, dict.fromkeys(PublishStats.COUNTERS, 0)),
+                          self._labels.setdefault(label, dict.fromkeys(PublishStats.COUNTERS, 0))):
+                for k, v in six.iteritems(counters):
+                    stats[k] += v
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        """
+        :return: A dict with 'total' counters, and counters per file in 'files' and per label in 'labels'
+        """
+        with self._lock:
+            return {'total': dict(self._total),
+                    'files': {path: dict(stats) for path, stats in six.iteritems(self._files)},
+                    'labels': {label: dict(stats) for label, stats in six.iteritems(self._labels)}}
+
+    def report(self, statsd=None):
+        # type: (Optional[StatsClient]) -> None
+        """
+        Logs statistics per label and in total, and emits them through statsd if it's given, e.g: [prefix].total.rows,
+        [prefix].label.Table.db_time_ms . Statistics per file is only logged, as file names are not stable.
+        :param statsd:
+        :return:
+        """
+        stats_dict = self.to_dict()
+        for path, stats in six.iteritems(stats_dict['files']):
+            LOGGER.info('Published {}: {}'.format(path, stats))
+
+        metrics = [('label.{}'.format(label), stats) for label, stats in six.iteritems(stats_dict['labels'])]
+        metrics.append(('total', stats_dict['total']))
+        for name, stats in metrics:
+            LOGGER.info('Published {}: {}'.format(name, stats))
+            if not statsd:
+                continue
+
+            for k, v in six.iteritems(stats):
+                if k == 'db_time_ms':
+                    statsd.timing('{}.{}'.format(name, k), v)
+                else:
+                    statsd.gauge('{}.{}'.format(name, k), v)
+
+
+def _estimate_bytes(value):
+    # type: (Any) -> int
+    """
+    Estimates size of statement or parameters in bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (six.text_type, six.binary_type)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k) + _estimate_bytes(v) for k, v in six.iteritems(value))
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_bytes(v) for v in value)
+    return 8
+
+
+def _content_hash(row, excludes=frozenset()):
+    # type: (Dict[str, Any], Iterable[str]) -> str
+    """
+    Computes a hash of the properties of the row that is stable across runs and processes.
+    :param row:
+    :param excludes: Fields of the row that are not properties (e.g: KEY)
+    :return: Hex digest
+    """
+    props = {k: v for k, v in six.iteritems(row) if k not in excludes}
+    return hashlib.md5(json.dumps(props, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _parse_unquoted_value(value):
+    # type: (str) -> Any
+    """
+    Converts value of UNQUOTED column into the type that Cypher parses it into when it's in the statement as is.
+    :param value:
+    :return: boolean, integer, float, None for null, or string without quotes. The value as is if none of them.
+    """
+    lower = value.strip().lower()
+    if lower in ('true', 'false'):
+        return lower == 'true'
+    if lower == 'null':
+        return None
+
+    for value_type in (int, float):
+        try:
+            return value_type(value)
+        except ValueError:
+            pass
+
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
@@ -1,8 +1,11 @@
 import abc
 
 from pyhocon import ConfigTree  # noqa: F401
+from typing import List  # noqa: F401
 
 from databuilder import Scoped
+from databuilder.utils.memory_guard import MemoryGuard  # noqa: F401
+from databuilder.utils.stage_stats import StageStats  # noqa: F401
 
 
 class Task(Scoped):
@@ -23,6 +26,23 @@ class Task(Scoped):
         """
         pass
 
+    def get_stats(self):
+        # type: () -> List[StageStats]
+        """
+        Provides statistics of each stage that the task ran.
+        :return: List of StageStats. Empty if task does not collect statistics.
+        """
+        return []
+
+    def set_memory_guard(self, memory_guard):
+        # type: (MemoryGuard) -> None
+        """
+        Sets MemoryGuard that the task can use to check memory usage while it runs. It's ignored by default.
+        :param memory_guard:
+        :return:
+        """
+        pass
+
     def get_scope(self):
         # type: () -> str
         return 'task'
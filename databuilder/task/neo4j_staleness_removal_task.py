@@ -1,7 +1,7 @@
 import logging
 import time
 
-from neo4j.v1 import GraphDatabase, BoltStatementResult  # noqa: F401
+from neo4j.v1 import BoltStatementResult  # noqa: F401
 from pyhocon import ConfigFactory  # noqa: F401
 from pyhocon import ConfigTree  # noqa: F401
 from typing import Dict, Iterable, Any  # noqa: F401
@@ -9,6 +9,7 @@ from typing import Dict, Iterable, Any  # noqa: F401
 from databuilder import Scoped
 from databuilder.task.base_task import Task  # noqa: F401
 from databuilder.publisher.neo4j_csv_publisher import JOB_PUBLISH_TAG
+from databuilder.utils import neo4j_driver_registry
 
 
 # A end point for Neo4j e.g: bolt://localhost:9999
@@ -64,10 +65,11 @@ class Neo4jStalenessRemovalTask(Task):
         self.staleness_pct = conf.get_int(STALENESS_MAX_PCT)
         self.staleness_pct_dict = conf.get(STALENESS_PCT_MAX_DICT)
         self.publish_tag = conf.get_string(JOB_PUBLISH_TAG)
-        self._driver = \
-            GraphDatabase.driver(conf.get_string(NEO4J_END_POINT_KEY),
-                                 max_connection_life_time=conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC),
-                                 auth=(conf.get_string(NEO4J_USER), conf.get_string(NEO4J_PASSWORD)))
+        # Shared with the other components, across jobs of the process (see neo4j_driver_registry)
+        self._driver = neo4j_driver_registry.get_driver(conf.get_string(NEO4J_END_POINT_KEY),
+                                                        conf.get_string(NEO4J_USER),
+                                                        conf.get_string(NEO4J_PASSWORD),
+                                                        conf)
 
         self._session = self._driver.session()
 
@@ -0,0 +1,193 @@
+import logging
+import sys
+import threading
+
+import six
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from six.moves.queue import Queue, Empty, Full
+from typing import Any, Callable, List, Optional  # noqa: F401
+
+from databuilder import Scoped
+from databuilder.extractor.base_extractor import Extractor  # noqa: F401
+from databuilder.loader.base_loader import Loader  # noqa: F401
+from databuilder.task.task import DefaultTask
+from databuilder.transformer.base_transformer import Transformer  # noqa: F401
+from databuilder.transformer.base_transformer import NoopTransformer
+
+LOGGER = logging.getLogger(__name__)
+
+# A marker that tells downstream stage that upstream stage is finished
+_END_OF_STREAM = object()
+
+
+class _Checkpoint(object):
+    """
+    A marker that carries extractor checkpoint downstream, so that loader takes its checkpoint once all the records
+    extracted before the marker are loaded.
+    """
+    def __init__(self, extractor_checkpoint):
+        # type: (Any) -> None
+        self.extractor_checkpoint = extractor_checkpoint
+
+
+# How often a blocked stage checks whether the pipeline is being aborted
+_POLL_INTERVAL_SEC = 0.1
+
+
+class PipelinedTask(DefaultTask):
+    """
+    A task that runs extractor, transformer and loader concurrently, each in its own thread.
+    Extractor and transformer run in their own thread while loader runs in the thread that calls run(). Stages are
+    connected by bounded queues so that a faster stage blocks once it's queue_size batches ahead of the next stage.
+    This lets I/O bound stages overlap each other, e.g: extractor waiting on the source while loader serializes CSV.
+
+    Records move through the queues in batches of task.batch_size, using batch methods of each component (record level
+    fallback if the component does not implement it). As each stage has a single thread, the order of records is
+    preserved.
+
+    Failure in any stage stops the other stages, and the first failure is re-raised from run(). Components are closed
+    through Closer once all stages are stopped.
+
+    Checkpoint is supported as in DefaultTask, where extractor checkpoint flows through the queues behind the records
+    extracted before it.
+    """
+    # Config keys
+    QUEUE_SIZE = 'queue_size'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({QUEUE_SIZE: 10})
+
+    def __init__(self,
+                 extractor,
+                 loader,
+                 transformer=NoopTransformer()):
+        # type: (Extractor, Loader, Transformer) -> None
+        super(PipelinedTask, self).__init__(extractor=extractor, loader=loader, transformer=transformer)
+        self._queue_size = PipelinedTask._DEFAULT_CONFIG.get_int(PipelinedTask.QUEUE_SIZE)
+        self._abort = threading.Event()
+        self._errors = []  # type: List[Any]
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        super(PipelinedTask, self).init(conf)
+        task_conf = Scoped.get_scoped_conf(conf, self.get_scope()).with_fallback(PipelinedTask._DEFAULT_CONFIG)
+        self._queue_size = task_conf.get_int(PipelinedTask.QUEUE_SIZE)
+
+    def run(self):
+        # type: () -> None
+        """
+        Runs a task with extractor and transformer in background threads.
+        :return:
+        """
+        LOGGER.info('Running a pipelined task with batch size {} and queue size {}'
+                    .format(self._batch_size, self._queue_size))
+        try:
+            self._run_pipeline()
+            self._remove_checkpoint()
+        finally:
+            self._closer.close()
+
+    def _run_pipeline(self):
+        # type: () -> None
+        self._abort.clear()
+        self._errors = []
+        extracted = Queue(maxsize=self._queue_size)  # type: Queue
+        transformed = Queue(maxsize=self._queue_size)  # type: Queue
+
+        threads = [threading.Thread(target=self._run_stage, name='extract',
+                                    args=(self._extract_stage, None, extracted)),
+                   threading.Thread(target=self._run_stage, name='transform',
+                                    args=(self._transform_batch, extracted, transformed))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            self._run_stage(self._load_batch, transformed, None)
+        finally:
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            six.reraise(*self._errors[0])
+
+    def _run_stage(self,
+                   process,  # type: Callable[[Any], Any]
+                   in_queue,  # type: Optional[Queue]
+                   out_queue  # type: Optional[Queue]
+                   ):
+        # type: (...) -> None
+        """
+        Takes item from in_queue, process it, and put the result into out_queue until it gets end of stream.
+        A stage without in_queue is a source stage which produces items until it returns None.
+        Any failure aborts the whole pipeline.
+        :param process: A function that processes an item. Returns None if there's nothing to pass downstream.
+        :param in_queue:
+        :param out_queue:
+        :return:
+        """
+        try:
+            while not self._abort.is_set():
+                item = self._get(in_queue) if in_queue else None
+                if item is _END_OF_STREAM:
+                    break
+
+                if isinstance(item, _Checkpoint):
+                    self._pass_checkpoint(item, out_queue)
+                    continue
+
+                result = process(item)
+                if result is _END_OF_STREAM:
+                    break
+
+                if result and out_queue:
+                    self._put(out_queue, result)
+
+                if not in_queue and self._is_checkpoint_due():
+                    self._pass_checkpoint(_Checkpoint(self.extractor.get_checkpoint()), out_queue)
+
+            if out_queue:
+                self._put(out_queue, _END_OF_STREAM)
+        except Exception:
+            LOGGER.exception('Failed on {} stage'.format(threading.current_thread().name))
+            self._errors.append(sys.exc_info())
+            self._abort.set()
+
+    def _pass_checkpoint(self, checkpoint, out_queue):
+        # type: (_Checkpoint, Optional[Queue]) -> None
+        """
+        Passes checkpoint to next stage, or saves it if it's the last stage.
+        """
+        if out_queue:
+            self._put(out_queue, checkpoint)
+        else:
+            self._save_checkpoint(checkpoint.extractor_checkpoint)
+
+    def _extract_stage(self, _):
+        # type: (Any) -> Any
+        records = self._extract_batch()
+        return records if records else _END_OF_STREAM
+
+    def _get(self, queue):
+        # type: (Queue) -> Any
+        """
+        Blocks until it gets an item from the queue, or returns end of stream if pipeline is aborted.
+        """
+        while True:
+            try:
+                return queue.get(timeout=_POLL_INTERVAL_SEC)
+            except Empty:
+                if self._abort.is_set():
+                    return _END_OF_STREAM
+
+    def _put(self, queue, item):
+        # type: (Queue, Any) -> None
+        """
+        Blocks until it puts an item into the queue, or gives up if pipeline is aborted.
+        """
+        while not self._abort.is_set():
+            try:
+                queue.put(item, timeout=_POLL_INTERVAL_SEC)
+                return
+            except Full:
+                continue
@@ -1,22 +1,46 @@
+import json
 import logging
+import os
+import time
 
-from pyhocon import ConfigTree  # noqa: F401
+import six
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, List, Optional  # noqa: F401
 
 from databuilder import Scoped
-from databuilder.extractor.base_extractor import Extractor  # noqa: F401
+from databuilder.extractor.base_extractor import Extractor
 from databuilder.loader.base_loader import Loader  # noqa: F401
 from databuilder.task.base_task import Task  # noqa: F401
-from databuilder.transformer.base_transformer import Transformer  # noqa: F401
+from databuilder.transformer.base_transformer import Transformer
 from databuilder.transformer.base_transformer \
     import NoopTransformer  # noqa: F401
 from databuilder.utils.closer import Closer
+from databuilder.utils.memory_guard import MemoryGuard  # noqa: F401
+from databuilder.utils.stage_stats import StageStats
 
 
 class DefaultTask(Task):
     """
     A default task expecting to extract, transform and load.
 
+    If both extractor and transformer implement batch methods (extract_batch, transform_batch), the task moves records
+    in batches of task.batch_size instead of one record at a time. Batches are loaded with load_batch, which falls back
+    to load() per record for a loader that does not implement it.
+
+    If task.checkpoint_path is set, the task saves checkpoints of extractor and loader into the file every
+    task.checkpoint_interval_sec, and a task that is restarted with the same path resumes from the last checkpoint.
+    Checkpoint is taken only if both extractor and loader support it (get_checkpoint / restore_checkpoint), and the
+    file is removed once the task succeeds.
     """
+    # Config keys
+    BATCH_SIZE = 'batch_size'
+    CHECKPOINT_PATH = 'checkpoint_path'
+    CHECKPOINT_INTERVAL_SEC = 'checkpoint_interval_sec'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({BATCH_SIZE: 1000,
+                                               CHECKPOINT_PATH: '',
+                                               CHECKPOINT_INTERVAL_SEC: 60})
+
     def __init__(self,
                  extractor,
                  loader,
@@ -25,6 +49,14 @@ class DefaultTask(Task):
         self.extractor = extractor
         self.transformer = transformer
         self.loader = loader
+        self._batch_size = DefaultTask._DEFAULT_CONFIG.get_int(DefaultTask.BATCH_SIZE)
+        self._checkpoint_path = DefaultTask._DEFAULT_CONFIG.get_string(DefaultTask.CHECKPOINT_PATH)
+        self._checkpoint_interval_sec = DefaultTask._DEFAULT_CONFIG.get_int(DefaultTask.CHECKPOINT_INTERVAL_SEC)
+        self._last_checkpoint_time = time.time()
+        self._extract_stats = StageStats('extract')
+        self._transform_stats = StageStats('transform')
+        self._load_stats = StageStats('load')
+        self._memory_guard = None  # type: Optional[MemoryGuard]
 
         self._closer = Closer()
         self._closer.register(self.extractor.close)
@@ -33,6 +65,14 @@ class DefaultTask(Task):
 
     def init(self, conf):
         # type: (ConfigTree) -> None
+        task_conf = Scoped.get_scoped_conf(conf, self.get_scope()).with_fallback(DefaultTask._DEFAULT_CONFIG)
+        self._batch_size = task_conf.get_int(DefaultTask.BATCH_SIZE)
+        self._checkpoint_path = task_conf.get_string(DefaultTask.CHECKPOINT_PATH)
+        self._checkpoint_interval_sec = task_conf.get_int(DefaultTask.CHECKPOINT_INTERVAL_SEC)
+        self._last_checkpoint_time = time.time()
+        if self._checkpoint_path and os.path.exists(self._checkpoint_path):
+            self._restore_checkpoint()
+
         self.extractor.init(Scoped.get_scoped_conf(conf, self.extractor.get_scope()))
         self.transformer.init(Scoped.get_scoped_conf(conf, self.transformer.get_scope()))
         self.loader.init(Scoped.get_scoped_conf(conf, self.loader.get_scope()))
@@ -45,13 +85,162 @@ class DefaultTask(Task):
         """
         logging.info('Running a task')
         try:
-            record = self.extractor.extract()
-
-            while record:
-                record = self.transformer.transform(record)
-                if not record:
-                    continue
-                self.loader.load(record)
-                record = self.extractor.extract()
+            if self._is_batch_supported():
+                logging.info('Running a task in batch of {}'.format(self._batch_size))
+                self._run_batch()
+            else:
+                self._run_record()
+            self._remove_checkpoint()
         finally:
             self._closer.close()
+
+    def _run_record(self):
+        # type: () -> None
+        record = self._extract()
+        while record:
+            record = self._transform(record)
+            if record:
+                self._load(record)
+            self._checkpoint_if_due()
+            record = self._extract()
+
+    def _run_batch(self):
+        # type: () -> None
+        records = self._extract_batch()
+        while records:
+            records = self._transform_batch(records)
+            if records:
+                self._load_batch(records)
+            self._checkpoint_if_due()
+            records = self._extract_batch()
+
+    def _extract(self):
+        # type: () -> Any
+        start = time.time()
+        record = self.extractor.extract()
+        self._extract_stats.add(time.time() - start, 1 if record else 0)
+        self._check_memory('extract', 1)
+        return record
+
+    def _transform(self, record):
+        # type: (Any) -> Any
+        start = time.time()
+        record = self.transformer.transform(record)
+        self._transform_stats.add(time.time() - start)
+        self._check_memory('transform', 1)
+        return record
+
+    def _load(self, record):
+        # type: (Any) -> None
+        start = time.time()
+        self.loader.load(record)
+        self._load_stats.add(time.time() - start)
+        self._check_memory('load', 1)
+
+    def _extract_batch(self):
+        # type: () -> List[Any]
+        start = time.time()
+        records = self.extractor.extract_batch(self._batch_size)
+        self._extract_stats.add(time.time() - start, len(records))
+        self._check_memory('extract', len(records))
+        return records
+
+    def _transform_batch(self, records):
+        # type: (List[Any]) -> List[Any]
+        start = time.time()
+        result = self.transformer.transform_batch(records)
+        self._transform_stats.add(time.time() - start, len(records))
+        self._check_memory('transform', len(records))
+        return result
+
+    def _load_batch(self, records):
+        # type: (List[Any]) -> None
+        start = time.time()
+        self.loader.load_batch(records)
+        self._load_stats.add(time.time() - start, len(records))
+        self._check_memory('load', len(records))
+
+    def get_stats(self):
+        # type: () -> List[StageStats]
+        return [self._extract_stats, self._transform_stats, self._load_stats]
+
+    def set_memory_guard(self, memory_guard):
+        # type: (MemoryGuard) -> None
+        self._memory_guard = memory_guard
+
+    def _check_memory(self, stage, record_count):
+        # type: (str, int) -> None
+        if self._memory_guard:
+            self._memory_guard.check(stage, record_count)
+
+    def _checkpoint_if_due(self):
+        # type: () -> None
+        if self._is_checkpoint_due():
+            self._save_checkpoint(self.extractor.get_checkpoint())
+
+    def _is_checkpoint_due(self):
+        # type: () -> bool
+        """
+        Checks whether checkpoint interval has passed since last checkpoint. If so, it starts next interval.
+        :return:
+        """
+        if not self._checkpoint_path or time.time() - self._last_checkpoint_time < self._checkpoint_interval_sec:
+            return False
+
+        self._last_checkpoint_time = time.time()
+        return True
+
+    def _save_checkpoint(self, extractor_checkpoint):
+        # type: (Any) -> None
+        """
+        Saves extractor checkpoint along with loader checkpoint. Extractor checkpoint is expected to be taken when
+        all the records it has extracted are loaded. The file is replaced atomically so that a failure while saving
+        does not corrupt the previous checkpoint.
+        :param extractor_checkpoint:
+        :return:
+        """
+        loader_checkpoint = self.loader.get_checkpoint()
+        if extractor_checkpoint is None or loader_checkpoint is None:
+            logging.warning('Checkpoint is not supported by {} or {}. Disabling checkpoint'
+                            .format(type(self.extractor).__name__, type(self.loader).__name__))
+            self._checkpoint_path = ''
+            return
+
+        temp_path = '{}.tmp'.format(self._checkpoint_path)
+        with open(temp_path, 'w') as f:
+            json.dump({'extractor': extractor_checkpoint, 'loader': loader_checkpoint}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_path, self._checkpoint_path)
+        logging.info('Saved checkpoint to {}'.format(self._checkpoint_path))
+
+    def _restore_checkpoint(self):
+        # type: () -> None
+        logging.info('Resuming from checkpoint {}'.format(self._checkpoint_path))
+        with open(self._checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        self.extractor.restore_checkpoint(checkpoint['extractor'])
+        self.loader.restore_checkpoint(checkpoint['loader'])
+
+    def _remove_checkpoint(self):
+        # type: () -> None
+        if self._checkpoint_path and os.path.exists(self._checkpoint_path):
+            os.remove(self._checkpoint_path)
+
+    def _is_batch_supported(self):
+        # type: () -> bool
+        """
+        Batch path is used only when extractor and transformer implement their own batch method, as record level
+        fallback of base class does not give any benefit there. Loader does not need to, as the fallback of load_batch
+        loads records one by one, just like the record path does.
+        :return:
+        """
+        return self._batch_size > 1 \
+            and _is_overridden(self.extractor, Extractor, 'extract_batch') \
+            and _is_overridden(self.transformer, Transformer, 'transform_batch')
+
+
+def _is_overridden(instance, base_class, method_name):
+    # type: (object, type, str) -> bool
+    return six.get_unbound_function(getattr(type(instance), method_name)) \
+        is not six.get_unbound_function(getattr(base_class, method_name))
@@ -1,7 +1,7 @@
 import abc
 
 from pyhocon import ConfigTree  # noqa: F401
-from typing import Any, Iterable  # noqa: F401
+from typing import Any, Iterable, List  # noqa: F401
 
 from databuilder import Scoped
 
@@ -20,6 +20,21 @@ class Transformer(Scoped):
         # type: (Any) -> Any
         pass
 
+    def transform_batch(self, records):
+        # type: (Iterable[Any]) -> List[Any]
+        """
+        Transforms multiple records at once. Transformer that can amortize the cost across records is expected to
+        override this. By default, it falls back to transform(), and filtered records (None) are dropped.
+        :param records:
+        :return: List of transformed records
+        """
+        result = []  # type: List[Any]
+        for record in records:
+            record = self.transform(record)
+            if record:
+                result.append(record)
+        return result
+
 
 class NoopTransformer(Transformer):
     """
@@ -33,6 +48,10 @@ class NoopTransformer(Transformer):
         # type: (Any) -> Any
         return record
 
+    def transform_batch(self, records):
+        # type: (Iterable[Any]) -> List[Any]
+        return list(records)
+
     def get_scope(self):
         # type: () -> str
         pass
@@ -60,6 +79,15 @@ class ChainedTransformer(Transformer):
 
         return record
 
+    def transform_batch(self, records):
+        # type: (Iterable[Any]) -> List[Any]
+        for t in self.transformers:
+            records = t.transform_batch(records)
+            if not records:
+                return []
+
+        return list(records)
+
     def get_scope(self):
         # type: () -> str
         pass
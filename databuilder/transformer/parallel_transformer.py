@@ -0,0 +1,159 @@
+import logging
+import multiprocessing
+from multiprocessing import TimeoutError
+from multiprocessing.util import Finalize
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Callable, Iterable, List, Optional, Tuple  # noqa: F401
+
+from databuilder import Scoped
+from databuilder.transformer.base_transformer import Transformer
+
+LOGGER = logging.getLogger(__name__)
+
+# Transformer replica that lives in the worker process
+_worker_transformer = None  # type: Optional[Transformer]
+
+
+def _init_worker(transformer, conf):
+    # type: (Transformer, ConfigTree) -> None
+    """
+    Initializes transformer replica in worker process. Replica will be closed when worker process exits.
+    """
+    global _worker_transformer
+    transformer.init(conf)
+    Finalize(transformer, transformer.close, exitpriority=10)
+    _worker_transformer = transformer
+
+
+def _transform(indexed_record):
+    # type: (Tuple[int, Any]) -> Tuple[int, Any]
+    index, record = indexed_record
+    return index, _worker_transformer.transform(record)  # type: ignore
+
+
+def _transform_chunk(indexed_records):
+    # type: (List[Tuple[int, Any]]) -> List[Tuple[int, Any]]
+    return [_transform(indexed_record) for indexed_record in indexed_records]
+
+
+class ParallelTransformer(Transformer):
+    """
+    A transformer that fans records out to a pool of worker processes, where each worker process has its own
+    initialized replica of the wrapped transformer. It is for CPU bound transformer (e.g: SqlToTblColUsageTransformer)
+    that is bound to single core because of GIL.
+
+    The wrapped transformer is initialized in each worker with the config under the scope of this transformer,
+    e.g: transformer.parallel.transformer.sql_to_tbl_col_usage.database. Both wrapped transformer and the records need
+    to be picklable.
+
+    Records are distributed in chunks of chunk_size per batch, so use it with batch capable extractor and loader in
+    DefaultTask, or with PipelinedTask. Output preserves input order unless preserve_order is False. If
+    record_timeout_sec is set, a record that does not finish within the timeout is skipped and the pool is
+    restarted.
+    """
+    # Config keys
+    POOL_SIZE = 'pool_size'
+    CHUNK_SIZE = 'chunk_size'
+    PRESERVE_ORDER = 'preserve_order'
+    RECORD_TIMEOUT_SEC = 'record_timeout_sec'
+
+    _DEFAULT_CONFIG = ConfigFactory.from_dict({CHUNK_SIZE: 10,
+                                               PRESERVE_ORDER: True,
+                                               RECORD_TIMEOUT_SEC: 0})
+
+    def __init__(self, transformer):
+        # type: (Transformer) -> None
+        self._transformer = transformer
+        self._pool = None  # type: Any
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        conf = conf.with_fallback(ParallelTransformer._DEFAULT_CONFIG)
+        self._pool_size = conf.get_int(ParallelTransformer.POOL_SIZE, multiprocessing.cpu_count())
+        self._chunk_size = conf.get_int(ParallelTransformer.CHUNK_SIZE)
+        self._preserve_order = conf.get_bool(ParallelTransformer.PRESERVE_ORDER)
+        self._timeout_sec = conf.get_int(ParallelTransformer.RECORD_TIMEOUT_SEC)
+        self._transformer_conf = Scoped.get_scoped_conf(conf, self._transformer.get_scope())
+
+        LOGGER.info('Transforming with {} worker processes, chunk size: {}, preserve order: {}, timeout: {} seconds'
+                    .format(self._pool_size, self._chunk_size, self._preserve_order, self._timeout_sec))
+        self._pool = self._create_pool()
+
+    def _create_pool(self):
+        # type: () -> Any
+        return multiprocessing.Pool(processes=self._pool_size,
+                                    initializer=_init_worker,
+                                    initargs=(self._transformer, self._transformer_conf))
+
+    def transform(self, record):
+        # type: (Any) -> Any
+        result = self.transform_batch([record])
+        return result[0] if result else None
+
+    def transform_batch(self, records):
+        # type: (Iterable[Any]) -> List[Any]
+        indexed_records = list(enumerate(records))
+        if self._timeout_sec > 0:
+            results = self._transform_with_timeout(indexed_records)
+        else:
+            results = list(self._get_map_func(self._preserve_order)(_transform, indexed_records, self._chunk_size))
+
+        return [record for _, record in results if record]
+
+    def _transform_with_timeout(self, indexed_records):
+        # type: (List[Tuple[int, Any]]) -> List[Tuple[int, Any]]
+        """
+        Transforms records in chunks, and waits at most timeout seconds per record in the chunk. When it times out,
+        it can't tell which record in the chunk is the culprit. Thus, it restarts the pool and retries remaining
+        records one at a time, where the record that times out is skipped.
+        :param indexed_records:
+        :return: List of tuple of index and transformed record
+        """
+        results = []  # type: List[Tuple[int, Any]]
+        pending = indexed_records
+        chunk_size = self._chunk_size
+        while pending:
+            chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+            futures = [self._pool.apply_async(_transform_chunk, (chunk,)) for chunk in chunks]
+            try:
+                for chunk, future in zip(chunks, futures):
+                    results.extend(future.get(self._timeout_sec * len(chunk)))
+                pending = []
+            except TimeoutError:
+                done = {index for index, _ in results}
+                pending = [item for item in pending if item[0] not in done]
+                self._restart_pool()
+                if chunk_size == 1:
+                    LOGGER.warning('Timed out while transforming record: {}. Skipping'.format(pending[0][1]))
+                    pending = pending[1:]
+                else:
+                    chunk_size = 1
+
+        if self._preserve_order:
+            results.sort(key=lambda result: result[0])
+        return results
+
+    def _get_map_func(self, ordered):
+        # type: (bool) -> Callable
+        return self._pool.imap if ordered else self._pool.imap_unordered
+
+    def _restart_pool(self):
+        # type: () -> None
+        LOGGER.info('Restarting worker pool')
+        self._pool.terminate()
+        self._pool = self._create_pool()
+
+    def get_scope(self):
+        # type: () -> str
+        return 'transformer.parallel'
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes the pool and waits for worker processes to exit, so that transformer replicas get closed.
+        """
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -1,4 +1,5 @@
 import atexit
+import threading
 
 from typing import Callable, List  # noqa: F401
 
@@ -11,10 +12,14 @@ class Closer(object):
 
     Order of closing registered closeable callable will be LIFO
     as closeable instance can have dependency each other.
+
+    Closer is thread safe as components running in different threads can
+    register to the same Closer. (e.g: Job.closer in ParallelJob)
     """
     def __init__(self):
         # type: () -> None
         self._stack = []  # type: List
+        self._lock = threading.Lock()
         atexit.register(self.close)
 
     def register(self, close_callable):
@@ -28,7 +33,8 @@ class Closer(object):
             raise RuntimeError('Only callable can be registered: {}'.format(
                 close_callable))
 
-        self._stack.append(close_callable)
+        with self._lock:
+            self._stack.append(close_callable)
 
     def close(self):
         # type: () -> None
@@ -42,9 +48,13 @@ class Closer(object):
             return
 
         last_exception = None
-        while len(self._stack):
-            try:
+        while True:
+            with self._lock:
+                if not self._stack:
+                    break
                 close_callable = self._stack.pop()
+
+            try:
                 close_callable()
             except Exception as e:
                 last_exception = e
@@ -0,0 +1,57 @@
+import json
+import os
+
+from typing import Any, Dict, Optional  # noqa: F401
+
+# Hidden, so that it's not picked up as a CSV file
+MANIFEST_FILE_NAME = '.manifest.json'
+
+# Keys of a manifest entry
+LABELS = 'labels'
+HEADER = 'header'
+ROW_COUNT = 'row_count'
+BYTE_SIZE = 'byte_size'
+
+
+def write_manifest(dir_path, entries):
+    # type: (str, Dict[str, Dict[str, Any]]) -> None
+    """
+    Writes manifest of the CSV files in the directory. It's written into a temporary file and renamed so that a reader
+    never sees a partially written manifest.
+    :param dir_path:
+    :param entries: A dict of file name to its entry (labels, header, row count, and byte size)
+    :return:
+    """
+    path = os.path.join(dir_path, MANIFEST_FILE_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(entries, f, sort_keys=True)
+    os.rename(path + '.tmp', path)
+
+
+def read_manifest(dir_path):
+    # type: (str) -> Dict[str, Dict[str, Any]]
+    """
+    Reads manifest of the CSV files in the directory.
+    :param dir_path:
+    :return: A dict of file name to its entry. Empty if there's no manifest.
+    """
+    path = os.path.join(dir_path, MANIFEST_FILE_NAME)
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def get_manifest_entry(manifest, path):
+    # type: (Dict[str, Dict[str, Any]], str) -> Optional[Dict[str, Any]]
+    """
+    Finds the entry of the file from the manifest of its directory.
+    :param manifest:
+    :param path:
+    :return: The entry. None if there's no entry, or the file has been changed since the manifest is written.
+    """
+    entry = manifest.get(os.path.basename(path))
+    if not entry or entry[BYTE_SIZE] != os.path.getsize(path):
+        return None
+    return entry
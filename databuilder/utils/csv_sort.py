@@ -0,0 +1,97 @@
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+
+from typing import Any, Iterator, List, Optional, Tuple  # noqa: F401
+
+# (sort key, index of the row in the file, row)
+_SortEntry = Tuple[Tuple[str, ...], int, List[str]]
+
+
+def sort_csv(in_path,  # type: str
+             out_path,  # type: str
+             key_fields,  # type: List[str]
+             max_memory_rows=100000,  # type: int
+             temp_dir=None,  # type: Optional[str]
+             ):
+    # type: (...) -> int
+    """
+    Sorts rows of a CSV file by the fields, in bounded memory. Rows are read in runs of max_memory_rows, and each run
+    is sorted in memory and spilled into a temporary file, which are merged into the output. A file that fits in
+    memory is sorted without spilling. Rows with the same key keep their order in the file.
+    :param in_path:
+    :param out_path:
+    :param key_fields: Columns to sort by, in order
+    :param max_memory_rows: Number of rows sorted in memory at once
+    :param temp_dir: Directory where runs are spilled into. System default if None.
+    :return: Number of rows
+    """
+    with open(in_path, 'r') as in_file:
+        reader = csv.reader(in_file)
+        header = next(reader, None)
+        if header is None:
+            shutil.copyfile(in_path, out_path)
+            return 0
+
+        key_indices = [header.index(field) for field in key_fields]
+        run_dir = tempfile.mkdtemp(prefix='csv_sort_', dir=temp_dir)
+        try:
+            run_paths = []  # type: List[str]
+            entries = []  # type: List[_SortEntry]
+            row_count = 0
+            for index, row in enumerate(reader):
+                entries.append((tuple(row[i] for i in key_indices), index, row))
+                row_count += 1
+                if len(entries) >= max_memory_rows:
+                    run_paths.append(_write_run(entries, os.path.join(run_dir, str(len(run_paths)))))
+                    entries = []
+
+            if not run_paths:
+                entries.sort()
+                _write_rows(out_path, header, (row for _, _, row in entries))
+                return row_count
+
+            if entries:
+                run_paths.append(_write_run(entries, os.path.join(run_dir, str(len(run_paths)))))
+            run_files = [open(run_path, 'r') for run_path in run_paths]
+            try:
+                runs = [_read_run(run_file, key_indices) for run_file in run_files]
+                # Index breaks ties, thus rows are never compared
+                _write_rows(out_path, header, (row for _, _, row in heapq.merge(*runs)))
+            finally:
+                for run_file in run_files:
+                    run_file.close()
+            return row_count
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _write_rows(path, header, rows):
+    # type: (str, List[str], Iterator[List[str]]) -> None
+    with open(path, 'w') as out_file:
+        writer = csv.writer(out_file, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_run(entries, path):
+    # type: (List[_SortEntry], str) -> str
+    """
+    Sorts the entries, and writes them with the index of each row as the first column.
+    :return: The path
+    """
+    entries.sort()
+    with open(path, 'w') as run_file:
+        writer = csv.writer(run_file)
+        for _, index, row in entries:
+            writer.writerow([index] + row)
+    return path
+
+
+def _read_run(run_file, key_indices):
+    # type: (Any, List[int]) -> Iterator[_SortEntry]
+    for record in csv.reader(run_file):
+        row = record[1:]
+        yield tuple(row[i] for i in key_indices), int(record[0]), row
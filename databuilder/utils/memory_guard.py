@@ -0,0 +1,205 @@
+import logging
+import os
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Dict, List, Optional  # noqa: F401
+
+try:
+    import tracemalloc
+except ImportError:
+    # tracemalloc is only available in Python 3
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LOGGER = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def get_rss_bytes():
+    # type: () -> int
+    """
+    :return: Resident set size of current process. Falls back to peak RSS where /proc is not available, and 0 if
+    neither is available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        pass
+
+    if resource:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        return max_rss if os.uname()[0] == 'Darwin' else max_rss * 1024
+    return 0
+
+
+class MemorySnapshot(object):
+    """
+    Memory usage at a stage boundary of a job.
+    """
+    def __init__(self,
+                 label,  # type: str
+                 rss_bytes,  # type: int
+                 traced_bytes=0,  # type: int
+                 traced_peak_bytes=0,  # type: int
+                 trace=None,  # type: Any
+                 ):
+        # type: (...) -> None
+        self.label = label
+        self.rss_bytes = rss_bytes
+        self.traced_bytes = traced_bytes
+        self.traced_peak_bytes = traced_peak_bytes
+        self.trace = trace
+
+    def __repr__(self):
+        # type: () -> str
+        return '{label}: rss {rss:.1f} MB, traced {traced:.1f} MB (peak {peak:.1f} MB)'\
+            .format(label=self.label,
+                    rss=float(self.rss_bytes) / _MB,
+                    traced=float(self.traced_bytes) / _MB,
+                    peak=float(self.traced_peak_bytes) / _MB)
+
+
+class MemoryGuard(object):
+    """
+    Tracks memory usage of a job. It takes snapshots of RSS (and tracemalloc, if enabled) at stage boundaries of the
+    job, and checks RSS against the memory budget every check_interval records within a task. When RSS exceeds the
+    budget, it either logs a warning once per stage (action: warn) or fails the job (action: abort), naming the
+    stage.
+
+    At the end of the job, it reports snapshots, peak RSS per stage, and, with tracemalloc, the top allocating call
+    sites between the start of the job and the snapshot with most traced memory. Note that tracemalloc slows down
+    the job considerably, thus it's disabled by default.
+    """
+    # Config keys
+    BUDGET_MB = 'budget_mb'
+    ACTION = 'action'
+    TRACEMALLOC = 'tracemalloc'
+    TRACEMALLOC_FRAMES = 'tracemalloc_frames'
+    TOP_N = 'top_n'
+    CHECK_INTERVAL = 'check_interval'
+
+    WARN = 'warn'
+    ABORT = 'abort'
+
+    DEFAULT_CONFIG = ConfigFactory.from_dict({BUDGET_MB: 0,
+                                              ACTION: WARN,
+                                              TRACEMALLOC: False,
+                                              TRACEMALLOC_FRAMES: 1,
+                                              TOP_N: 10,
+                                              CHECK_INTERVAL: 1000})
+
+    def __init__(self, conf):
+        # type: (ConfigTree) -> None
+        conf = conf.with_fallback(MemoryGuard.DEFAULT_CONFIG)
+        self._budget_bytes = conf.get_int(MemoryGuard.BUDGET_MB) * _MB
+        self._action = conf.get_string(MemoryGuard.ACTION)
+        if self._action not in (MemoryGuard.WARN, MemoryGuard.ABORT):
+            raise Exception('{} should be either {} or {}'
+                            .format(MemoryGuard.ACTION, MemoryGuard.WARN, MemoryGuard.ABORT))
+
+        self._use_tracemalloc = conf.get_bool(MemoryGuard.TRACEMALLOC)
+        if self._use_tracemalloc and not tracemalloc:
+            LOGGER.warning('tracemalloc is not available. Only RSS will be tracked')
+            self._use_tracemalloc = False
+        self._tracemalloc_frames = conf.get_int(MemoryGuard.TRACEMALLOC_FRAMES)
+        self._top_n = conf.get_int(MemoryGuard.TOP_N)
+        self._check_interval = conf.get_int(MemoryGuard.CHECK_INTERVAL)
+
+        self.snapshots = []  # type: List[MemorySnapshot]
+        self.peak_rss_bytes = {}  # type: Dict[str, int]
+        self._record_count = 0
+        self._warned_labels = set()  # type: Any
+
+    def start(self):
+        # type: () -> None
+        if self._use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(self._tracemalloc_frames)
+        self.snapshot('start')
+
+    def snapshot(self, label):
+        # type: (str) -> MemorySnapshot
+        """
+        Takes snapshot at a stage boundary, and checks it against the budget.
+        :param label: Name of the stage that just finished
+        :return:
+        """
+        snapshot = self._take_snapshot(label, get_rss_bytes())
+        self._update(label, snapshot.rss_bytes)
+        return snapshot
+
+    def _take_snapshot(self, label, rss_bytes):
+        # type: (str, int) -> MemorySnapshot
+        snapshot = MemorySnapshot(label=label, rss_bytes=rss_bytes)
+        if self._use_tracemalloc:
+            snapshot.traced_bytes, snapshot.traced_peak_bytes = tracemalloc.get_traced_memory()
+            snapshot.trace = tracemalloc.take_snapshot()
+
+        LOGGER.info('Memory snapshot {}'.format(snapshot))
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def check(self, label, record_count=1):
+        # type: (str, int) -> None
+        """
+        Checks RSS against the budget every check_interval records. It is cheap enough to be called per record.
+        :param label: Name of the stage that processed the record(s)
+        :param record_count:
+        :return:
+        """
+        self._record_count += record_count
+        if self._record_count < self._check_interval:
+            return
+
+        self._record_count = 0
+        self._update(label, get_rss_bytes())
+
+    def _update(self, label, rss_bytes):
+        # type: (str, int) -> None
+        self.peak_rss_bytes[label] = max(rss_bytes, self.peak_rss_bytes.get(label, 0))
+        if not self._budget_bytes or rss_bytes <= self._budget_bytes:
+            return
+
+        message = 'Memory budget {:.1f} MB exceeded on {} stage: rss {:.1f} MB'\
+            .format(float(self._budget_bytes) / _MB, label, float(rss_bytes) / _MB)
+        if self._action == MemoryGuard.ABORT:
+            # Keeps what's allocated at the moment, so that the report at job end can tell where it's from
+            self._take_snapshot('{}_aborted'.format(label), rss_bytes)
+            raise RuntimeError(message)
+
+        if label not in self._warned_labels:
+            self._warned_labels.add(label)
+            LOGGER.warning(message)
+
+    def get_top_allocations(self):
+        # type: () -> List[Any]
+        """
+        :return: Top allocating call sites (tracemalloc.StatisticDiff) between the start of the job and the snapshot
+        with most traced memory. Empty if tracemalloc is not enabled.
+        """
+        traced = [snapshot for snapshot in self.snapshots if snapshot.trace]
+        if len(traced) < 2:
+            return []
+
+        largest = max(traced[1:], key=lambda snapshot: snapshot.traced_bytes)
+        return largest.trace.compare_to(traced[0].trace, 'lineno')[:self._top_n]
+
+    def report(self):
+        # type: () -> None
+        """
+        Logs peak RSS per stage and top allocating call sites, and stops tracemalloc.
+        """
+        for label, rss_bytes in sorted(self.peak_rss_bytes.items(), key=lambda item: -item[1]):
+            LOGGER.info('Peak rss of {}: {:.1f} MB'.format(label, float(rss_bytes) / _MB))
+
+        for stat in self.get_top_allocations():
+            LOGGER.info('Top allocation: {}'.format(stat))
+
+        if self._use_tracemalloc:
+            tracemalloc.stop()
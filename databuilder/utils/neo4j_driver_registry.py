@@ -0,0 +1,76 @@
+import atexit
+import logging
+import threading
+
+from neo4j.v1 import GraphDatabase
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Dict, Optional, Tuple  # noqa: F401
+
+# Config keys, under the scope of the component that gets the driver (e.g: publisher.neo4j.neo4j_max_conn_pool_size)
+NEO4J_MAX_CONN_LIFE_TIME_SEC = 'neo4j_max_conn_life_time_sec'
+NEO4J_MAX_CONN_POOL_SIZE = 'neo4j_max_conn_pool_size'
+# How long a session waits for a connection from the pool when all connections are in use
+NEO4J_CONN_ACQUISITION_TIMEOUT_SEC = 'neo4j_conn_acquisition_timeout_sec'
+
+DEFAULT_CONFIG = ConfigFactory.from_dict({NEO4J_MAX_CONN_LIFE_TIME_SEC: 50,
+                                          NEO4J_MAX_CONN_POOL_SIZE: 100,
+                                          NEO4J_CONN_ACQUISITION_TIMEOUT_SEC: 60})
+
+LOGGER = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# (endpoint, user) to (driver, pool config it's created with)
+_drivers = {}  # type: Dict[Tuple[str, str], Tuple[Any, Dict[str, Any]]]
+
+
+def get_driver(endpoint, user, password, conf=None):
+    # type: (str, str, str, Optional[ConfigTree]) -> Any
+    """
+    Gets the driver of the endpoint and the user, shared within the process, so that components (e.g:
+    Neo4jCsvPublisher, Neo4jStalenessRemovalTask, Neo4jExtractor) share the connection pool instead of each
+    authenticating and warming up its own, within a job and across the jobs launched by the process. The driver is
+    created by the first component, with its pool config. Drivers live as long as the process: they are closed at
+    exit, or by close_all, thus a component must not close the driver it gets.
+    :param endpoint: e.g: bolt://localhost:7687
+    :param user:
+    :param password:
+    :param conf: Config of the component with the pool config (see DEFAULT_CONFIG)
+    :return: The driver
+    """
+    conf = (conf or ConfigFactory.from_dict({})).with_fallback(DEFAULT_CONFIG)
+    # Config keys of neo4j-driver 1.7
+    pool_config = {'max_connection_lifetime': conf.get_int(NEO4J_MAX_CONN_LIFE_TIME_SEC),
+                   'max_connection_pool_size': conf.get_int(NEO4J_MAX_CONN_POOL_SIZE),
+                   'connection_acquisition_timeout': conf.get_int(NEO4J_CONN_ACQUISITION_TIMEOUT_SEC)}
+
+    key = (endpoint, user)
+    with _lock:
+        if key in _drivers:
+            driver, existing_pool_config = _drivers[key]
+            if existing_pool_config != pool_config:
+                LOGGER.warning('Using the driver of {} created with {}, instead of {}'
+                               .format(key, existing_pool_config, pool_config))
+            return driver
+
+        LOGGER.info('Creating driver of {} with {}'.format(key, pool_config))
+        driver = GraphDatabase.driver(endpoint, auth=(user, password), **pool_config)
+        _drivers[key] = (driver, pool_config)
+        return driver
+
+
+def close_all():
+    # type: () -> None
+    """
+    Closes all the drivers. A driver requested afterwards is created again. Called at exit, and can be called
+    earlier by the caller once it's done with Neo4j (e.g: after the last job).
+    :return:
+    """
+    with _lock:
+        drivers = [driver for driver, _ in _drivers.values()]
+        _drivers.clear()
+
+    for driver in drivers:
+        driver.close()
+
+
+atexit.register(close_all)
@@ -0,0 +1,111 @@
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from typing import Dict, Iterable, Optional, Tuple  # noqa: F401
+
+LOGGER = logging.getLogger(__name__)
+
+SPILL_FILE_NAME = 'node_ids.sqlite'
+
+
+class NodeIdCache(object):
+    """
+    Map of node (label and key) to its internal id in Neo4j, for the nodes committed by a publish. Entries are kept in
+    memory up to max_memory_size. Beyond that, entries in memory are spilled into an SQLite file in a temporary
+    directory, and looked up from the file when they are not in memory.
+    Shared by the transactions of a publisher, including the ones of concurrent workers.
+
+    Note that an internal id is only valid while the node exists, and Neo4j may reuse the id of a deleted node. Hence,
+    it's meant for the lifetime of a publish, and a node matched by the id should also be checked by its key.
+    """
+    def __init__(self, max_memory_size=1000000, spill_dir=None):
+        # type: (int, Optional[str]) -> None
+        """
+        :param max_memory_size: Number of entries in memory before spilling into the file
+        :param spill_dir: Directory where the temporary directory of the file is created. System default if None.
+        """
+        self._max_memory_size = max_memory_size
+        self._spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._entries = {}  # type: Dict[str, int]
+        self._temp_dir = None  # type: Optional[str]
+        self._db = None  # type: Optional[sqlite3.Connection]
+        self.spilled_count = 0
+
+    @staticmethod
+    def _get_key(label, key):
+        # type: (str, str) -> str
+        return u'{}\t{}'.format(label, key)
+
+    def put_all(self, label, ids):
+        # type: (str, Iterable[Tuple[str, int]]) -> None
+        """
+        :param label:
+        :param ids: Iterable of (key, internal id) of nodes of the label
+        :return:
+        """
+        with self._lock:
+            for key, node_id in ids:
+                self._entries[self._get_key(label, key)] = node_id
+            if len(self._entries) >= self._max_memory_size:
+                self._spill()
+
+    def get(self, label, key):
+        # type: (str, str) -> Optional[int]
+        """
+        :param label:
+        :param key:
+        :return: Internal id of the node. None if it's not in the cache.
+        """
+        cache_key = self._get_key(label, key)
+        with self._lock:
+            node_id = self._entries.get(cache_key)
+            if node_id is not None or self._db is None:
+                return node_id
+
+            row = self._db.execute('SELECT id FROM node_id WHERE key = ?', (cache_key,)).fetchone()
+            return row[0] if row else None
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries) + self.spilled_count
+
+    def _spill(self):
+        # type: () -> None
+        """
+        Moves entries in memory into the file. Called with the lock held.
+        """
+        if self._db is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='node_id_cache_', dir=self._spill_dir)
+            # Shared by the workers, and accessed under the lock
+            self._db = sqlite3.connect(os.path.join(self._temp_dir, SPILL_FILE_NAME), check_same_thread=False)
+            # The file is discarded with the publish, thus it doesn't need to survive a crash
+            self._db.execute('PRAGMA journal_mode = OFF')
+            self._db.execute('PRAGMA synchronous = OFF')
+            self._db.execute('CREATE TABLE node_id (key TEXT PRIMARY KEY, id INTEGER NOT NULL) WITHOUT ROWID')
+            LOGGER.info('Spilling node id cache into {}'.format(self._temp_dir))
+
+        with self._db:
+            self._db.executemany('INSERT OR REPLACE INTO node_id (key, id) VALUES (?, ?)', self._entries.items())
+        self.spilled_count = self._db.execute('SELECT count(*) FROM node_id').fetchone()[0]
+        self._entries = {}
+
+    def close(self):
+        # type: () -> None
+        """
+        Clears the cache, and deletes the file if it's spilled.
+        :return:
+        """
+        with self._lock:
+            self._entries = {}
+            self.spilled_count = 0
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+                self._temp_dir = None
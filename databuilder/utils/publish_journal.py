@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+from typing import Any, Dict, Optional  # noqa: F401
+
+# Hidden, so that it's not picked up as a CSV file
+JOURNAL_FILE_NAME = '.publish_journal.json'
+
+# Keys of a journal entry
+OFFSET = 'offset'
+TRANSACTION_COUNT = 'transaction_count'
+BYTE_SIZE = 'byte_size'
+IS_DONE = 'is_done'
+
+
+class PublishJournal(object):
+    """
+    Progress of publishing the CSV files in a directory, written into the directory on every commit: per file, the
+    number of rows from the beginning of the file that are committed (offset), and the number of transactions
+    committed. A publish that failed can be resumed by skipping the committed rows.
+    Shared by the transactions of a publisher, including the ones of concurrent workers.
+    """
+    def __init__(self, dir_path, resume=False):
+        # type: (str, bool) -> None
+        """
+        :param dir_path:
+        :param resume: Reads the journal of the previous publish. Otherwise, it starts over.
+        """
+        self._dir_path = dir_path
+        self._path = os.path.join(dir_path, JOURNAL_FILE_NAME)
+        self._lock = threading.Lock()
+        self._entries = {}  # type: Dict[str, Dict[str, Any]]
+        if resume and os.path.isfile(self._path):
+            with open(self._path, 'r') as f:
+                self._entries = json.load(f)
+
+    def _get_key(self, path, partition):
+        # type: (str, Optional[str]) -> str
+        key = os.path.relpath(path, self._dir_path)
+        return key if partition is None else '{}#{}'.format(key, partition)
+
+    def get_entry(self, path, partition=None):
+        # type: (str, Optional[str]) -> Optional[Dict[str, Any]]
+        """
+        :param path: Path of the file
+        :param partition: Partition of the file, if the file is published in partitions
+        :return: The entry. None if there's no entry, or the file has been changed since the entry is written.
+        """
+        with self._lock:
+            entry = self._entries.get(self._get_key(path, partition))
+        if not entry or entry[BYTE_SIZE] != os.path.getsize(path):
+            return None
+        return entry
+
+    def update(self, path, partition, offset, transaction_count, is_done=False):
+        # type: (str, Optional[str], int, int, bool) -> None
+        """
+        Updates the entry and writes the journal. It's written into a temporary file and renamed so that a failure
+        never leaves a partially written journal.
+        :param path:
+        :param partition:
+        :param offset: Number of rows from the beginning of the file that are committed
+        :param transaction_count: Number of transactions committed
+        :param is_done: Whether all the rows of the file are committed
+        :return:
+        """
+        with self._lock:
+            self._entries[self._get_key(path, partition)] = {OFFSET: offset,
+                                                             TRANSACTION_COUNT: transaction_count,
+                                                             BYTE_SIZE: os.path.getsize(path),
+                                                             IS_DONE: is_done}
+            with open(self._path + '.tmp', 'w') as f:
+                json.dump(self._entries, f, sort_keys=True)
+            os.rename(self._path + '.tmp', self._path)
+
+    def delete(self):
+        # type: () -> None
+        """
+        Deletes the journal once the publish is finished, so that the next publish does not resume from it.
+        :return:
+        """
+        with self._lock:
+            self._entries = {}
+            if os.path.isfile(self._path):
+                os.remove(self._path)
@@ -0,0 +1,91 @@
+import random
+
+from typing import Dict, List, Any  # noqa: F401
+
+
+class StageStats(object):
+    """
+    Collects cumulative elapsed time, number of records, and per record latency of a stage (e.g: extract, transform,
+    load, publish).
+    Per record latency samples are kept in a bounded reservoir (https://en.wikipedia.org/wiki/Reservoir_sampling) so
+    that percentiles can be estimated with constant memory regardless of number of records.
+    """
+    def __init__(self,
+                 name,  # type: str
+                 max_samples=10000,  # type: int
+                 ):
+        # type: (...) -> None
+        self.name = name
+        self.elapsed_sec = 0.0
+        self.record_count = 0
+        self._max_samples = max_samples
+        self._samples = []  # type: List[float]
+        self._sample_count = 0
+
+    def add(self,
+            elapsed_sec,  # type: float
+            record_count=1,  # type: int
+            ):
+        # type: (...) -> None
+        """
+        Adds elapsed time of processing record(s). If it's for multiple records (batch), the elapsed time is evenly
+        distributed to each record for latency.
+        :param elapsed_sec:
+        :param record_count: Number of records processed within elapsed_sec. Zero if none processed. (e.g: extractor
+        reached the end)
+        :return:
+        """
+        self.elapsed_sec += elapsed_sec
+        if record_count <= 0:
+            return
+
+        self.record_count += record_count
+        self._add_sample(elapsed_sec / record_count)
+
+    def _add_sample(self, latency_sec):
+        # type: (float) -> None
+        self._sample_count += 1
+        if len(self._samples) < self._max_samples:
+            self._samples.append(latency_sec)
+            return
+
+        index = random.randint(0, self._sample_count - 1)
+        if index < self._max_samples:
+            self._samples[index] = latency_sec
+
+    def records_per_sec(self):
+        # type: () -> float
+        if not self.elapsed_sec:
+            return 0.0
+        return self.record_count / self.elapsed_sec
+
+    def latency_percentile(self, percentile):
+        # type: (float) -> float
+        """
+        :param percentile: 0 ~ 100
+        :return: Per record latency in seconds at the percentile
+        """
+        if not self._samples:
+            return 0.0
+
+        samples = sorted(self._samples)
+        index = int(round(percentile / 100.0 * (len(samples) - 1)))
+        return samples[index]
+
+    def to_dict(self):
+        # type: () -> Dict[str, Any]
+        return {'elapsed_sec': self.elapsed_sec,
+                'record_count': self.record_count,
+                'records_per_sec': self.records_per_sec(),
+                'latency_p50_sec': self.latency_percentile(50),
+                'latency_p99_sec': self.latency_percentile(99)}
+
+    def __repr__(self):
+        # type: () -> str
+        return '{name}: {count} records in {elapsed:.3f} seconds ({rate:.1f} records/sec), ' \
+               'latency p50: {p50:.3f} ms, p99: {p99:.3f} ms'.format(name=self.name,
+                                                                     count=self.record_count,
+                                                                     elapsed=self.elapsed_sec,
+                                                                     rate=self.records_per_sec(),
+                                                                     p50=self.latency_percentile(50) * 1000,
+                                                                     p99=self.latency_percentile(99) * 1000)
@@ -11,7 +11,7 @@ setup(
     url='https://www.github.com/lyft/amundsendatabuilder',
     maintainer='Lyft',
     maintainer_email='dev@lyft.com',
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*']),
     dependency_links=[],
     install_requires=[
         # Packages in here should rarely be pinned. This is because these
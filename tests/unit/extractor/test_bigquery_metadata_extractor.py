@@ -224,6 +224,26 @@ class TestBigQueryMetadataExtractor(unittest.TestCase):
         self.assertEquals(third_col.name, 'nested.nested2.ahah')
         self.assertEquals(third_col.type, 'STRING')
 
+    @patch('databuilder.extractor.bigquery_metadata_extractor.build')
+    def test_resume_from_checkpoint(self, mock_build):
+        mock_build.return_value = MockBigQueryClient(ONE_DATASET, ONE_TABLE, TABLE_DATA)
+        extractor = BigQueryMetadataExtractor()
+        extractor.init(Scoped.get_scoped_conf(conf=self.conf,
+                                              scope=extractor.get_scope()))
+        extractor.extract()
+        checkpoint = extractor.get_checkpoint()
+        self.assertEquals(checkpoint, {'dataset_id': 'empty', 'page_token': None, 'offset': 1})
+
+        client = MockBigQueryClient(ONE_DATASET, ONE_TABLE, TABLE_DATA)
+        mock_build.return_value = client
+        extractor = BigQueryMetadataExtractor()
+        extractor.restore_checkpoint(checkpoint)
+        extractor.init(Scoped.get_scoped_conf(conf=self.conf,
+                                              scope=extractor.get_scope()))
+        result = extractor.extract()
+        self.assertIsNone(result)
+        self.assertFalse(client.tables_method.get.called)
+
     @patch('databuilder.extractor.bigquery_metadata_extractor.build')
     def test_keypath_and_pagesize_can_be_set(self, mock_build):
         config_dict = {
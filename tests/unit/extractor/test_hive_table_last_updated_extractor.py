@@ -46,7 +46,7 @@ class TestHiveTableLastUpdatedExtractor(unittest.TestCase):
         pt_alchemy_extractor_instance = MagicMock()
         non_pt_alchemy_extractor_instance = MagicMock()
         with patch.object(HiveTableLastUpdatedExtractor, '_get_partitioned_table_sql_alchemy_extractor',
-                          return_value=pt_alchemy_extractor_instance),\
+                          return_value=pt_alchemy_extractor_instance), \
             patch.object(HiveTableLastUpdatedExtractor, '_get_non_partitioned_table_sql_alchemy_extractor',
                          return_value=non_pt_alchemy_extractor_instance):
             pt_alchemy_extractor_instance.extract = MagicMock(side_effect=[
@@ -74,6 +74,129 @@ class TestHiveTableLastUpdatedExtractor(unittest.TestCase):
 
             self.assertIsNone(extractor.extract())
 
+    def test_extraction_with_checkpoint(self):
+        # type: () -> None
+        config_dict = {
+            'filesystem.{}'.format(FileSystem.DASK_FILE_SYSTEM): MagicMock()
+        }
+        conf = ConfigFactory.from_dict(config_dict)
+
+        pt_alchemy_extractor_instance = MagicMock()
+        non_pt_alchemy_extractor_instance = MagicMock()
+        with patch.object(HiveTableLastUpdatedExtractor, '_get_partitioned_table_sql_alchemy_extractor',
+                          return_value=pt_alchemy_extractor_instance), \
+            patch.object(HiveTableLastUpdatedExtractor, '_get_non_partitioned_table_sql_alchemy_extractor',
+                         return_value=non_pt_alchemy_extractor_instance):
+            pt_alchemy_extractor_instance.extract = MagicMock(side_effect=[
+                {'schema_name': 'foo_schema',
+                 'table_name': 'table_1',
+                 'last_updated_time': 1},
+                {'schema_name': 'foo_schema',
+                 'table_name': 'table_2',
+                 'last_updated_time': 2},
+                None
+            ])
+
+            non_pt_alchemy_extractor_instance.extract = MagicMock(return_value=None)
+
+            extractor = HiveTableLastUpdatedExtractor()
+            extractor.restore_checkpoint({'phase': HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE,
+                                          'last_key': ['foo_schema', 'table_1']})
+            extractor.init(conf)
+
+            result = extractor.extract()
+            expected = TableLastUpdated(schema_name='foo_schema', table_name='table_2', last_updated_time_epoch=2,
+                                        db='hive', cluster='gold')
+            self.assertEqual(result.__repr__(), expected.__repr__())
+            self.assertEqual(extractor.get_checkpoint(),
+                             {'phase': HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE,
+                              'last_key': ['foo_schema', 'table_2']})
+
+            self.assertIsNone(extractor.extract())
+
+    def test_extraction_with_checkpoint_not_found(self):
+        # type: () -> None
+        config_dict = {
+            'filesystem.{}'.format(FileSystem.DASK_FILE_SYSTEM): MagicMock()
+        }
+        conf = ConfigFactory.from_dict(config_dict)
+
+        pt_alchemy_extractor_instance = MagicMock()
+        non_pt_alchemy_extractor_instance = MagicMock()
+        with patch.object(HiveTableLastUpdatedExtractor, '_get_partitioned_table_sql_alchemy_extractor',
+                          return_value=pt_alchemy_extractor_instance) as mock_get_pt_extractor, \
+            patch.object(HiveTableLastUpdatedExtractor, '_get_non_partitioned_table_sql_alchemy_extractor',
+                         return_value=non_pt_alchemy_extractor_instance):
+            rows = [{'schema_name': 'foo_schema',
+                     'table_name': 'table_1',
+                     'last_updated_time': 1},
+                    {'schema_name': 'foo_schema',
+                     'table_name': 'table_3',
+                     'last_updated_time': 3},
+                    None]
+            # Extracted again from the beginning, as table_2 of the checkpoint is dropped
+            pt_alchemy_extractor_instance.extract = MagicMock(side_effect=rows + rows)
+
+            non_pt_alchemy_extractor_instance.extract = MagicMock(return_value=None)
+
+            extractor = HiveTableLastUpdatedExtractor()
+            extractor.restore_checkpoint({'phase': HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE,
+                                          'last_key': ['foo_schema', 'table_2']})
+            extractor.init(conf)
+
+            result = extractor.extract()
+            expected = TableLastUpdated(schema_name='foo_schema', table_name='table_1', last_updated_time_epoch=1,
+                                        db='hive', cluster='gold')
+            self.assertEqual(result.__repr__(), expected.__repr__())
+            result = extractor.extract()
+            expected = TableLastUpdated(schema_name='foo_schema', table_name='table_3', last_updated_time_epoch=3,
+                                        db='hive', cluster='gold')
+            self.assertEqual(result.__repr__(), expected.__repr__())
+
+            self.assertIsNone(extractor.extract())
+            self.assertEqual(mock_get_pt_extractor.call_count, 2)
+
+    def test_extraction_with_checkpoint_in_metastore_order(self):
+        # type: () -> None
+        config_dict = {
+            'filesystem.{}'.format(FileSystem.DASK_FILE_SYSTEM): MagicMock()
+        }
+        conf = ConfigFactory.from_dict(config_dict)
+
+        pt_alchemy_extractor_instance = MagicMock()
+        non_pt_alchemy_extractor_instance = MagicMock()
+        with patch.object(HiveTableLastUpdatedExtractor, '_get_partitioned_table_sql_alchemy_extractor',
+                          return_value=pt_alchemy_extractor_instance), \
+            patch.object(HiveTableLastUpdatedExtractor, '_get_non_partitioned_table_sql_alchemy_extractor',
+                         return_value=non_pt_alchemy_extractor_instance):
+            # Case insensitive collation of the metastore, which Python orders differently
+            pt_alchemy_extractor_instance.extract = MagicMock(side_effect=[
+                {'schema_name': 'foo_schema',
+                 'table_name': 'table_1',
+                 'last_updated_time': 1},
+                {'schema_name': 'foo_schema',
+                 'table_name': 'Table_2',
+                 'last_updated_time': 2},
+                {'schema_name': 'foo_schema',
+                 'table_name': 'table_3',
+                 'last_updated_time': 3},
+                None
+            ])
+
+            non_pt_alchemy_extractor_instance.extract = MagicMock(return_value=None)
+
+            extractor = HiveTableLastUpdatedExtractor()
+            extractor.restore_checkpoint({'phase': HiveTableLastUpdatedExtractor.PARTITIONED_TABLE_PHASE,
+                                          'last_key': ['foo_schema', 'Table_2']})
+            extractor.init(conf)
+
+            result = extractor.extract()
+            expected = TableLastUpdated(schema_name='foo_schema', table_name='table_3', last_updated_time_epoch=3,
+                                        db='hive', cluster='gold')
+            self.assertEqual(result.__repr__(), expected.__repr__())
+
+            self.assertIsNone(extractor.extract())
+
     def test_extraction(self):
         # type: () -> None
         old_datetime = datetime(2018, 8, 14, 4, 12, 3, tzinfo=UTC)
@@ -54,6 +54,24 @@ class TestNeo4jExtractor(unittest.TestCase):
             result = extractor.extract()
             self.assertIsNone(result)
 
+    def test_close_before_fully_extracted(self):
+        # type: (Any) -> None
+        """
+        Test the session is closed when extractor is closed before all the results are extracted
+        """
+        with patch.object(Neo4jExtractor, '_get_driver') as mock_get_driver:
+            extractor = Neo4jExtractor()
+            extractor.init(Scoped.get_scoped_conf(conf=self.conf,
+                                                  scope=extractor.get_scope()))
+
+            extractor.results = ['test_result1', 'test_result2']
+            self.assertEqual(extractor.extract(), 'test_result1')
+
+            mock_session = mock_get_driver.return_value.session.return_value
+            mock_session.__exit__.assert_not_called()
+            extractor.close()
+            mock_session.__exit__.assert_called_once()
+
     def test_extraction_with_multiple_query_result(self):
         # type: (Any) -> None
         """
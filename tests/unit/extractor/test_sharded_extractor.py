@@ -0,0 +1,85 @@
+import unittest
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any  # noqa: F401
+
+from databuilder import Scoped
+from databuilder.extractor.base_extractor import Extractor
+from databuilder.extractor.sharded_extractor import ShardedExtractor
+
+
+class TestShardedExtractor(unittest.TestCase):
+
+    def _extract_all(self, conf):
+        # type: (ConfigTree) -> Any
+        extractor = ShardedExtractor(ModuloExtractor())
+        extractor.init(Scoped.get_scoped_conf(conf, extractor.get_scope()))
+        try:
+            result = []
+            records = extractor.extract_batch(3)
+            while records:
+                result.extend(records)
+                records = extractor.extract_batch(3)
+            return result
+        finally:
+            extractor.close()
+
+    def test_extract_with_template(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_COUNT): 3,
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_CONF_KEY): 'remainder',
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_TEMPLATE): '{shard_index}',
+            'extractor.sharded.extractor.modulo.divisor': 3,
+        })
+
+        self.assertEqual(sorted(self._extract_all(conf)), list(range(1, 21)))
+
+    def test_extract_with_values(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_VALUES): [0, 1],
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_CONF_KEY): 'remainder',
+            'extractor.sharded.extractor.modulo.divisor': 4,
+        })
+
+        # Remainder 2 and 3 are not covered by any shard
+        self.assertEqual(sorted(self._extract_all(conf)), [1, 4, 5, 8, 9, 12, 13, 16, 17, 20])
+
+    def test_shard_failure(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_VALUES): [0, 1],
+            'extractor.sharded.{}'.format(ShardedExtractor.SHARD_CONF_KEY): 'remainder',
+            'extractor.sharded.extractor.modulo.divisor': 2,
+            'extractor.sharded.extractor.modulo.fail_on': 7,
+        })
+
+        self.assertRaises(RuntimeError, self._extract_all, conf)
+
+
+class ModuloExtractor(Extractor):
+    """
+    Extracts numbers from 1 to 20 whose remainder divided by divisor equals to remainder
+    """
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        divisor = conf.get_int('divisor')
+        remainder = conf.get_int('remainder')
+        self._fail_on = conf.get_int('fail_on', None)
+        self._iter = iter([i for i in range(1, 21) if i % divisor == remainder])
+
+    def extract(self):
+        # type: () -> Any
+        record = next(self._iter, None)
+        if record and record == self._fail_on:
+            raise ValueError('Failed on {}'.format(record))
+        return record
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.modulo'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import collections
 import csv
+import json
 import logging
 import os
 import unittest
@@ -11,6 +12,7 @@ from typing import Dict, Iterable, Any, Callable  # noqa: F401
 
 from databuilder.job.base_job import Job
 from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.utils import csv_manifest
 from tests.unit.models.test_neo4j_csv_serde import Movie, Actor, City
 from operator import itemgetter
 
@@ -56,9 +58,76 @@ class TestFsNeo4jCSVLoader(unittest.TestCase):
                                               itemgetter('START_KEY', 'END_KEY'))
         self.assertEqual(expected_relations, actual_relations)
 
+    def test_manifest(self):
+        # type: () -> None
+        loader = FsNeo4jCSVLoader()
+        loader.init(self._conf)
+        loader.load(Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego')]))
+        loader.close()
+
+        node_dir = self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH)
+        manifest = csv_manifest.read_manifest(node_dir)
+        self.assertEqual(sorted(manifest.keys()), ['Actor_3.csv', 'City_3.csv', 'Movie_3.csv'])
+        self.assertEqual(manifest['Actor_3.csv'], {'labels': ['Actor'],
+                                                   'header': ['KEY', 'LABEL', 'name'],
+                                                   'row_count': 2,
+                                                   'byte_size': os.path.getsize(join(node_dir, 'Actor_3.csv'))})
+
+        manifest = csv_manifest.read_manifest(self._conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH))
+        self.assertEqual(manifest['Movie_Actor_ACTOR.csv']['labels'], ['Actor', 'Movie'])
+        self.assertEqual(manifest['Movie_Actor_ACTOR.csv']['row_count'], 2)
+
+    def test_resume_from_checkpoint(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR: False}).with_fallback(self._conf)
+        loader = FsNeo4jCSVLoader()
+        loader.init(conf)
+        loader.load(Movie('Top Gun', [Actor('Tom Cruise')], [City('San Diego')]))
+        checkpoint = json.loads(json.dumps(loader.get_checkpoint()))
+        # Loaded after the checkpoint, thus discarded when resumed
+        loader.load(Movie('Sleepless in Seattle', [Actor('Meg Ryan')], [City('Seattle')]))
+        loader.close()
+
+        loader = FsNeo4jCSVLoader()
+        loader.restore_checkpoint(checkpoint)
+        loader.init(self._conf)
+        loader.load(Movie('Top Gun', [Actor('Meg Ryan')], [City('Oakland')]))
+        loader.close()
+
+        actual_nodes = self._get_csv_rows(self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH),
+                                          itemgetter('KEY'))
+        self.assertEqual([row['KEY'] for row in actual_nodes],
+                         ['actor://Meg Ryan', 'actor://Tom Cruise', 'city://Oakland', 'city://San Diego',
+                          'movie://Top Gun', 'movie://Top Gun'])
+
+    def test_rotate_segments(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({FsNeo4jCSVLoader.ROTATE_SEGMENT_ROWS: 2}).with_fallback(self._conf)
+        loader = FsNeo4jCSVLoader()
+        loader.init(conf)
+        loader.load(Movie('Top Gun', [Actor('Tom Cruise'), Actor('Meg Ryan')], [City('San Diego'), City('Oakland')]))
+        self.assertIsNone(loader.get_checkpoint())
+        loader.close()
+
+        # Movie node is rotated before the relationship segment that depends on it
+        self.assertEqual(sorted(listdir(self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH))),
+                         ['.manifest.json', '00000000_Actor_3.csv', '00000001_City_3.csv', '00000002_Movie_3.csv'])
+        self.assertEqual(sorted(listdir(self._conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH))),
+                         ['.manifest.json', '00000003_Movie_Actor_ACTOR.csv', '00000004_Movie_City_FILMED_AT.csv'])
+        self.assertEqual(
+            sorted(csv_manifest.read_manifest(self._conf.get_string(FsNeo4jCSVLoader.RELATION_DIR_PATH)).keys()),
+            ['00000003_Movie_Actor_ACTOR.csv', '00000004_Movie_City_FILMED_AT.csv'])
+
+        expected_node_path = '{}/../resources/fs_neo4j_csv_loader/nodes'\
+            .format(os.path.join(os.path.dirname(__file__)))
+        self.assertEqual(self._get_csv_rows(expected_node_path, itemgetter('KEY')),
+                         self._get_csv_rows(self._conf.get_string(FsNeo4jCSVLoader.NODE_DIR_PATH),
+                                            itemgetter('KEY')))
+
     def _get_csv_rows(self, path, sorting_key_getter):
         # type: (str, Callable) -> Iterable[Dict[str, Any]]
-        files = [join(path, f) for f in listdir(path) if isfile(join(path, f))]
+        # Hidden files (e.g: manifest) are not CSV files
+        files = [join(path, f) for f in listdir(path) if isfile(join(path, f)) and not f.startswith('.')]
 
         result = []
         for f in files:
@@ -1,4 +1,5 @@
 import copy
+import pickle
 import unittest
 
 from databuilder.models.table_metadata import TableMetadata, ColumnMetadata
@@ -132,6 +133,15 @@ class TestTableMetadata(unittest.TestCase):
 
         self.assertEqual(self.expected_rels_deduped, actual)
 
+    def test_pickle(self):
+        # type: () -> None
+        self.table_metadata2.next_node()
+        actual = pickle.loads(pickle.dumps(self.table_metadata2))
+
+        self.assertEqual(repr(self.table_metadata2), repr(actual))
+        # Iterators start over
+        self.assertEqual(self.expected_nodes_deduped[0], actual.next_node())
+
 
 if __name__ == '__main__':
     unittest.main()
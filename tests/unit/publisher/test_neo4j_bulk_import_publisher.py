@@ -0,0 +1,124 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyhocon import ConfigFactory
+from typing import List  # noqa: F401
+
+from databuilder.publisher import neo4j_bulk_import_publisher, neo4j_csv_publisher
+from databuilder.publisher.neo4j_bulk_import_publisher import Neo4jBulkImportPublisher
+
+
+class TestNeo4jBulkImportPublisher(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self._resource_path = '{}/../resources/csv_publisher'\
+            .format(os.path.join(os.path.dirname(__file__)))
+        self._import_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self._import_dir)
+
+    def _publish(self, mode):
+        # type: (str) -> Neo4jBulkImportPublisher
+        conf = ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: 'unit_test',
+             neo4j_bulk_import_publisher.IMPORT_DIR: self._import_dir,
+             neo4j_bulk_import_publisher.IMPORT_MODE: mode}
+        )
+        publisher = Neo4jBulkImportPublisher()
+        publisher.init(conf)
+        publisher.publish()
+        return publisher
+
+    def _read_csv(self, sub_dir, file_name):
+        # type: (str, str) -> List[List[str]]
+        with open(os.path.join(self._import_dir, sub_dir, file_name), 'r') as f:
+            return list(csv.reader(f))
+
+    def _read_file(self, file_name):
+        # type: (str) -> str
+        with open(os.path.join(self._import_dir, file_name), 'r') as f:
+            return f.read()
+
+    def test_admin_import(self):
+        # type: () -> None
+        publisher = self._publish(neo4j_bulk_import_publisher.ADMIN_IMPORT_MODE)
+
+        self.assertEqual(self._read_csv('nodes', '1_test_column.csv'),
+                         [['key:ID(Column)', 'name', 'order_pos:long', 'type', 'published_tag', ':LABEL'],
+                          ['presto://gold.test_schema1/test_table1/test_id1', 'test_id1', '1', 'bigint', 'unit_test',
+                           'Column'],
+                          ['presto://gold.test_schema1/test_table1/test_id2', 'test_id2', '2', 'bigint', 'unit_test',
+                           'Column']])
+        self.assertEqual(self._read_csv('nodes', '2_test_table.csv')[0],
+                         ['key:ID(Table)', 'name', 'published_tag', ':LABEL'])
+
+        # Both directions
+        self.assertEqual(self._read_csv('relations', '3_test_edge_short.csv'),
+                         [[':START_ID(Table)', ':END_ID(Column)', 'published_tag', ':TYPE'],
+                          ['presto://gold.test_schema1/test_table1',
+                           'presto://gold.test_schema1/test_table1/test_id1', 'unit_test', 'COLUMN'],
+                          ['presto://gold.test_schema1/test_table1',
+                           'presto://gold.test_schema1/test_table1/test_id2', 'unit_test', 'COLUMN']])
+        self.assertEqual(self._read_csv('relations', '4_test_edge_short.csv'),
+                         [[':START_ID(Column)', ':END_ID(Table)', 'published_tag', ':TYPE'],
+                          ['presto://gold.test_schema1/test_table1/test_id1',
+                           'presto://gold.test_schema1/test_table1', 'unit_test', 'BELONG_TO_TABLE'],
+                          ['presto://gold.test_schema1/test_table1/test_id2',
+                           'presto://gold.test_schema1/test_table1', 'unit_test', 'BELONG_TO_TABLE']])
+
+        self.assertEqual(publisher.import_command,
+                         'neo4j-admin import --database=graph.db --id-type=STRING --ignore-duplicate-nodes=true '
+                         '--ignore-missing-nodes=true '
+                         '--nodes={dir}/nodes/1_test_column.csv --nodes={dir}/nodes/2_test_table.csv '
+                         '--relationships={dir}/relations/3_test_edge_short.csv '
+                         '--relationships={dir}/relations/4_test_edge_short.csv'.format(dir=self._import_dir))
+        self.assertIn(publisher.import_command, self._read_file('import.sh'))
+        self.assertEqual(self._read_file('constraints.cypher'),
+                         'CREATE CONSTRAINT ON (node:Column) ASSERT node.key IS UNIQUE;\n'
+                         'CREATE CONSTRAINT ON (node:Table) ASSERT node.key IS UNIQUE;\n')
+
+    def test_load_csv(self):
+        # type: () -> None
+        publisher = self._publish(neo4j_bulk_import_publisher.LOAD_CSV_MODE)
+
+        self.assertEqual(self._read_csv('nodes', '1_test_column.csv')[0],
+                         ['key', 'name', 'order_pos', 'type', 'published_tag'])
+        self.assertEqual(self._read_csv('relations', '3_test_edge_short.csv')[0],
+                         ['start_key', 'end_key', 'published_tag'])
+
+        statements = self._read_file('load.cypher').strip().split(';\n')
+        self.assertEqual(len(statements), 6)
+        self.assertEqual(statements[0], 'CREATE CONSTRAINT ON (node:Column) ASSERT node.key IS UNIQUE')
+        self.assertEqual(statements[2],
+                         'USING PERIODIC COMMIT 10000\n'
+                         "LOAD CSV WITH HEADERS FROM 'file:///nodes/1_test_column.csv' AS row\n"
+                         'MERGE (node:Column {key: row.key})\n'
+                         'SET node.name = row.name, node.order_pos = toInteger(row.order_pos), node.type = row.type, '
+                         'node.published_tag = row.published_tag')
+        self.assertEqual(statements[5],
+                         'USING PERIODIC COMMIT 10000\n'
+                         "LOAD CSV WITH HEADERS FROM 'file:///relations/4_test_edge_short.csv' AS row\n"
+                         'MATCH (n1:Column {key: row.start_key}), (n2:Table {key: row.end_key})\n'
+                         'MERGE (n1)-[r:BELONG_TO_TABLE]->(n2)\n'
+                         'SET r.published_tag = row.published_tag;')
+        self.assertIn('cypher-shell', publisher.import_command)
+
+    def test_merge_type(self):
+        # type: () -> None
+        self.assertEqual(neo4j_bulk_import_publisher._merge_type(None, None), None)
+        self.assertEqual(neo4j_bulk_import_publisher._merge_type(None, True), 'boolean')
+        self.assertEqual(neo4j_bulk_import_publisher._merge_type('long', 1.5), 'double')
+        self.assertEqual(neo4j_bulk_import_publisher._merge_type('long', None), 'long')
+        self.assertEqual(neo4j_bulk_import_publisher._merge_type('boolean', 1), 'string')
+
+
+if __name__ == '__main__':
+    unittest.main()
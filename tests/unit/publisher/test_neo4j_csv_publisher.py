@@ -1,14 +1,25 @@
+import csv
+import json
 import logging
 import os
+import shutil
+import tempfile
+import threading
 import unittest
 import uuid
 
 from mock import patch, MagicMock
-from neo4j.v1 import GraphDatabase
-from pyhocon import ConfigFactory
+from neo4j.exceptions import TransientError
+from neo4j.v1 import GraphDatabase, ServiceUnavailable
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Dict, List, Set, Tuple  # noqa: F401
 
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.models.table_metadata import ColumnMetadata, TableMetadata
 from databuilder.publisher import neo4j_csv_publisher
-from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher, PublishStats, RetryableTransaction, \
+    TransactionSizer
+from databuilder.utils import csv_manifest, neo4j_driver_registry, publish_journal
 
 
 class TestPublish(unittest.TestCase):
@@ -19,6 +30,16 @@ class TestPublish(unittest.TestCase):
         self._resource_path = '{}/../resources/csv_publisher'\
             .format(os.path.join(os.path.dirname(__file__)))
 
+    def tearDown(self):
+        # type: () -> None
+        # Drivers live as long as the process
+        neo4j_driver_registry.close_all()
+        # A failed publish leaves its journal to resume from
+        for sub_dir in ('nodes', 'relations'):
+            journal_path = os.path.join(self._resource_path, sub_dir, publish_journal.JOURNAL_FILE_NAME)
+            if os.path.isfile(journal_path):
+                os.remove(journal_path)
+
     def test_publisher(self):
         # type: () -> None
         with patch.object(GraphDatabase, 'driver') as mock_driver:
@@ -54,6 +75,851 @@ class TestPublish(unittest.TestCase):
             # 2 node files, 1 relation file
             self.assertEqual(mock_commit.call_count, 3)
 
+            # A statement per shape, and the row as parameter
+            stmt, params = mock_run.call_args_list[0][0]
+            self.assertEqual(stmt, mock_run.call_args_list[1][0][0])
+            self.assertTrue(stmt.startswith('MERGE (node:Column {key: $row.KEY})\n'
+                                            'ON CREATE SET node.name = $row.name, node.order_pos = $row.order_pos'))
+            self.assertEqual(params['row'], {'KEY': 'presto://gold.test_schema1/test_table1/test_id1',
+                                             'name': 'test_id1', 'order_pos': 1, 'type': 'bigint'})
+
+            stmt, params = mock_run.call_args_list[4][0]
+            self.assertTrue(stmt.startswith('MATCH (n1:Table {key: $row.START_KEY}),\n'
+                                            '(n2:Column {key: $row.END_KEY})\n'
+                                            'MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)\n'
+                                            'ON CREATE SET r1.published_tag = $publish_tag , '
+                                            'r2.published_tag = $publish_tag\n'))
+            self.assertEqual(params['row'], {'START_KEY': 'presto://gold.test_schema1/test_table1',
+                                             'END_KEY': 'presto://gold.test_schema1/test_table1/test_id1'})
+
+    def test_publisher_unwind_batch(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+            publisher = Neo4jCsvPublisher()
+            publish_tag = '{}'.format(uuid.uuid4())
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: publish_tag}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            # A statement per file
+            self.assertEqual(mock_transaction.run.call_count, 3)
+            self.assertEqual(mock_transaction.commit.call_count, 3)
+
+            stmt, params = mock_transaction.run.call_args_list[0][0]
+            self.assertTrue(stmt.startswith('UNWIND $batch AS row\nMERGE (node:Column {key: row.KEY})'))
+            self.assertIn('node.order_pos = row.order_pos', stmt)
+            self.assertEqual(params['publish_tag'], publish_tag)
+            self.assertEqual(params['batch'][1],
+                             {'KEY': 'presto://gold.test_schema1/test_table1/test_id2', 'name': 'test_id2',
+                              'order_pos': 2, 'type': 'bigint'})
+
+            stmt, params = mock_transaction.run.call_args_list[2][0]
+            self.assertTrue(stmt.startswith('UNWIND $batch AS row\nMATCH (n1:Table {key: row.START_KEY})'))
+            self.assertIn('MERGE (n1)-[r1:COLUMN]->(n2)-[r2:BELONG_TO_TABLE]->(n1)', stmt)
+            self.assertEqual(params['batch'][0],
+                             {'START_KEY': 'presto://gold.test_schema1/test_table1',
+                              'END_KEY': 'presto://gold.test_schema1/test_table1/test_id1',
+                              'props': {}})
+
+    def test_publisher_stats(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver, \
+                patch.object(neo4j_csv_publisher, 'StatsClient') as mock_statsd:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+            summary = mock_transaction.run.return_value.summary.return_value
+            summary.counters.nodes_created = 0
+            summary.counters.properties_set = 1
+            summary.counters.relationships_created = 0
+            summary.result_available_after = 1
+            summary.result_consumed_after = 0
+
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.IS_STATSD_ENABLED: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            stats = publisher.publish_impl()
+
+            # A statement per row
+            self.assertEqual(stats['total'], {'rows': 6, 'nodes_created': 0, 'properties_set': 6,
+                                              'relationships_created': 0, 'db_time_ms': 6})
+            self.assertEqual(sorted(stats['labels'].keys()), ['COLUMN', 'Column', 'Table'])
+            self.assertEqual(stats['labels']['COLUMN']['rows'], 2)
+            self.assertEqual(stats['files']['{}/nodes/test_table.csv'.format(self._resource_path)]['rows'], 2)
+
+            mock_statsd.assert_called_once_with(prefix='amundsen.databuilder.publisher.neo4j')
+            mock_statsd.return_value.gauge.assert_any_call('label.Table.rows', 2)
+
+    def test_publisher_unwind_batch_relation_confirm(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+            # Only one of two relations is matched
+            mock_transaction.run.return_value.single.return_value = {'count': 1}
+            mock_transaction.closed.return_value = False
+
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                 neo4j_csv_publisher.NEO4J_RELATIONSHIP_CREATION_CONFIRM: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+
+            self.assertRaises(RuntimeError, publisher.publish)
+            mock_transaction.rollback.assert_called_once()
+
+    def _create_parallel_conf(self):
+        # type: () -> ConfigTree
+        return ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+             neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+             neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+             neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+             neo4j_csv_publisher.NEO4J_PUBLISH_PARALLELISM: 2,
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+        )
+
+    def test_publisher_parallel(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            sessions = []  # type: List[MagicMock]
+
+            def create_session():
+                # type: () -> MagicMock
+                sessions.append(MagicMock())
+                return sessions[-1]
+            mock_driver.return_value.session.side_effect = create_session
+
+            publisher = Neo4jCsvPublisher()
+            publisher.init(self._create_parallel_conf())
+            publisher.publish()
+
+            # Main session, session per index creation, and session per worker of nodes and relations
+            main_session, node_sessions, relation_sessions = sessions[0], sessions[-4:-2], sessions[-2:]
+            self.assertEqual(sum(session.begin_transaction.return_value.run.call_count
+                                 for session in node_sessions), 4)
+            self.assertEqual(sum(session.begin_transaction.return_value.run.call_count
+                                 for session in relation_sessions), 2)
+            for session in node_sessions + relation_sessions:
+                session.close.assert_called_once()
+            main_session.begin_transaction.return_value.run.assert_not_called()
+
+    def test_relation_partitions(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            loader = FsNeo4jCSVLoader()
+            loader.init(ConfigFactory.from_dict(
+                {FsNeo4jCSVLoader.NODE_DIR_PATH: os.path.join(temp_dir, 'nodes'),
+                 FsNeo4jCSVLoader.RELATION_DIR_PATH: os.path.join(temp_dir, 'relations'),
+                 FsNeo4jCSVLoader.SHOULD_DELETE_CREATED_DIR: False}))
+            for table in range(8):
+                loader.load(TableMetadata('hive', 'gold', 'test_schema', 'test_table{}'.format(table),
+                                          'description of test_table{}'.format(table),
+                                          [ColumnMetadata('col{}'.format(column), 'description of col{}'.format(column),
+                                                          'bigint', column) for column in range(5)]))
+            loader.close()
+
+            with patch.object(GraphDatabase, 'driver'):
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NODE_FILES_DIR: os.path.join(temp_dir, 'nodes'),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: os.path.join(temp_dir, 'relations'),
+                     neo4j_csv_publisher.NEO4J_PUBLISH_PARALLELISM: 4,
+                     neo4j_csv_publisher.NEO4J_SORT_DIR: temp_dir}
+                ).with_fallback(self._create_parallel_conf())
+                publisher.init(conf)
+                publisher._split_relation_files(publisher._relation_files)
+
+                partition_keys = {}  # type: Dict[int, List[Tuple[str, str]]]
+                for (_, partition), split_path in publisher._partition_paths.items():
+                    with open(split_path, 'r') as split_csv:
+                        partition_keys.setdefault(partition, []).extend(
+                            (record['START_KEY'], record['END_KEY']) for _, record in
+                            publisher._read_records(split_csv, 0))
+
+            relation_keys = []  # type: List[Tuple[str, str]]
+            for relation_file in publisher._relation_files:
+                with open(relation_file, 'r') as relation_csv:
+                    relation_keys.extend((record['START_KEY'], record['END_KEY'])
+                                         for record in csv.DictReader(relation_csv))
+
+            # Schema, tables and columns are not in one partition
+            self.assertGreater(len([keys for keys in partition_keys.values() if keys]), 1)
+            self.assertEqual(sorted(key for keys in partition_keys.values() for key in keys), sorted(relation_keys))
+            # Relations of a table to its columns and description are published by one worker
+            for table in range(8):
+                table_key = 'hive://gold.test_schema/test_table{}'.format(table)
+                self.assertEqual(len({partition for partition, keys in partition_keys.items()
+                                      for start_key, _ in keys if start_key == table_key}), 1)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_publisher_parallel_retry_transient_error(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver, patch.object(neo4j_csv_publisher.time, 'sleep'):
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+            mock_transaction.closed.return_value = False
+            errors = [TransientError('Deadlock detected')]
+
+            def run(stmt, parameters):
+                # type: (str, Dict[str, Any]) -> MagicMock
+                if stmt.startswith('MATCH') and errors:
+                    raise errors.pop()
+                return MagicMock()
+            mock_transaction.run.side_effect = run
+
+            publisher = Neo4jCsvPublisher()
+            publisher.init(self._create_parallel_conf())
+            publisher.publish()
+
+            # The failed relation, and the partition retried
+            mock_transaction.rollback.assert_called_once()
+            statements = [call[0][0] for call in mock_transaction.run.call_args_list]
+            self.assertEqual(len([stmt for stmt in statements if stmt.startswith('MATCH')]), 3)
+
+    def test_publisher_parallel_failure(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+            mock_transaction.closed.return_value = False
+            mock_transaction.run.side_effect = RuntimeError('Failed')
+
+            publisher = Neo4jCsvPublisher()
+            publisher.init(self._create_parallel_conf())
+
+            self.assertRaises(RuntimeError, publisher.publish)
+            # A rollback per node file, and no relation is published
+            self.assertEqual(mock_transaction.rollback.call_count, 2)
+            self.assertEqual(mock_transaction.run.call_count, 2)
+
+    def test_create_node_unwind_statement_create_only(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_CREATE_ONLY_NODES: ['Table'],
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+
+            stmt = publisher.create_node_unwind_statement('Table', ['KEY', 'name', 'LABEL'])
+            self.assertIn('ON CREATE SET node.name = row.name, node.published_tag = $publish_tag', stmt)
+            self.assertNotIn('ON MATCH', stmt)
+
+    def test_create_merge_statement_cached(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_CREATE_ONLY_NODES: ['Table'],
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+
+            stmt = publisher.create_node_merge_statement('Table', ('KEY', 'name', 'LABEL'))
+            self.assertIs(stmt, publisher.create_node_merge_statement('Table', ('KEY', 'name', 'LABEL')))
+            self.assertNotIn('ON MATCH', stmt)
+            self.assertIn('ON MATCH', publisher.create_node_merge_statement('Column', ('KEY', 'name', 'LABEL')))
+
+            # Quotes in values are bound as parameters, not escaped into the statement
+            row = publisher._create_row_param({'KEY': "it's", 'name': "'quoted'", 'LABEL': 'Table'},
+                                              neo4j_csv_publisher.NODE_REQUIRED_KEYS, {'KEY'})
+            self.assertEqual(row, {'KEY': "it's", 'name': "'quoted'"})
+
+    def test_publisher_content_hash(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                 neo4j_csv_publisher.NEO4J_CONTENT_HASH: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            stmt, params = mock_transaction.run.call_args_list[0][0]
+            self.assertIn('SET node.published_tag = $publish_tag\n', stmt)
+            self.assertIn('CASE WHEN node.content_hash = row.content_hash THEN [] ELSE [1] END', stmt)
+            self.assertIn('node.order_pos = row.order_pos', stmt)
+            self.assertIn('node.content_hash = row.content_hash)', stmt)
+            row = params['batch'][1]
+            self.assertEqual(row['content_hash'],
+                             neo4j_csv_publisher._content_hash({'name': 'test_id2', 'order_pos': 2, 'type': 'bigint'}))
+            self.assertNotEqual(row['content_hash'], params['batch'][0]['content_hash'])
+
+            stmt, params = mock_transaction.run.call_args_list[2][0]
+            self.assertIn('SET r1.published_tag = $publish_tag, r2.published_tag = $publish_tag\n', stmt)
+            self.assertIn('CASE WHEN r1.content_hash = row.content_hash THEN [] ELSE [1] END', stmt)
+            self.assertEqual(params['batch'][0]['content_hash'], neo4j_csv_publisher._content_hash({}))
+
+    def test_content_hash_statement_without_property(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                 neo4j_csv_publisher.NEO4J_CONTENT_HASH: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+
+            stmt = publisher.create_node_unwind_statement('Tag', ('KEY', 'LABEL'))
+            self.assertIn('SET node.content_hash = row.content_hash)', stmt)
+            self.assertNotIn('SET ,', stmt)
+
+    def test_content_hash(self):
+        # type: () -> None
+        self.assertEqual(neo4j_csv_publisher._content_hash({'KEY': 'foo', 'a': 1, 'b': 'x'}, excludes={'KEY'}),
+                         neo4j_csv_publisher._content_hash({'b': 'x', 'a': 1}))
+        self.assertNotEqual(neo4j_csv_publisher._content_hash({'a': 1}),
+                            neo4j_csv_publisher._content_hash({'a': '1'}))
+
+    def test_content_hash_requires_unwind_batch(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_CONTENT_HASH: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            self.assertRaises(Exception, publisher.init, conf)
+
+    def test_publisher_node_id_cache(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+            def run(stmt, params):
+                # type: (str, Dict[str, Any]) -> MagicMock
+                result = MagicMock()
+                if neo4j_csv_publisher.NODE_ID_RETURN_CLAUSE in stmt:
+                    # Only the first node of each file is returned
+                    result.__iter__.return_value = [{'key': params['batch'][0]['KEY'], 'id': len(stmt)}]
+                return result
+            mock_transaction.run.side_effect = run
+
+            publisher = Neo4jCsvPublisher()
+            conf = ConfigFactory.from_dict(
+                {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                 neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(self._resource_path),
+                 neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(self._resource_path),
+                 neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                 neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                 neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                 neo4j_csv_publisher.NEO4J_NODE_ID_CACHE: True,
+                 neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+            )
+            publisher.init(conf)
+            publisher.publish()
+
+            column_stmt = mock_transaction.run.call_args_list[0][0][0]
+            table_stmt = mock_transaction.run.call_args_list[1][0][0]
+            self.assertTrue(column_stmt.endswith('\nRETURN row.KEY AS key, id(node) AS id'))
+
+            # Relations are split by whether their nodes are cached
+            self.assertEqual(mock_transaction.run.call_count, 4)
+            stmt, params = mock_transaction.run.call_args_list[2][0]
+            self.assertIn('MATCH (n1:Table),\n(n2:Column)\n'
+                          'WHERE id(n1) = row.START_ID AND n1.key = row.START_KEY AND '
+                          'id(n2) = row.END_ID AND n2.key = row.END_KEY\n', stmt)
+            self.assertEqual(params['batch'],
+                             [{'START_KEY': 'presto://gold.test_schema1/test_table1',
+                               'END_KEY': 'presto://gold.test_schema1/test_table1/test_id1',
+                               'START_ID': len(table_stmt),
+                               'END_ID': len(column_stmt),
+                               'props': {}}])
+
+            stmt, params = mock_transaction.run.call_args_list[3][0]
+            self.assertIn('MATCH (n1:Table),\n(n2:Column {key: row.END_KEY})\n'
+                          'WHERE id(n1) = row.START_ID AND n1.key = row.START_KEY\n', stmt)
+            self.assertEqual(params['batch'][0]['END_KEY'], 'presto://gold.test_schema1/test_table1/test_id2')
+            self.assertNotIn('END_ID', params['batch'][0])
+
+    def test_publisher_sort_by_key(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            shutil.copytree(os.path.join(self._resource_path, 'relations'), os.path.join(temp_dir, 'relations'))
+            os.makedirs(os.path.join(temp_dir, 'nodes'))
+            with open(os.path.join(temp_dir, 'nodes', 'test_table.csv'), 'w') as f:
+                f.write('"KEY","name","LABEL"\n'
+                        '"hive://gold.schema/table_b","table_b","Table"\n'
+                        '"hive://gold.schema/table_a","table_a","Table"\n')
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: 100,
+                     neo4j_csv_publisher.NEO4J_SORT_BY_KEY: True,
+                     neo4j_csv_publisher.NEO4J_SORT_DIR: temp_dir,
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                _, params = mock_transaction.run.call_args_list[0][0]
+                self.assertEqual([row['name'] for row in params['batch']], ['table_a', 'table_b'])
+                self.assertEqual(mock_transaction.run.call_count, 2)
+
+            # Sorted copies are removed, and the files are left as they are
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['nodes', 'relations'])
+            with open(os.path.join(temp_dir, 'nodes', 'test_table.csv'), 'r') as f:
+                self.assertIn('table_b', f.readlines()[1])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_publisher_manifest(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for sub_dir in ['nodes', 'relations']:
+                os.makedirs(os.path.join(temp_dir, sub_dir))
+            for file_name in ['test_column.csv', 'test_table.csv']:
+                shutil.copy(os.path.join(self._resource_path, 'nodes', file_name), os.path.join(temp_dir, 'nodes'))
+
+            column_size = os.path.getsize(os.path.join(temp_dir, 'nodes', 'test_column.csv'))
+            # Labels are taken from the manifest instead of the file. test_table.csv is changed since the manifest is
+            # written, thus scanned.
+            csv_manifest.write_manifest(os.path.join(temp_dir, 'nodes'), {
+                'test_column.csv': {'labels': ['ColumnInManifest'], 'header': [], 'row_count': 2,
+                                    'byte_size': column_size},
+                'test_table.csv': {'labels': ['TableInManifest'], 'header': [], 'row_count': 2, 'byte_size': 0}})
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = mock_driver.return_value.session.return_value
+
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                index_statements = [call[0][0] for call in mock_session.__enter__.return_value.run.call_args_list]
+                self.assertEqual(index_statements,
+                                 ['CREATE CONSTRAINT ON (node:ColumnInManifest) ASSERT node.key IS UNIQUE',
+                                  'CREATE CONSTRAINT ON (node:Table) ASSERT node.key IS UNIQUE',
+                                  'CALL db.awaitIndexes(300)'])
+                self.assertEqual(mock_session.begin_transaction.return_value.run.call_count, 4)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def _create_resume_conf(self, temp_dir, resume, unwind_batch_size=0):
+        # type: (str, bool, int) -> ConfigTree
+        return ConfigFactory.from_dict(
+            {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+             neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+             neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+             neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+             neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+             neo4j_csv_publisher.NEO4J_TRANSCATION_SIZE: 1,
+             neo4j_csv_publisher.RESUME: resume,
+             neo4j_csv_publisher.NEO4J_UNWIND_BATCH_SIZE: unwind_batch_size,
+             neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+        )
+
+    def test_publisher_resume(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            shutil.copytree(os.path.join(self._resource_path, 'nodes'), os.path.join(temp_dir, 'nodes'))
+            shutil.copytree(os.path.join(self._resource_path, 'relations'), os.path.join(temp_dir, 'relations'))
+            node_journal_path = os.path.join(temp_dir, 'nodes', publish_journal.JOURNAL_FILE_NAME)
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+                mock_transaction.closed.return_value = False
+                # Fails on the commit of the first row of test_table.csv
+                mock_transaction.commit.side_effect = [None, None, RuntimeError('Failed')]
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(self._create_resume_conf(temp_dir, resume=False))
+                self.assertRaises(RuntimeError, publisher.publish)
+
+                with open(node_journal_path, 'r') as f:
+                    journal = json.load(f)
+                self.assertEqual(journal['test_column.csv']['offset'], 2)
+                self.assertEqual(journal['test_column.csv']['transaction_count'], 2)
+                self.assertTrue(journal['test_column.csv']['is_done'])
+                self.assertNotIn('test_table.csv', journal)
+
+            # Next job
+            neo4j_driver_registry.close_all()
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(self._create_resume_conf(temp_dir, resume=True))
+                publisher.publish()
+
+                # test_column.csv is skipped
+                self.assertEqual(mock_transaction.run.call_count, 4)
+                self.assertIn("'presto://gold.test_schema1/test_table1'", str(mock_transaction.run.call_args_list[0]))
+                self.assertFalse(os.path.exists(node_journal_path))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_resume_from_offset(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            shutil.copytree(os.path.join(self._resource_path, 'nodes'), os.path.join(temp_dir, 'nodes'))
+            os.makedirs(os.path.join(temp_dir, 'relations'))
+            column_file = os.path.join(temp_dir, 'nodes', 'test_column.csv')
+            journal = publish_journal.PublishJournal(os.path.join(temp_dir, 'nodes'))
+            journal.update(column_file, None, offset=1, transaction_count=1)
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+                publisher = Neo4jCsvPublisher()
+                publisher.init(self._create_resume_conf(temp_dir, resume=True, unwind_batch_size=10))
+                publisher.publish()
+
+                # Second row of test_column.csv, and test_table.csv
+                self.assertEqual(mock_transaction.run.call_count, 2)
+                _, params = mock_transaction.run.call_args_list[0][0]
+                self.assertEqual([row['name'] for row in params['batch']], ['test_id2'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_iter_batches(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            publisher = Neo4jCsvPublisher()
+            publisher.init(self._create_resume_conf(self._resource_path, resume=False, unwind_batch_size=2))
+
+        records = [(offset, {'LABEL': label}) for offset, label in enumerate(['A', 'B', 'A', 'B', 'B'], start=1)]
+        batches = publisher._iter_batches(records, lambda record: record['LABEL'])
+        # Offset is before the first row still in a group
+        self.assertEqual([(key, len(group), offset) for key, group, offset in batches],
+                         [('A', 2, 1), ('B', 2, 4), ('B', 1, 5)])
+
+    def test_index_plan(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # Table nodes are published by another job
+            for sub_dir, file_name in [('nodes', 'test_column.csv'), ('relations', 'test_edge_short.csv')]:
+                os.makedirs(os.path.join(temp_dir, sub_dir))
+                shutil.copy(os.path.join(self._resource_path, sub_dir, file_name), os.path.join(temp_dir, sub_dir))
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_session = mock_driver.return_value.session.return_value
+
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.NEO4J_INDEX_AWAIT_TIMEOUT_SEC: 10,
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                # Indices are created in one session, before any node is published
+                self.assertEqual(mock_session.__enter__.call_count, 1)
+                index_statements = [call[0][0] for call in mock_session.__enter__.return_value.run.call_args_list]
+                self.assertEqual(index_statements,
+                                 ['CREATE CONSTRAINT ON (node:Column) ASSERT node.key IS UNIQUE',
+                                  'CREATE CONSTRAINT ON (node:Table) ASSERT node.key IS UNIQUE',
+                                  'CALL db.awaitIndexes(10)'])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_publisher_sub_directories(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # Node files written by two loaders into their own sub-directory
+            for sub_dir, file_name in [('nodes/task_0', 'test_column.csv'), ('nodes/task_1', 'test_table.csv'),
+                                       ('relations/task_0', 'test_edge_short.csv')]:
+                os.makedirs(os.path.join(temp_dir, sub_dir))
+                shutil.copy(os.path.join(self._resource_path, os.path.dirname(sub_dir), file_name),
+                            os.path.join(temp_dir, sub_dir))
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.publish()
+
+                self.assertEqual(mock_transaction.run.call_count, 6)
+                self.assertEqual(mock_transaction.commit.call_count, 3)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_publish_stream(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for sub_dir in ['nodes', 'relations']:
+                os.makedirs(os.path.join(temp_dir, sub_dir))
+
+            def rotate(sub_dir, file_name, segment_name):
+                # type: (str, str, str) -> None
+                # Renamed as the loader does, so that publisher never sees a partially written segment
+                shutil.copy(os.path.join(self._resource_path, sub_dir, file_name),
+                            os.path.join(temp_dir, sub_dir, '.tmp'))
+                os.rename(os.path.join(temp_dir, sub_dir, '.tmp'), os.path.join(temp_dir, sub_dir, segment_name))
+
+            rotate('nodes', 'test_table.csv', '00000000_Table_3.csv')
+            # A segment being written
+            rotate('nodes', 'test_column.csv', '.Column_5.csv')
+
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4()),
+                     neo4j_csv_publisher.STREAM_POLL_INTERVAL_SEC: 0.01}
+                )
+                publisher.init(conf)
+                self.assertTrue(publisher.supports_streaming())
+                publisher.begin_stream()
+                publish_thread = threading.Thread(target=publisher.publish)
+                publish_thread.start()
+
+                rotate('nodes', 'test_column.csv', '00000001_Column_5.csv')
+                rotate('relations', 'test_edge_short.csv', '00000002_Table_Column_COLUMN.csv')
+                publisher.end_stream()
+                publish_thread.join()
+
+                self.assertEqual(mock_transaction.run.call_count, 6)
+                self.assertEqual(mock_transaction.commit.call_count, 3)
+                statements = [call[0][0] for call in mock_transaction.run.call_args_list]
+                self.assertTrue(all(stmt.startswith('MERGE') for stmt in statements[:4]))
+                self.assertTrue(all(stmt.startswith('MATCH') for stmt in statements[4:]))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_publish_stream_aborted(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for sub_dir in ['nodes', 'relations']:
+                os.makedirs(os.path.join(temp_dir, sub_dir))
+
+            with patch.object(GraphDatabase, 'driver'):
+                publisher = Neo4jCsvPublisher()
+                conf = ConfigFactory.from_dict(
+                    {neo4j_csv_publisher.NEO4J_END_POINT_KEY: 'dummy://999.999.999.999:7687/',
+                     neo4j_csv_publisher.NODE_FILES_DIR: '{}/nodes'.format(temp_dir),
+                     neo4j_csv_publisher.RELATION_FILES_DIR: '{}/relations'.format(temp_dir),
+                     neo4j_csv_publisher.NEO4J_USER: 'neo4j_user',
+                     neo4j_csv_publisher.NEO4J_PASSWORD: 'neo4j_password',
+                     neo4j_csv_publisher.JOB_PUBLISH_TAG: '{}'.format(uuid.uuid4())}
+                )
+                publisher.init(conf)
+                publisher.begin_stream()
+                publisher.end_stream(is_success=False)
+
+                self.assertRaises(Exception, publisher.publish)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestRetryableTransaction(unittest.TestCase):
+
+    def test_transaction_sizer(self):
+        # type: () -> None
+        sizer = TransactionSizer(size=100, max_bytes=1000, adaptive=True, target_latency_sec=1.0, min_size=10,
+                                 max_size=300)
+        self.assertFalse(sizer.is_full(99, 999))
+        self.assertTrue(sizer.is_full(100, 0))
+        self.assertTrue(sizer.is_full(1, 1000))
+
+        sizer.on_commit(2.0)
+        self.assertEqual(sizer.size, 50)
+        sizer.on_commit(0.7)
+        self.assertEqual(sizer.size, 50)
+        sizer.on_commit(0.1)
+        sizer.on_commit(0.1)
+        sizer.on_commit(0.1)
+        self.assertEqual(sizer.size, 300)
+        for _ in range(10):
+            sizer.on_transient_error()
+        self.assertEqual(sizer.size, 10)
+
+        sizer = TransactionSizer(size=100)
+        sizer.on_commit(100.0)
+        sizer.on_transient_error()
+        self.assertEqual(sizer.size, 100)
+        self.assertFalse(sizer.is_full(1, 10 ** 9))
+
+    def test_commit_when_full(self):
+        # type: () -> None
+        session = MagicMock()
+        tx = RetryableTransaction(session=session, sizer=TransactionSizer(size=2), max_retries=3, backoff_sec=0)
+        for i in range(5):
+            tx.run('stmt{}'.format(i))
+        tx.commit()
+
+        self.assertEqual(tx.row_count, 5)
+        self.assertEqual(session.begin_transaction.call_count, 3)
+        self.assertEqual(session.begin_transaction.return_value.commit.call_count, 3)
+
+    def test_retry_transient_error(self):
+        # type: () -> None
+        session = MagicMock()
+        mock_transaction = session.begin_transaction.return_value
+        mock_transaction.closed.return_value = False
+        mock_transaction.commit.side_effect = [ServiceUnavailable('Leader switched'), None]
+        sizer = MagicMock(wraps=TransactionSizer(size=100))
+
+        with patch.object(neo4j_csv_publisher.time, 'sleep') as mock_sleep:
+            tx = RetryableTransaction(session=session, sizer=sizer, max_retries=3, backoff_sec=1)
+            tx.run('stmt0')
+            tx.run('stmt1', parameters={'batch': []}, row_count=0)
+            tx.commit()
+
+        mock_sleep.assert_called_once_with(1)
+        mock_transaction.rollback.assert_called_once()
+        # Statements are run again in a new transaction
+        self.assertEqual([call[0] for call in mock_transaction.run.call_args_list],
+                         [('stmt0',), ('stmt1', {'batch': []}), ('stmt0',), ('stmt1', {'batch': []})])
+        self.assertEqual(mock_transaction.commit.call_count, 2)
+        sizer.on_transient_error.assert_called_once()
+
+    def test_stats_of_committed_statements(self):
+        # type: () -> None
+        session = MagicMock()
+        mock_transaction = session.begin_transaction.return_value
+        mock_transaction.closed.return_value = False
+        mock_transaction.commit.side_effect = [ServiceUnavailable('Leader switched'), None]
+        summary = mock_transaction.run.return_value.summary.return_value
+        summary.counters.nodes_created = 2
+        summary.counters.properties_set = 6
+        summary.counters.relationships_created = 0
+        summary.result_available_after = 3
+        summary.result_consumed_after = None
+        stats = PublishStats()
+
+        with patch.object(neo4j_csv_publisher.time, 'sleep'):
+            tx = RetryableTransaction(session=session, sizer=TransactionSizer(size=100), max_retries=3,
+                                      backoff_sec=1, stats=stats)
+            tx.run('stmt0', parameters={'batch': [{}, {}]}, row_count=2, stats_key=('a.csv', 'Table'))
+            tx.run('stmt1', parameters={'batch': [{}]}, row_count=1, stats_key=('b.csv', 'Table'))
+            tx.commit()
+
+        # Statements of the rolled back transaction are not counted
+        expected = {'rows': 3, 'nodes_created': 4, 'properties_set': 12, 'relationships_created': 0,
+                    'db_time_ms': 6}
+        self.assertEqual(stats.to_dict()['total'], expected)
+        self.assertEqual(stats.to_dict()['labels'], {'Table': expected})
+        self.assertEqual(stats.to_dict()['files']['a.csv']['rows'], 2)
+
+        statsd = MagicMock()
+        stats.report(statsd)
+        statsd.gauge.assert_any_call('total.nodes_created', 4)
+        statsd.gauge.assert_any_call('label.Table.rows', 3)
+        statsd.timing.assert_any_call('label.Table.db_time_ms', 6)
+
+    def test_retry_exhausted(self):
+        # type: () -> None
+        session = MagicMock()
+        session.begin_transaction.return_value.run.side_effect = TransientError('Deadlock detected')
+
+        with patch.object(neo4j_csv_publisher.time, 'sleep') as mock_sleep:
+            tx = RetryableTransaction(session=session, sizer=TransactionSizer(size=100), max_retries=2,
+                                      backoff_sec=1)
+            self.assertRaises(TransientError, tx.run, 'stmt')
+
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [1, 2])
+        self.assertEqual(session.begin_transaction.return_value.run.call_count, 3)
+
+    def test_no_retry_on_other_error(self):
+        # type: () -> None
+        session = MagicMock()
+        session.begin_transaction.return_value.closed.return_value = False
+
+        def validate(result):
+            # type: (Any) -> None
+            raise RuntimeError('Not created')
+
+        tx = RetryableTransaction(session=session, sizer=TransactionSizer(size=100), max_retries=2, backoff_sec=0)
+        self.assertRaises(RuntimeError, tx.run, 'stmt', validate=validate)
+        session.begin_transaction.return_value.rollback.assert_called_once()
+        session.begin_transaction.return_value.run.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
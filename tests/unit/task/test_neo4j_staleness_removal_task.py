@@ -8,6 +8,7 @@ from pyhocon import ConfigFactory
 from databuilder.publisher import neo4j_csv_publisher
 from databuilder.task import neo4j_staleness_removal_task
 from databuilder.task.neo4j_staleness_removal_task import Neo4jStalenessRemovalTask
+from databuilder.utils import neo4j_driver_registry
 
 
 class TestRemoveStaleData(unittest.TestCase):
@@ -16,6 +17,10 @@ class TestRemoveStaleData(unittest.TestCase):
         # type: () -> None
         logging.basicConfig(level=logging.INFO)
 
+    def tearDown(self):
+        # type: () -> None
+        neo4j_driver_registry.close_all()
+
     def test_validation_failure(self):
         # type: () -> None
 
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock
+from pyhocon import ConfigFactory
+from typing import Any, List  # noqa: F401
+
+from databuilder.task.pipelined_task import PipelinedTask
+from tests.unit.task.test_task import ListExtractor, ListLoader, OddFilterTransformer, CheckpointListExtractor, \
+    CheckpointListLoader
+
+
+class TestPipelinedTask(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self.conf = ConfigFactory.from_dict({'task.batch_size': 3,
+                                             'task.queue_size': 1})
+
+    def test_run(self):
+        # type: () -> None
+        loader = ListLoader()
+        task = PipelinedTask(extractor=ListExtractor(), loader=loader, transformer=OddFilterTransformer())
+        task.init(self.conf)
+        task.run()
+
+        self.assertEqual(loader.records, [1, 3, 5, 7, 9])
+
+    def test_extractor_failure(self):
+        # type: () -> None
+        extractor = ListExtractor()
+        loader = ListLoader()
+        loader.close = MagicMock()
+        task = PipelinedTask(extractor=extractor, loader=loader)
+        task.init(self.conf)
+        extractor.extract = MagicMock(side_effect=[1, 2, 3, 4, ValueError('Bomb')])
+
+        self.assertRaises(ValueError, task.run)
+        self.assertTrue(loader.close.called)
+
+    def test_transformer_failure(self):
+        # type: () -> None
+        transformer = OddFilterTransformer()
+        transformer.transform = MagicMock(side_effect=ValueError('Bomb'))
+        task = PipelinedTask(extractor=ListExtractor(), loader=ListLoader(), transformer=transformer)
+        task.init(self.conf)
+
+        self.assertRaises(ValueError, task.run)
+
+    def test_loader_failure(self):
+        # type: () -> None
+        extractor = ListExtractor()
+        extractor.close = MagicMock()
+        loader = ListLoader()
+        loader.load = MagicMock(side_effect=ValueError('Bomb'))
+        task = PipelinedTask(extractor=extractor, loader=loader)
+        task.init(self.conf)
+
+        self.assertRaises(ValueError, task.run)
+        self.assertTrue(extractor.close.called)
+
+    def test_resume(self):
+        # type: () -> None
+        temp_dir_path = tempfile.mkdtemp()
+        try:
+            checkpoint_path = '{}/checkpoint.json'.format(temp_dir_path)
+            conf = ConfigFactory.from_dict({'task.checkpoint_path': checkpoint_path,
+                                            'task.checkpoint_interval_sec': 0}).with_fallback(self.conf)
+            sink = []  # type: List[Any]
+            task = PipelinedTask(extractor=CheckpointListExtractor(), loader=CheckpointListLoader(sink, fail_on=8))
+            task.init(conf)
+            self.assertRaises(RuntimeError, task.run)
+            self.assertTrue(os.path.exists(checkpoint_path))
+
+            task = PipelinedTask(extractor=CheckpointListExtractor(), loader=CheckpointListLoader(sink))
+            task.init(conf)
+            task.run()
+
+            self.assertEqual(sink, list(range(1, 11)))
+            self.assertFalse(os.path.exists(checkpoint_path))
+        finally:
+            shutil.rmtree(temp_dir_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any, Iterable, List  # noqa: F401
+
+from databuilder.extractor.base_extractor import Extractor
+from databuilder.loader.base_loader import Loader
+from databuilder.task.task import DefaultTask
+from databuilder.transformer.base_transformer import Transformer
+
+
+class TestDefaultTask(unittest.TestCase):
+
+    def test_run_record(self):
+        # type: () -> None
+        loader = ListLoader()
+        task = DefaultTask(extractor=ListExtractor(), loader=loader, transformer=OddFilterTransformer())
+        task.init(ConfigFactory.from_dict({}))
+        task.run()
+
+        self.assertEqual(loader.records, [1, 3, 5, 7, 9])
+        self.assertEqual(loader.batch_calls, 0)
+        self.assertEqual([(stats.name, stats.record_count) for stats in task.get_stats()],
+                         [('extract', 10), ('transform', 10), ('load', 5)])
+
+    def test_run_batch(self):
+        # type: () -> None
+        loader = BatchListLoader()
+        task = DefaultTask(extractor=BatchListExtractor(), loader=loader, transformer=BatchOddFilterTransformer())
+        task.init(ConfigFactory.from_dict({'task.batch_size': 4}))
+        task.run()
+
+        self.assertEqual(loader.records, [1, 3, 5, 7, 9])
+        # 10 records in batch of 4
+        self.assertEqual(loader.batch_calls, 3)
+        self.assertEqual([(stats.name, stats.record_count) for stats in task.get_stats()],
+                         [('extract', 10), ('transform', 10), ('load', 5)])
+
+    def test_run_record_if_not_all_support_batch(self):
+        # type: () -> None
+        loader = BatchListLoader()
+        task = DefaultTask(extractor=ListExtractor(), loader=loader, transformer=BatchOddFilterTransformer())
+        task.init(ConfigFactory.from_dict({'task.batch_size': 4}))
+        task.run()
+
+        self.assertEqual(loader.records, [1, 3, 5, 7, 9])
+        self.assertEqual(loader.batch_calls, 0)
+
+    def test_run_batch_with_record_loader(self):
+        # type: () -> None
+        # Loader without load_batch loads the batches record by record
+        loader = ListLoader()
+        loader.load = MagicMock(side_effect=loader.load)
+        task = DefaultTask(extractor=BatchListExtractor(), loader=loader, transformer=BatchOddFilterTransformer())
+        task.init(ConfigFactory.from_dict({'task.batch_size': 4}))
+        self.assertTrue(task._is_batch_supported())
+        task.run()
+
+        self.assertEqual(loader.records, [1, 3, 5, 7, 9])
+        self.assertEqual(loader.load.call_count, 5)
+
+    def test_close_on_failure(self):
+        # type: () -> None
+        extractor = ListExtractor()
+        extractor.close = MagicMock()
+        loader = ListLoader()
+        loader.load = MagicMock(side_effect=RuntimeError('Bomb'))
+        task = DefaultTask(extractor=extractor, loader=loader)
+        task.init(ConfigFactory.from_dict({}))
+
+        self.assertRaises(RuntimeError, task.run)
+        self.assertTrue(extractor.close.called)
+
+
+class TestDefaultTaskCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self.temp_dir_path = tempfile.mkdtemp()
+        self.checkpoint_path = '{}/checkpoint.json'.format(self.temp_dir_path)
+        self.conf = ConfigFactory.from_dict({'task.checkpoint_path': self.checkpoint_path,
+                                             'task.checkpoint_interval_sec': 0})
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.temp_dir_path)
+
+    def test_resume(self):
+        # type: () -> None
+        sink = []  # type: List[Any]
+        task = DefaultTask(extractor=CheckpointListExtractor(), loader=CheckpointListLoader(sink, fail_on=7))
+        task.init(self.conf)
+        self.assertRaises(RuntimeError, task.run)
+        self.assertTrue(os.path.exists(self.checkpoint_path))
+        self.assertEqual(sink, [1, 2, 3, 4, 5, 6, 7])
+
+        # Record loaded after last checkpoint is discarded, and extraction resumes from the checkpoint
+        task = DefaultTask(extractor=CheckpointListExtractor(), loader=CheckpointListLoader(sink))
+        task.init(self.conf)
+        task.run()
+
+        self.assertEqual(sink, list(range(1, 11)))
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_checkpoint_not_supported(self):
+        # type: () -> None
+        loader = ListLoader()
+        task = DefaultTask(extractor=ListExtractor(), loader=loader)
+        task.init(self.conf)
+        loader.load = MagicMock(side_effect=RuntimeError('Bomb'))
+        self.assertRaises(RuntimeError, task.run)
+
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+
+class ListExtractor(Extractor):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self._iter = iter(range(1, 11))
+
+    def extract(self):
+        # type: () -> Any
+        return next(self._iter, None)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.list'
+
+
+class BatchListExtractor(ListExtractor):
+    def extract_batch(self, batch_size):
+        # type: (int) -> List[Any]
+        return super(BatchListExtractor, self).extract_batch(batch_size)
+
+
+class CheckpointListExtractor(ListExtractor):
+    def __init__(self):
+        # type: () -> None
+        self._start = 1
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self._iter = iter(range(self._start, 11))
+        self._last = self._start - 1
+
+    def extract(self):
+        # type: () -> Any
+        record = next(self._iter, None)
+        if record:
+            self._last = record
+        return record
+
+    def get_checkpoint(self):
+        # type: () -> Any
+        return self._last
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Any) -> None
+        self._start = checkpoint + 1
+
+
+class OddFilterTransformer(Transformer):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        pass
+
+    def transform(self, record):
+        # type: (Any) -> Any
+        return record if record % 2 else None
+
+    def get_scope(self):
+        # type: () -> str
+        return 'transformer.odd_filter'
+
+
+class BatchOddFilterTransformer(OddFilterTransformer):
+    def transform_batch(self, records):
+        # type: (Iterable[Any]) -> List[Any]
+        return [record for record in records if record % 2]
+
+
+class ListLoader(Loader):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self.records = []  # type: List[Any]
+        self.batch_calls = 0
+
+    def load(self, record):
+        # type: (Any) -> None
+        self.records.append(record)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'loader.list'
+
+
+class BatchListLoader(ListLoader):
+    def load_batch(self, records):
+        # type: (Iterable[Any]) -> None
+        self.batch_calls += 1
+        self.records.extend(records)
+
+
+class CheckpointListLoader(ListLoader):
+    """
+    A loader that loads into the sink which outlives the loader, failing after loading the record fail_on.
+    """
+    def __init__(self, sink, fail_on=None):
+        # type: (List[Any], Any) -> None
+        self.sink = sink
+        self.fail_on = fail_on
+
+    def load(self, record):
+        # type: (Any) -> None
+        self.sink.append(record)
+        if record == self.fail_on:
+            raise RuntimeError('Failed on {}'.format(record))
+
+    def get_checkpoint(self):
+        # type: () -> Any
+        return len(self.sink)
+
+    def restore_checkpoint(self, checkpoint):
+        # type: (Any) -> None
+        del self.sink[checkpoint:]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,14 +4,20 @@ import tempfile
 import unittest
 from mock import patch
 
+from neo4j.v1 import GraphDatabase
 from pyhocon import ConfigTree, ConfigFactory  # noqa: F401
-from typing import Any  # noqa: F401
+from typing import Any, Set  # noqa: F401
 
 from databuilder.extractor.base_extractor import Extractor
 from databuilder.job.job import DefaultJob
 from databuilder.loader.base_loader import Loader
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.publisher import neo4j_csv_publisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
 from databuilder.task.task import DefaultTask
 from databuilder.transformer.base_transformer import Transformer
+from databuilder.utils import neo4j_driver_registry
+from tests.unit.models.test_neo4j_csv_serde import Movie, Actor, City
 
 
 class TestJob(unittest.TestCase):
@@ -110,6 +116,148 @@ class TestJobStatsd(unittest.TestCase):
                 self.assertFalse(file.readline())
 
             self.assertEqual(mock_statsd.return_value.incr.call_count, 1)
+            timing_stats = {args[0] for args, _ in mock_statsd.return_value.timing.call_args_list}
+            for stage in ['extract', 'transform', 'load', 'publish']:
+                self.assertIn('{}.elapsed'.format(stage), timing_stats)
+                self.assertIn('{}.latency_p99'.format(stage), timing_stats)
+            mock_statsd.return_value.gauge.assert_any_call('extract.record_count', 2)
+
+
+class TestJobMemoryGuard(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self.temp_dir_path = tempfile.mkdtemp()
+        self.dest_file_name = '{}/superhero.json'.format(self.temp_dir_path)
+        self.conf = ConfigFactory.from_dict(
+            {'loader.superhero.dest_file': self.dest_file_name,
+             'job.is_statsd_enabled': True,
+             'job.identifier': 'foobar',
+             'job.is_memory_guard_enabled': True,
+             'job.memory_guard.check_interval': 1})
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.temp_dir_path)
+
+    def test_job(self):
+        # type: () -> None
+        with patch("databuilder.job.job.StatsClient") as mock_statsd:
+            job = DefaultJob(self.conf, DefaultTask(SuperHeroExtractor(), SuperHeroLoader()))
+            job.launch()
+
+            self.assertEqual([snapshot.label for snapshot in job.memory_guard.snapshots],
+                             ['start', 'task_init', 'task', 'publish'])
+            gauges = {args[0] for args, _ in mock_statsd.return_value.gauge.call_args_list}
+            for stage in ['extract', 'load', 'task', 'publish']:
+                self.assertIn('memory.{}.peak_rss_mb'.format(stage), gauges)
+
+    def test_abort(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({'job.memory_guard.budget_mb': 1,
+                                        'job.memory_guard.action': 'abort'}).with_fallback(self.conf)
+        with patch("databuilder.job.job.StatsClient") as mock_statsd:
+            job = DefaultJob(conf, DefaultTask(SuperHeroExtractor(), SuperHeroLoader()))
+
+            self.assertRaises(RuntimeError, job.launch)
+            mock_statsd.return_value.incr.assert_called_once_with('fail')
+
+
+class TestJobStreamingPublish(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self.temp_dir_path = tempfile.mkdtemp()
+        node_dir = '{}/nodes'.format(self.temp_dir_path)
+        relation_dir = '{}/relations'.format(self.temp_dir_path)
+        self.conf = ConfigFactory.from_dict(
+            {'job.is_streaming_publish': True,
+             'loader.filesystem_csv_neo4j.node_dir_path': node_dir,
+             'loader.filesystem_csv_neo4j.relationship_dir_path': relation_dir,
+             'loader.filesystem_csv_neo4j.rotate_segment_rows': 2,
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.NODE_FILES_DIR): node_dir,
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.RELATION_FILES_DIR): relation_dir,
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_END_POINT_KEY): 'dummy://999.999.999.999:7687/',
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_USER): 'neo4j_user',
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_PASSWORD): 'neo4j_password',
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.JOB_PUBLISH_TAG): 'foo',
+             'publisher.neo4j.{}'.format(neo4j_csv_publisher.STREAM_POLL_INTERVAL_SEC): 0.01})
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.temp_dir_path)
+        neo4j_driver_registry.close_all()
+
+    def test_job(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+
+            job = DefaultJob(self.conf, DefaultTask(MovieExtractor(), FsNeo4jCSVLoader()), Neo4jCsvPublisher())
+            job.launch()
+
+            # 3 nodes and 2 relations per movie
+            self.assertEqual(mock_transaction.run.call_count, 15)
+            statements = [call[0] for call in mock_transaction.run.call_args_list]
+            node_keys = {params['row']['KEY'] for stmt, params in statements if stmt.startswith('MERGE')}
+            merged_keys = set()  # type: Set[str]
+            for stmt, params in statements:
+                if stmt.startswith('MERGE'):
+                    merged_keys.add(params['row']['KEY'])
+                else:
+                    # Nodes of a relationship are committed before the relationship
+                    keys = {params['row']['START_KEY'], params['row']['END_KEY']}
+                    self.assertTrue(keys & node_keys <= merged_keys)
+
+            publish_stats = job._get_stats()[-1]
+            self.assertEqual(publish_stats.name, 'publish')
+            self.assertEqual(publish_stats.record_count, 15)
+            self.assertGreater(publish_stats.latency_percentile(99), 0)
+
+    def test_publish_stats_on_failure(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({'job.is_streaming_publish': False}).with_fallback(self.conf)
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_transaction = mock_driver.return_value.session.return_value.begin_transaction.return_value
+            # Fails on the commit of the second file
+            mock_transaction.commit.side_effect = [None, RuntimeError('Failed')]
+
+            job = DefaultJob(conf, DefaultTask(MovieExtractor(), FsNeo4jCSVLoader()), Neo4jCsvPublisher())
+            self.assertRaises(RuntimeError, job.launch)
+
+            # Rows committed before the failure
+            publish_stats = job._get_stats()[-1]
+            self.assertEqual(publish_stats.record_count, 2)
+            self.assertGreater(publish_stats.elapsed_sec, 0)
+
+    def test_task_failure(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver'):
+            extractor = MovieExtractor()
+            task = DefaultTask(extractor, FsNeo4jCSVLoader())
+            job = DefaultJob(self.conf, task, Neo4jCsvPublisher())
+            with patch.object(MovieExtractor, 'extract', side_effect=ValueError('Bomb')):
+                self.assertRaises(ValueError, job.launch)
+
+    def test_not_supported(self):
+        # type: () -> None
+        job = DefaultJob(self.conf, DefaultTask(MovieExtractor(), FsNeo4jCSVLoader()))
+        self.assertRaises(Exception, job.launch)
+
+
+class MovieExtractor(Extractor):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self.iter = iter([Movie('Movie {}'.format(i), [Actor('Actor {}'.format(i))], [City('City {}'.format(i))])
+                          for i in range(3)])
+
+    def extract(self):
+        # type: () -> Any
+        return next(self.iter, None)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.movie'
 
 
 class SuperHeroExtractor(Extractor):
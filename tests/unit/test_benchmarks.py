@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.run_benchmarks import SCENARIOS, SEARCH_SCENARIO, parse_args, run_isolated
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_scenarios(self):
+        # type: () -> None
+        args = parse_args(['--neo4j-statement-ms', '0', '--neo4j-row-ms', '0', '--neo4j-commit-ms', '0',
+                           '--es-request-ms', '0', '--es-document-ms', '0'])
+        for scenario in SCENARIOS:
+            result = run_isolated(scenario, 20, args)
+
+            self.assertNotIn('error', result)
+            self.assertEqual(result['table_count'], 20)
+            self.assertTrue(result['peak_rss_mb'])
+            if scenario == SEARCH_SCENARIO:
+                self.assertEqual(result['es_documents'], 20)
+            else:
+                self.assertTrue(result['neo4j_statements'] > 0)
+                self.assertTrue(result['neo4j_commits'] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
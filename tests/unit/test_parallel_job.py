@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock
+from pyhocon import ConfigTree, ConfigFactory  # noqa: F401
+from typing import Any  # noqa: F401
+
+from databuilder.extractor.base_extractor import Extractor
+from databuilder.job.parallel_job import ParallelJob
+from databuilder.loader.base_loader import Loader
+from databuilder.task.task import DefaultTask
+
+
+class TestParallelJob(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self.temp_dir_path = tempfile.mkdtemp()
+        self.conf = ConfigFactory.from_dict({'job.parallelism': 2})
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self.temp_dir_path)
+
+    def _task_confs(self, count):
+        # type: (int) -> Any
+        return [ConfigFactory.from_dict({'extractor.range.start': i * 10 + 1,
+                                         'loader.line.dest_file': '{}/task_{}.txt'.format(self.temp_dir_path, i)})
+                for i in range(count)]
+
+    def _read(self, index):
+        # type: (int) -> Any
+        with open('{}/task_{}.txt'.format(self.temp_dir_path, index)) as f:
+            return [int(line) for line in f]
+
+    def test_threads(self):
+        # type: () -> None
+        publisher = MagicMock()
+        publisher.get_scope.return_value = 'publisher.mock'
+        publisher.get_published_count.return_value = 15
+        job = ParallelJob(conf=self.conf,
+                          tasks=[DefaultTask(RangeExtractor(), LineLoader()) for _ in range(3)],
+                          publisher=publisher,
+                          task_confs=self._task_confs(3))
+        job.launch()
+
+        for i in range(3):
+            self.assertEqual(self._read(i), list(range(i * 10 + 1, i * 10 + 6)))
+        publisher.publish.assert_called_once_with()
+
+        stats = {stats.name: stats for stats in job._get_stats()}
+        self.assertEqual(stats['task_2.extract'].record_count, 5)
+        self.assertEqual(stats['publish'].record_count, 15)
+
+    def test_processes(self):
+        # type: () -> None
+        conf = ConfigFactory.from_dict({'job.use_processes': True}).with_fallback(self.conf)
+        job = ParallelJob(conf=conf,
+                          tasks=[DefaultTask(RangeExtractor(), LineLoader()) for _ in range(2)],
+                          task_confs=self._task_confs(2))
+        job.launch()
+
+        for i in range(2):
+            self.assertEqual(self._read(i), list(range(i * 10 + 1, i * 10 + 6)))
+        stats = {stats.name: stats for stats in job._get_stats()}
+        self.assertEqual(stats['task_1.load'].record_count, 5)
+
+    def test_failure(self):
+        # type: () -> None
+        publisher = MagicMock()
+        publisher.get_scope.return_value = 'publisher.mock'
+        job = ParallelJob(conf=self.conf,
+                          tasks=[DefaultTask(RangeExtractor(), LineLoader()),
+                                 DefaultTask(RangeExtractor(), FailingLoader())],
+                          publisher=publisher,
+                          task_confs=self._task_confs(2))
+
+        self.assertRaises(RuntimeError, job.launch)
+        # Other task still runs to completion, but nothing is published
+        self.assertEqual(self._read(0), list(range(1, 6)))
+        self.assertFalse(publisher.publish.called)
+        self.assertTrue(os.path.exists('{}/task_0.txt'.format(self.temp_dir_path)))
+
+    def test_mismatched_task_confs(self):
+        # type: () -> None
+        self.assertRaises(Exception, ParallelJob, self.conf,
+                          [DefaultTask(RangeExtractor(), LineLoader())], task_confs=self._task_confs(2))
+
+
+class RangeExtractor(Extractor):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        start = conf.get_int('start')
+        self.iter = iter(range(start, start + 5))
+
+    def extract(self):
+        # type: () -> Any
+        return next(self.iter, None)
+
+    def get_scope(self):
+        # type: () -> str
+        return 'extractor.range'
+
+
+class LineLoader(Loader):
+    def __init__(self):
+        # type: () -> None
+        self.dest_file_obj = None  # type: Any
+
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self.dest_file_obj = open(conf.get_string('dest_file'), 'w')
+
+    def load(self, record):
+        # type: (Any) -> None
+        self.dest_file_obj.write('{}\n'.format(record))
+
+    def close(self):
+        # type: () -> None
+        if self.dest_file_obj:
+            self.dest_file_obj.close()
+
+    def get_scope(self):
+        # type: () -> str
+        return 'loader.line'
+
+
+class FailingLoader(LineLoader):
+    def load(self, record):
+        # type: (Any) -> None
+        raise RuntimeError('Failed to load {}'.format(record))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import time
+import unittest
+
+from pyhocon import ConfigFactory, ConfigTree  # noqa: F401
+from typing import Any  # noqa: F401
+
+from databuilder import Scoped
+from databuilder.transformer.base_transformer import Transformer
+from databuilder.transformer.parallel_transformer import ParallelTransformer
+
+
+class TestParallelTransformer(unittest.TestCase):
+
+    def _get_transformer(self, conf_dict):
+        # type: (dict) -> ParallelTransformer
+        conf_dict.update({'transformer.parallel.pool_size': 2,
+                          'transformer.parallel.transformer.square.hang_on': 3})
+        transformer = ParallelTransformer(SquareTransformer())
+        transformer.init(Scoped.get_scoped_conf(ConfigFactory.from_dict(conf_dict), transformer.get_scope()))
+        return transformer
+
+    def test_transform_batch(self):
+        # type: () -> None
+        transformer = self._get_transformer({'transformer.parallel.chunk_size': 2})
+        try:
+            actual = transformer.transform_batch([5, 4, 2, 1, 7])
+        finally:
+            transformer.close()
+
+        # Record 2 is filtered by the wrapped transformer
+        self.assertEqual(actual, [25, 16, 1, 49])
+
+    def test_transform_batch_unordered(self):
+        # type: () -> None
+        transformer = self._get_transformer({'transformer.parallel.preserve_order': False})
+        try:
+            actual = transformer.transform_batch(range(4, 10))
+        finally:
+            transformer.close()
+
+        self.assertEqual(sorted(actual), [16, 25, 36, 49, 64, 81])
+
+    def test_transform(self):
+        # type: () -> None
+        transformer = self._get_transformer({})
+        try:
+            self.assertEqual(transformer.transform(5), 25)
+            self.assertIsNone(transformer.transform(2))
+        finally:
+            transformer.close()
+
+    def test_transform_batch_with_timeout(self):
+        # type: () -> None
+        transformer = self._get_transformer({'transformer.parallel.chunk_size': 3,
+                                             'transformer.parallel.record_timeout_sec': 1})
+        try:
+            actual = transformer.transform_batch([1, 3, 4, 5])
+        finally:
+            transformer.close()
+
+        # Record 3 hangs and is skipped
+        self.assertEqual(actual, [1, 16, 25])
+
+
+class SquareTransformer(Transformer):
+    def init(self, conf):
+        # type: (ConfigTree) -> None
+        self._hang_on = conf.get_int('hang_on')
+
+    def transform(self, record):
+        # type: (Any) -> Any
+        if record == self._hang_on:
+            time.sleep(60)
+        if record == 2:
+            return None
+        return record * record
+
+    def get_scope(self):
+        # type: () -> str
+        return 'transformer.square'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from typing import List  # noqa: F401
+
+from databuilder.utils.csv_sort import sort_csv
+
+
+class TestCsvSort(unittest.TestCase):
+
+    def setUp(self):
+        # type: () -> None
+        self._temp_dir = tempfile.mkdtemp()
+        self._in_path = os.path.join(self._temp_dir, 'in.csv')
+        self._out_path = os.path.join(self._temp_dir, 'out.csv')
+        with open(self._in_path, 'w') as f:
+            f.write('"START_KEY","END_KEY","name"\n'
+                    '"b","x","1"\n'
+                    '"a","y","2"\n'
+                    '"b","w","3"\n'
+                    '"a","y","4"\n'
+                    '"c","z","comma, and\nnewline"\n')
+
+    def tearDown(self):
+        # type: () -> None
+        shutil.rmtree(self._temp_dir)
+
+    def _read_out(self):
+        # type: () -> List[List[str]]
+        with open(self._out_path, 'r') as f:
+            return list(csv.reader(f))
+
+    def test_sort_in_memory(self):
+        # type: () -> None
+        self.assertEqual(sort_csv(self._in_path, self._out_path, ['START_KEY', 'END_KEY']), 5)
+        self.assertEqual(self._read_out(),
+                         [['START_KEY', 'END_KEY', 'name'],
+                          ['a', 'y', '2'], ['a', 'y', '4'], ['b', 'w', '3'], ['b', 'x', '1'],
+                          ['c', 'z', 'comma, and\nnewline']])
+
+    def test_sort_spilled(self):
+        # type: () -> None
+        sort_csv(self._in_path, self._out_path, ['START_KEY'], max_memory_rows=2, temp_dir=self._temp_dir)
+        # Rows with the same key keep their order
+        self.assertEqual([row[2] for row in self._read_out()[1:]], ['2', '4', '1', '3', 'comma, and\nnewline'])
+        # Runs are removed
+        self.assertEqual(sorted(os.listdir(self._temp_dir)), ['in.csv', 'out.csv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from pyhocon import ConfigFactory
+
+from databuilder.utils import memory_guard
+from databuilder.utils.memory_guard import MemoryGuard
+
+
+class TestMemoryGuard(unittest.TestCase):
+
+    def test_rss(self):
+        # type: () -> None
+        self.assertGreater(memory_guard.get_rss_bytes(), 0)
+
+    def test_warn(self):
+        # type: () -> None
+        guard = MemoryGuard(ConfigFactory.from_dict({MemoryGuard.BUDGET_MB: 1,
+                                                     MemoryGuard.CHECK_INTERVAL: 2}))
+        guard.check('extract')
+        self.assertEqual(guard.peak_rss_bytes, {})
+
+        guard.check('extract')
+        self.assertGreater(guard.peak_rss_bytes['extract'], 1024 * 1024)
+
+    def test_abort(self):
+        # type: () -> None
+        guard = MemoryGuard(ConfigFactory.from_dict({MemoryGuard.BUDGET_MB: 1,
+                                                     MemoryGuard.ACTION: MemoryGuard.ABORT,
+                                                     MemoryGuard.CHECK_INTERVAL: 10}))
+        with self.assertRaises(RuntimeError) as context:
+            guard.check('load', 10)
+        self.assertIn('load', str(context.exception))
+
+    def test_invalid_action(self):
+        # type: () -> None
+        self.assertRaises(Exception, MemoryGuard, ConfigFactory.from_dict({MemoryGuard.ACTION: 'ignore'}))
+
+    @unittest.skipIf(memory_guard.tracemalloc is None, 'tracemalloc is not available')
+    def test_top_allocations(self):
+        # type: () -> None
+        guard = MemoryGuard(ConfigFactory.from_dict({MemoryGuard.TRACEMALLOC: True}))
+        guard.start()
+        try:
+            allocated = [str(i) * 10 for i in range(100000)]
+            guard.snapshot('task')
+            del allocated
+            guard.snapshot('publish')
+
+            top_allocations = guard.get_top_allocations()
+            self.assertEqual(top_allocations[0].traceback[0].filename, __file__)
+            self.assertGreater(guard.snapshots[1].traced_bytes, guard.snapshots[2].traced_bytes)
+        finally:
+            guard.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
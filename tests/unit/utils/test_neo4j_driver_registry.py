@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch, MagicMock
+from neo4j.v1 import GraphDatabase
+from pyhocon import ConfigFactory
+
+from databuilder.job.job import DefaultJob
+from databuilder.loader.file_system_neo4j_csv_loader import FsNeo4jCSVLoader
+from databuilder.publisher import neo4j_csv_publisher
+from databuilder.publisher.neo4j_csv_publisher import Neo4jCsvPublisher
+from databuilder.task.task import DefaultTask
+from databuilder.utils import neo4j_driver_registry
+from tests.unit.test_base_job import MovieExtractor
+
+
+class TestNeo4jDriverRegistry(unittest.TestCase):
+
+    def tearDown(self):
+        # type: () -> None
+        neo4j_driver_registry.close_all()
+
+    def test_shared_driver(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            mock_driver.side_effect = [MagicMock(), MagicMock()]
+            conf = ConfigFactory.from_dict({neo4j_driver_registry.NEO4J_MAX_CONN_POOL_SIZE: 10})
+            driver = neo4j_driver_registry.get_driver('bolt://localhost:7687', 'neo4j', 'password', conf)
+
+            self.assertIs(neo4j_driver_registry.get_driver('bolt://localhost:7687', 'neo4j', 'password'), driver)
+            self.assertIsNot(neo4j_driver_registry.get_driver('bolt://localhost:7687', 'other', 'password'), driver)
+            self.assertEqual(mock_driver.call_count, 2)
+            mock_driver.assert_any_call('bolt://localhost:7687', auth=('neo4j', 'password'),
+                                        max_connection_lifetime=50,
+                                        max_connection_pool_size=10,
+                                        connection_acquisition_timeout=60)
+
+    def test_close_all(self):
+        # type: () -> None
+        with patch.object(GraphDatabase, 'driver') as mock_driver:
+            neo4j_driver_registry.get_driver('bolt://localhost:7687', 'neo4j', 'password')
+            neo4j_driver_registry.get_driver('bolt://localhost:7687', 'neo4j', 'password')
+
+            neo4j_driver_registry.close_all()
+            mock_driver.return_value.close.assert_called_once()
+
+            # Created again after closed
+            neo4j_driver_registry.get_driver('bolt://localhost:7687', 'neo4j', 'password')
+            self.assertEqual(mock_driver.call_count, 2)
+
+    def test_shared_across_jobs(self):
+        # type: () -> None
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with patch.object(GraphDatabase, 'driver') as mock_driver:
+                for index in range(2):
+                    job_dir = os.path.join(temp_dir, str(index))
+                    conf = ConfigFactory.from_dict(
+                        {'loader.filesystem_csv_neo4j.node_dir_path': os.path.join(job_dir, 'nodes'),
+                         'loader.filesystem_csv_neo4j.relationship_dir_path': os.path.join(job_dir, 'relations'),
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.NODE_FILES_DIR):
+                             os.path.join(job_dir, 'nodes'),
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.RELATION_FILES_DIR):
+                             os.path.join(job_dir, 'relations'),
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_END_POINT_KEY):
+                             'bolt://localhost:7687',
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_USER): 'neo4j',
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.NEO4J_PASSWORD): 'password',
+                         'publisher.neo4j.{}'.format(neo4j_csv_publisher.JOB_PUBLISH_TAG): 'foo'})
+                    DefaultJob(conf, DefaultTask(MovieExtractor(), FsNeo4jCSVLoader()), Neo4jCsvPublisher()).launch()
+
+                mock_driver.assert_called_once()
+                mock_driver.return_value.close.assert_not_called()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
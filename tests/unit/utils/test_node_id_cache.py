@@ -0,0 +1,38 @@
+import os
+import unittest
+
+from databuilder.utils.node_id_cache import NodeIdCache
+
+
+class TestNodeIdCache(unittest.TestCase):
+
+    def test_get(self):
+        # type: () -> None
+        cache = NodeIdCache()
+        cache.put_all('Table', [('db://schema/table', 1)])
+        cache.put_all('Column', [('db://schema/table', 2)])
+
+        self.assertEqual(cache.get('Table', 'db://schema/table'), 1)
+        self.assertEqual(cache.get('Column', 'db://schema/table'), 2)
+        self.assertIsNone(cache.get('Table', 'db://schema/other'))
+        self.assertEqual(len(cache), 2)
+
+    def test_spill(self):
+        # type: () -> None
+        cache = NodeIdCache(max_memory_size=2)
+        cache.put_all('Table', [('a', 1), ('b', 2), ('c', 3)])
+        cache.put_all('Table', [('d', 4)])
+        temp_dir = cache._temp_dir
+
+        self.assertTrue(os.path.isdir(temp_dir))
+        self.assertEqual(cache.spilled_count, 3)
+        self.assertEqual(len(cache), 4)
+        self.assertEqual([cache.get('Table', key) for key in ('a', 'b', 'c', 'd', 'e')], [1, 2, 3, 4, None])
+
+        cache.close()
+        self.assertFalse(os.path.exists(temp_dir))
+        self.assertIsNone(cache.get('Table', 'a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
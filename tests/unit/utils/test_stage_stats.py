@@ -0,0 +1,49 @@
+import unittest
+
+from databuilder.utils.stage_stats import StageStats
+
+
+class TestStageStats(unittest.TestCase):
+
+    def test_add(self):
+        # type: () -> None
+        stats = StageStats('extract')
+        for i in range(1, 101):
+            stats.add(i / 1000.0)
+        # End of extraction
+        stats.add(1.0, 0)
+
+        self.assertEqual(stats.record_count, 100)
+        self.assertAlmostEqual(stats.elapsed_sec, 6.05)
+        self.assertAlmostEqual(stats.records_per_sec(), 100 / 6.05)
+        self.assertAlmostEqual(stats.latency_percentile(50), 0.050, delta=0.001)
+        self.assertAlmostEqual(stats.latency_percentile(99), 0.099, delta=0.001)
+
+    def test_add_batch(self):
+        # type: () -> None
+        stats = StageStats('load')
+        stats.add(2.0, 4)
+
+        self.assertEqual(stats.record_count, 4)
+        self.assertAlmostEqual(stats.latency_percentile(50), 0.5)
+
+    def test_bounded_samples(self):
+        # type: () -> None
+        stats = StageStats('transform', max_samples=10)
+        for _ in range(100):
+            stats.add(0.1)
+
+        self.assertEqual(stats.record_count, 100)
+        self.assertEqual(len(stats._samples), 10)
+        self.assertAlmostEqual(stats.latency_percentile(99), 0.1)
+
+    def test_empty(self):
+        # type: () -> None
+        stats = StageStats('publish')
+
+        self.assertEqual(stats.records_per_sec(), 0.0)
+        self.assertEqual(stats.latency_percentile(50), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()